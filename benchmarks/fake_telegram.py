@@ -0,0 +1,360 @@
+"""Cliente Telegram simulado para benchmarks offline do ClonerService.
+
+Serve um fórum ou canal sintético (mensagens geradas sob demanda a partir do
+ID, sem guardar o histórico em memória), aplica latência e FloodWait
+configuráveis e registra cada envio recebido. Só implementa o que o
+ClonerService usa do TelegramClient.
+"""
+import asyncio
+import bisect
+import collections
+import datetime
+import random
+from array import array
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Optional
+
+from telethon import errors, utils
+from telethon.tl import types
+from telethon.tl.functions.channels import (
+    CreateForumTopicRequest,
+    EditForumTopicRequest,
+    EditPhotoRequest,
+    EditTitleRequest,
+    GetForumTopicsByIDRequest,
+    GetForumTopicsRequest,
+    GetFullChannelRequest,
+    UpdatePinnedForumTopicRequest,
+)
+from telethon.tl.functions.messages import EditChatAboutRequest, SearchRequest, SendMediaRequest, SendMessageRequest
+
+# Referência à sleep real: o harness troca asyncio.sleep para não esperar as pausas do serviço
+_real_sleep = asyncio.sleep
+
+SOURCE_ID = 1000
+TARGET_ID = 2000
+BASE_DATE = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+@dataclass
+class Scenario:
+    """Origem sintética e condições da API simulada."""
+    name: str
+    forum: bool = True
+    topics: int = 10
+    messages: int = 1000          # total de mensagens (divididas igualmente entre os tópicos)
+    target_forum: Optional[bool] = None  # None = mesmo tipo da origem
+    media_every: int = 0          # a cada N mensagens, uma foto
+    album_every: int = 0          # a cada N grupos de 3 mensagens, um álbum de 3 fotos
+    long_text_every: int = 0      # a cada N mensagens, um texto acima de 4096 caracteres
+    pin_every: int = 0            # a cada N mensagens, uma fixada
+    latency_ms: float = 0.0       # latência por requisição
+    flood_rate: float = 0.0       # probabilidade de FloodWait por envio
+    flood_seconds: int = 3
+    sync_pins: bool = False
+    seed: int = 1
+
+    @property
+    def target_is_forum(self) -> bool:
+        return self.forum if self.target_forum is None else self.target_forum
+
+
+class FakeTelegramClient:
+    def __init__(self, scenario: Scenario):
+        self.scenario = scenario
+        self.flood_sleep_threshold = 60
+        self._flood_waited_requests = {}
+        self._random = random.Random(scenario.seed)
+
+        self.source = types.Channel(
+            id=SOURCE_ID, title="Origem", photo=types.ChatPhotoEmpty(), date=BASE_DATE,
+            access_hash=SOURCE_ID, megagroup=scenario.forum, forum=scenario.forum, broadcast=not scenario.forum,
+        )
+        target_forum = scenario.target_is_forum
+        self.target = types.Channel(
+            id=TARGET_ID, title="Origem [Backup]", photo=types.ChatPhotoEmpty(), date=BASE_DATE,
+            access_hash=TARGET_ID, megagroup=target_forum, forum=target_forum, broadcast=not target_forum,
+        )
+
+        # Origem: tópico k ocupa os IDs [start_k, start_k + por_tópico]; o ID do tópico é o da mensagem de criação
+        self.per_topic = max(1, scenario.messages // max(1, scenario.topics)) if scenario.forum else scenario.messages
+        if scenario.forum:
+            self.topic_ids = [1 + k * (self.per_topic + 1) for k in range(scenario.topics)]
+            self._topic_index = {t: k for k, t in enumerate(self.topic_ids)}
+            self.last_source_id = self.topic_ids[-1] + self.per_topic
+        else:
+            self.topic_ids = []
+            self._topic_index = {}
+            self.last_source_id = scenario.messages
+
+        # Destino: tópicos por ordem de atividade (OrderedDict: mais recente no fim)
+        self._target_next_id = 1
+        self._target_topics: "collections.OrderedDict[int, list]" = collections.OrderedDict()  # id -> [título, top_message, fixado, fechado]
+        self._target_pinned_topics: set[int] = set()
+        self._target_pinned: set[int] = set()
+
+        # Registro dos envios (arrays compactos: o cenário de 1M mensagens não pode pesar no RSS)
+        self.sent_peer = array('q')
+        self.sent_reply_to = array('q')
+        self.sent_random_id = array('q')
+        self._random_ids: set[int] = set()
+        self.duplicates = 0
+        self.deleted = 0
+        self.calls = collections.Counter()
+        self.flood_waits = 0
+
+    # ===== Geração da origem =====
+    def _topic_of(self, msg_id: int) -> int:
+        if not self.scenario.forum:
+            return 0
+        return self.topic_ids[bisect.bisect_right(self.topic_ids, msg_id) - 1]
+
+    def _source_message(self, msg_id: int):
+        s = self.scenario
+        topic_id = self._topic_of(msg_id)
+        date = BASE_DATE + datetime.timedelta(seconds=msg_id)
+        reply_to = types.MessageReplyHeader(reply_to_msg_id=topic_id, forum_topic=True, reply_to_top_id=topic_id) if topic_id else None
+
+        text = f"Mensagem {msg_id}"
+        media = None
+        grouped_id = None
+        if s.long_text_every and msg_id % s.long_text_every == 0:
+            text = (text + " ") * 400
+        if s.album_every and (msg_id // 3) % s.album_every == 0:
+            grouped_id = msg_id // 3
+        if grouped_id is not None or (s.media_every and msg_id % s.media_every == 0):
+            media = types.MessageMediaPhoto(photo=types.Photo(
+                id=msg_id, access_hash=msg_id, file_reference=b'', date=date, sizes=[], dc_id=1
+            ))
+            text = text[:1000]
+
+        return types.Message(
+            id=msg_id, peer_id=types.PeerChannel(SOURCE_ID), date=date, message=text, media=media,
+            reply_to=reply_to, grouped_id=grouped_id, pinned=bool(s.pin_every and msg_id % s.pin_every == 0),
+        )
+
+    def _source_topic(self, topic_id: int):
+        k = self._topic_index.get(topic_id, -1)
+        if k < 0:
+            return types.ForumTopicDeleted(id=topic_id)
+        return types.ForumTopic(
+            id=topic_id, date=BASE_DATE, title=f"Tópico {k + 1}", icon_color=0x6FB9F0,
+            top_message=topic_id + self.per_topic, read_inbox_max_id=0, read_outbox_max_id=0,
+            unread_count=0, unread_mentions_count=0, unread_reactions_count=0,
+            from_id=types.PeerUser(1), notify_settings=types.PeerNotifySettings(),
+        )
+
+    def _history_ids(self, min_id: int, max_id: int, limit: int, topic_id: Optional[int], reverse: bool) -> range:
+        if topic_id:
+            lo, hi = topic_id + 1, topic_id + self.per_topic
+        else:
+            lo, hi = 1, self.last_source_id
+        lo = max(lo, min_id + 1)
+        if max_id:
+            hi = min(hi, max_id - 1)
+        if lo > hi:
+            return range(0)
+        if reverse:
+            return range(lo, min(hi, lo + limit - 1) + 1)
+        return range(hi, max(lo, hi - limit + 1) - 1, -1)
+
+    # ===== Infra simulada =====
+    async def _latency(self):
+        if self.scenario.latency_ms:
+            await _real_sleep(self.scenario.latency_ms / 1000)
+
+    def _maybe_flood(self, request):
+        if self.scenario.flood_rate and self._random.random() < self.scenario.flood_rate:
+            self.flood_waits += 1
+            raise errors.FloodWaitError(request=request, capture=self.scenario.flood_seconds)
+
+    def _service_updates(self, action, topic_id: Optional[int] = None) -> types.Updates:
+        msg_id = self._next_target_id(topic_id)
+        service = types.MessageService(
+            id=msg_id, peer_id=types.PeerChannel(TARGET_ID), date=BASE_DATE, action=action,
+            reply_to=types.MessageReplyHeader(reply_to_msg_id=topic_id, forum_topic=True) if topic_id else None,
+        )
+        return types.Updates(
+            updates=[types.UpdateNewChannelMessage(message=service, pts=msg_id, pts_count=1)],
+            users=[], chats=[], date=BASE_DATE, seq=0,
+        )
+
+    def _next_target_id(self, topic_id: Optional[int] = None) -> int:
+        msg_id = self._target_next_id
+        self._target_next_id += 1
+        topic = self._target_topics.get(topic_id) if topic_id else None
+        if topic is not None:
+            topic[1] = msg_id
+            self._target_topics.move_to_end(topic_id)
+        return msg_id
+
+    def _target_topic(self, topic_id: int, row: list):
+        title, top_message, pinned, closed = row
+        return SimpleNamespace(id=topic_id, title=title, top_message=top_message, pinned=pinned, closed=closed)
+
+    def _list_target_topics(self, offset_id: int, limit: int) -> list:
+        page = [] if offset_id else [self._target_topic(t, self._target_topics[t]) for t in sorted(self._target_pinned_topics)]
+        for topic_id in reversed(self._target_topics):
+            if len(page) >= limit:
+                break
+            row = self._target_topics[topic_id]
+            if row[2] or (offset_id and row[1] >= offset_id):
+                continue
+            page.append(self._target_topic(topic_id, row))
+        return page[:limit]
+
+    def _list_source_topics(self, offset_id: int, limit: int) -> list:
+        # Sem fixados na origem: ordem de atividade = top_message decrescente
+        ordered = self.topic_ids[::-1]
+        if offset_id:
+            ordered = [t for t in ordered if t + self.per_topic < offset_id]
+        return [self._source_topic(t) for t in ordered[:limit]]
+
+    # ===== API usada pelo ClonerService =====
+    async def __call__(self, request, ordered=False, flood_sleep_threshold=None):
+        return await self._call(None, request, ordered=ordered, flood_sleep_threshold=flood_sleep_threshold)
+
+    async def _call(self, sender, request, ordered=False, flood_sleep_threshold=None):
+        self.calls[type(request).__name__] += 1
+        await self._latency()
+
+        if isinstance(request, (SendMessageRequest, SendMediaRequest)):
+            self._maybe_flood(request)
+            if request.random_id in self._random_ids:
+                self.duplicates += 1
+                raise errors.RandomIdDuplicateError(request=request)
+            self._random_ids.add(request.random_id)
+            reply_to = request.reply_to.reply_to_msg_id if request.reply_to else 0
+            msg_id = self._next_target_id(reply_to)
+            self.sent_peer.append(utils.get_peer_id(request.peer))
+            self.sent_reply_to.append(reply_to)
+            self.sent_random_id.append(request.random_id)
+            return types.UpdateShortSentMessage(out=True, id=msg_id, pts=msg_id, pts_count=1, date=BASE_DATE)
+
+        if isinstance(request, GetForumTopicsRequest):
+            is_source = utils.get_peer_id(request.channel) == utils.get_peer_id(self.source)
+            if is_source:
+                topics = self._list_source_topics(request.offset_id, request.limit)
+                messages = [
+                    types.Message(id=t.top_message, peer_id=types.PeerChannel(SOURCE_ID), date=BASE_DATE + datetime.timedelta(seconds=t.top_message), message="")
+                    for t in topics
+                ]
+            else:
+                topics, messages = self._list_target_topics(request.offset_id, request.limit), []
+            return SimpleNamespace(topics=topics, messages=messages, count=len(topics))
+
+        if isinstance(request, GetForumTopicsByIDRequest):
+            return SimpleNamespace(topics=[self._source_topic(t) for t in request.topics], messages=[])
+
+        if isinstance(request, CreateForumTopicRequest):
+            updates = self._service_updates(types.MessageActionTopicCreate(title=request.title, icon_color=request.icon_color))
+            topic_id = updates.updates[0].message.id
+            self._target_topics[topic_id] = [request.title, topic_id, False, False]
+            return updates
+
+        if isinstance(request, EditForumTopicRequest):
+            row = self._target_topics[request.topic_id]
+            if request.title is not None:
+                row[0] = request.title
+            if request.closed is not None:
+                row[3] = request.closed
+            return self._service_updates(types.MessageActionTopicEdit(title=request.title, closed=request.closed), request.topic_id)
+
+        if isinstance(request, UpdatePinnedForumTopicRequest):
+            self._target_topics[request.topic_id][2] = request.pinned
+            if request.pinned:
+                self._target_pinned_topics.add(request.topic_id)
+            else:
+                self._target_pinned_topics.discard(request.topic_id)
+            return types.Updates(updates=[], users=[], chats=[], date=BASE_DATE, seq=0)
+
+        if isinstance(request, SearchRequest):
+            # Só o filtro de fixados é usado pelo serviço
+            if utils.get_peer_id(request.peer) == utils.get_peer_id(self.source):
+                ids = [
+                    i for i in self._history_ids(0, 0, self.last_source_id, request.top_msg_id, reverse=True)
+                    if self.scenario.pin_every and i % self.scenario.pin_every == 0
+                ]
+            else:
+                ids = sorted(self._target_pinned)
+            ids = sorted((i for i in ids if not request.offset_id or i < request.offset_id), reverse=True)[:request.limit]
+            return SimpleNamespace(messages=[SimpleNamespace(id=i) for i in ids])
+
+        if isinstance(request, GetFullChannelRequest):
+            return SimpleNamespace(full_chat=SimpleNamespace(about="Grupo sintético de benchmark"))
+
+        if isinstance(request, (EditTitleRequest, EditPhotoRequest, EditChatAboutRequest)):
+            return types.Updates(updates=[], users=[], chats=[], date=BASE_DATE, seq=0)
+
+        raise NotImplementedError(f"FakeTelegramClient não simula {type(request).__name__}")
+
+    async def get_me(self):
+        self.calls["GetUsersRequest"] += 1
+        return SimpleNamespace(id=1, premium=False)
+
+    async def get_entity(self, entity):
+        peer_id = entity if isinstance(entity, int) else utils.get_peer_id(entity)
+        for chat in (self.source, self.target):
+            if peer_id in (chat.id, utils.get_peer_id(chat)):
+                return chat
+        raise ValueError(f"Entidade desconhecida: {entity}")
+
+    async def get_input_entity(self, entity):
+        return utils.get_input_peer(await self.get_entity(entity))
+
+    async def get_messages(self, entity, limit=None, *, min_id=0, max_id=0, offset_id=0, reverse=False, reply_to=None, ids=None, **kwargs):
+        self.calls["GetRepliesRequest" if reply_to else "GetHistoryRequest"] += 1
+        await self._latency()
+        if ids is not None:
+            if isinstance(ids, int):
+                return self._source_message(ids)
+            return [self._source_message(i) for i in ids]
+        if offset_id and not reverse:
+            max_id = offset_id
+        return [self._source_message(i) for i in self._history_ids(min_id, max_id, limit or 100, reply_to, reverse)]
+
+    async def send_message(self, entity, message, **kwargs):
+        self.calls["SendMessageRequest"] += 1
+        await self._latency()
+        return SimpleNamespace(id=self._next_target_id(), message=message)
+
+    async def pin_message(self, entity, message, notify=False, **kwargs):
+        self.calls["UpdatePinnedMessageRequest"] += 1
+        await self._latency()
+        msg_id = message if isinstance(message, int) else message.id
+        self._target_pinned.add(msg_id)
+        return self._service_updates(types.MessageActionPinMessage()).updates[0].message
+
+    async def unpin_message(self, entity, message=None, **kwargs):
+        self.calls["UpdatePinnedMessageRequest"] += 1
+        await self._latency()
+        self._target_pinned.discard(message if isinstance(message, int) else getattr(message, 'id', None))
+
+    async def delete_messages(self, entity, message_ids, **kwargs):
+        ids = [message_ids] if isinstance(message_ids, int) else list(message_ids)
+        for _ in range(0, len(ids), 100):
+            self.calls["DeleteMessagesRequest"] += 1
+            await self._latency()
+        self.deleted += len(ids)
+
+    async def download_profile_photo(self, entity, file=None, **kwargs):
+        return None
+
+    async def upload_file(self, file, **kwargs):
+        self.calls["SaveFilePartRequest"] += 1
+        await self._latency()
+        return types.InputFile(id=self._random.getrandbits(63), parts=1, name=kwargs.get("file_name", "file"), md5_checksum="")
+
+    async def _parse_message_text(self, message, parse_mode):
+        return message, []
+
+    def _get_response_message(self, request, result, input_chat):
+        return None
+
+    async def disconnect(self):
+        pass
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
@@ -0,0 +1,210 @@
+"""Benchmarks offline do ClonerService com o FakeTelegramClient.
+
+Cada cenário roda em um subprocesso próprio (pico de RSS isolado), em uma pasta
+temporária com banco e manifesto de tópicos novos, por um único ciclo de
+clonagem. As pausas do serviço (delay, anti-flood, FloodWait, criação de
+tópico) não são esperadas de verdade: são somadas e reportadas como "pausas
+simuladas", o que um run real passaria dormindo.
+
+Uso:
+    python -m benchmarks.run_benchmarks                      # todos os cenários
+    python -m benchmarks.run_benchmarks forum_10k_topics     # só os informados
+    python -m benchmarks.run_benchmarks --scale 0.1 --latency-ms 5 --json resultados.json
+"""
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import io
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from rich.console import Console
+from rich.table import Table
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from telethon import utils  # noqa: E402
+
+from benchmarks.fake_telegram import FakeTelegramClient, Scenario  # noqa: E402
+from src.config import AppConfig, AppSettings  # noqa: E402
+from src.service import ClonerService  # noqa: E402
+from src.storage import StorageRepository  # noqa: E402
+
+console = Console()
+
+SCENARIOS = {
+    "forum_10k_topics": Scenario("forum_10k_topics", forum=True, topics=10_000, messages=50_000),
+    "channel_1m": Scenario("channel_1m", forum=False, messages=1_000_000),
+    "flood_heavy": Scenario("flood_heavy", forum=True, topics=20, messages=20_000, flood_rate=0.02, flood_seconds=5),
+    "mixed_content": Scenario(
+        "mixed_content", forum=True, topics=50, messages=20_000,
+        media_every=4, album_every=10, long_text_every=50, pin_every=100, sync_pins=True,
+    ),
+    "forum_to_channel": Scenario("forum_to_channel", forum=True, target_forum=False, topics=200, messages=20_000),
+}
+
+
+def scaled(scenario: Scenario, scale: float, latency_ms: float) -> Scenario:
+    return dataclasses.replace(
+        scenario,
+        topics=max(1, int(scenario.topics * scale)) if scenario.forum else scenario.topics,
+        messages=max(1, int(scenario.messages * scale)),
+        latency_ms=latency_ms if latency_ms >= 0 else scenario.latency_ms,
+    )
+
+
+class SleepRecorder:
+    """Troca asyncio.sleep por uma versão que soma o tempo pedido e só cede o loop."""
+
+    def __init__(self):
+        self.requested_s = 0.0
+        self._original = asyncio.sleep
+
+    async def _sleep(self, delay, result=None):
+        self.requested_s += max(0.0, delay)
+        return await self._original(0, result)
+
+    def __enter__(self):
+        asyncio.sleep = self._sleep
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.sleep = self._original
+        return False
+
+
+async def run_scenario(scenario: Scenario) -> dict:
+    fake = FakeTelegramClient(scenario)
+    source_id, target_id = utils.get_peer_id(fake.source), utils.get_peer_id(fake.target)
+
+    settings = AppSettings(
+        update_msgs_start=False, update_msgs_end=False, clean_visual=True,
+        update_photo=False, update_desc=False, rename_existing_target=False,
+        delay_between_messages=0, pause_every_x_messages=300, pause_duration_s=60,
+        max_session_hours=10_000, sync_pins=scenario.sync_pins,
+    )
+    config = AppConfig(
+        api_id=0, api_hash="", phone="",
+        source_chat_id=source_id, target_chat_id=target_id,
+        max_session_hours=settings.max_session_hours,
+        delay_between_messages=settings.delay_between_messages,
+        pause_every_x_messages=settings.pause_every_x_messages,
+        pause_duration_s=settings.pause_duration_s,
+        batch_size=settings.batch_size,
+        target_created_by_app=True,
+        max_cycles=1,
+    )
+    storage = StorageRepository("cloner_data.db")
+    if scenario.forum:
+        # Manifesto pronto: sem a pausa interativa do primeiro ciclo
+        storage.export_topics_manifest([(t.id, t.title) for t in map(fake._source_topic, fake.topic_ids)])
+
+    service = ClonerService(fake, config, settings, storage)
+    # Offline: sem checagem de internet/hora
+    service._check_internet_and_time = lambda: None
+
+    with SleepRecorder() as sleeps:
+        start = time.perf_counter()
+        await service.run_cloning_cycle()
+        wall = time.perf_counter() - start
+
+    if scenario.forum:
+        source_ids = [i for t in fake.topic_ids for i in range(t + 1, t + fake.per_topic + 1)]
+    else:
+        source_ids = list(range(1, scenario.messages + 1))
+    # Mensagens da origem com envio confirmado (pelo diário de envios)
+    cloned = len(storage.get_target_message_ids(fake.source.id, fake.target.id, source_ids))
+    source_messages = len(source_ids)
+    return {
+        "scenario": scenario.name,
+        "topics": len(fake.topic_ids),
+        "source_messages": source_messages,
+        "cloned_messages": cloned,
+        "missing_messages": source_messages - cloned,
+        "sends": len(fake.sent_random_id),
+        "duplicate_sends": fake.duplicates,
+        "api_calls": fake.total_calls,
+        "api_calls_per_msg": fake.total_calls / max(1, source_messages),
+        "calls_by_type": dict(fake.calls.most_common()),
+        "flood_waits": fake.flood_waits,
+        "wall_s": wall,
+        "msgs_per_s": source_messages / wall if wall else 0.0,
+        "simulated_sleep_s": sleeps.requested_s,
+        # Linux: ru_maxrss em KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_child(scenario: Scenario) -> dict:
+    """Roda o cenário em uma pasta temporária, sem a saída de console do serviço."""
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory(prefix=f"bench_{scenario.name}_") as workdir:
+        os.chdir(workdir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return asyncio.run(run_scenario(scenario))
+
+
+def run_in_subprocess(scenario: Scenario) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run_benchmarks", "--child", json.dumps(dataclasses.asdict(scenario))],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Cenário {scenario.name} falhou:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def print_results(results: list[dict]):
+    table = Table(title="Benchmarks offline do ClonerService")
+    for column in ("Cenário", "Msgs", "Tópicos", "Msgs/s", "Chamadas/msg", "Tempo (s)", "Pausas sim. (s)", "FloodWaits", "Faltando", "Duplicatas", "RSS pico (MB)"):
+        table.add_column(column, justify="right" if column != "Cenário" else "left")
+    for r in results:
+        table.add_row(
+            r["scenario"], str(r["source_messages"]), str(r["topics"]),
+            f"{r['msgs_per_s']:.0f}", f"{r['api_calls_per_msg']:.2f}", f"{r['wall_s']:.1f}",
+            f"{r['simulated_sleep_s']:.0f}", str(r["flood_waits"]), str(r["missing_messages"]), str(r["duplicate_sends"]),
+            f"{r['peak_rss_mb']:.0f}",
+        )
+    console.print(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline do ClonerService")
+    parser.add_argument("scenarios", nargs="*", help=f"Cenários ({', '.join(SCENARIOS)}); padrão: todos")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplica tópicos e mensagens de cada cenário")
+    parser.add_argument("--latency-ms", type=float, default=-1, help="Latência simulada por requisição (padrão: a do cenário)")
+    parser.add_argument("--json", help="Grava os resultados neste arquivo")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(Scenario(**json.loads(args.child)))))
+        return
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"Cenário(s) desconhecido(s): {', '.join(unknown)}")
+
+    results = []
+    for name in names:
+        scenario = scaled(SCENARIOS[name], args.scale, args.latency_ms)
+        console.print(f"[yellow]▶ {name}[/] ({scenario.messages} mensagens, {scenario.topics if scenario.forum else 0} tópicos)")
+        results.append(run_in_subprocess(scenario))
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""Micro-benchmarks e teste de carga do StorageRepository.
+
+Compara modos de acesso ao SQLite com o mesmo código do repositório (só o
+_connect muda):
+
+- percall_rollback → conexão nova por chamada, journal padrão (DELETE)
+- percall_wal      → conexão nova por chamada, WAL (o comportamento atual)
+- pooled_wal       → uma conexão reaproveitada, WAL
+- batched_wal      → conexão reaproveitada, commits agrupados a cada N escritas
+
+Saída em JSON (stdout ou --json) para comparar execuções e pegar regressões:
+    python -m benchmarks.storage_bench
+    python -m benchmarks.storage_bench --scale 0.1 --modes percall_wal batched_wal --json storage.json
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.storage import StorageRepository  # noqa: E402
+
+SOURCE, TARGET = -1001000, -1002000
+
+
+# ===== Modos de armazenamento =====
+class RollbackJournalStorage(StorageRepository):
+    def _init_db(self):
+        super()._init_db()
+        # As conexões do _init_db (ciclo conexão <-> cursor) só fecham na coleta;
+        # sem isso a troca de journal encontra o banco ocupado
+        gc.collect()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+
+
+class PooledStorage(StorageRepository):
+    """Uma conexão por repositório; `with conn` continua fazendo commit/rollback."""
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self, "_conn", None)
+        if conn is None:
+            conn = self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        return conn
+
+    def flush(self):
+        pass
+
+
+class _BatchedConnection:
+    """Proxy da conexão que só efetiva o commit a cada `batch` commits pedidos."""
+
+    def __init__(self, conn: sqlite3.Connection, batch: int):
+        self._conn = conn
+        self._batch = batch
+        self._pending = 0
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self._conn.rollback()
+            self._pending = 0
+        return False
+
+    def commit(self):
+        self._pending += 1
+        if self._pending >= self._batch:
+            self.flush()
+
+    def flush(self):
+        self._conn.commit()
+        self._pending = 0
+
+
+class BatchedStorage(PooledStorage):
+    batch = 100
+
+    def _connect(self):
+        wrapper = getattr(self, "_batched", None)
+        if wrapper is None:
+            wrapper = self._batched = _BatchedConnection(super()._connect(), self.batch)
+        return wrapper
+
+    def flush(self):
+        self._connect().flush()
+
+
+MODES = {
+    "percall_rollback": RollbackJournalStorage,
+    "percall_wal": StorageRepository,
+    "pooled_wal": PooledStorage,
+    "batched_wal": BatchedStorage,
+}
+
+
+def open_storage(mode: str, db_path: str) -> StorageRepository:
+    return MODES[mode](db_path)
+
+
+def attach_storage(mode: str, db_path: str) -> StorageRepository:
+    """Repositório sobre um banco já criado, sem rodar _init_db (que volta o journal para WAL)."""
+    storage = MODES[mode].__new__(MODES[mode])
+    storage.db_path = db_path
+    return storage
+
+
+def flush(storage: StorageRepository):
+    if hasattr(storage, "flush"):
+        storage.flush()
+
+
+def rate(count: int, elapsed: float) -> float:
+    return count / elapsed if elapsed > 0 else 0.0
+
+
+# ===== Benchmarks =====
+def bench_checkpoint_writes(mode: str, db_path: str, scale: float) -> dict:
+    storage = open_storage(mode, db_path)
+    n = max(100, int(5000 * scale))
+    start = time.perf_counter()
+    for i in range(n):
+        storage.save_last_message_id(SOURCE, TARGET, i % 10, i)
+    flush(storage)
+    elapsed = time.perf_counter() - start
+    return {"writes": n, "writes_per_s": rate(n, elapsed), "elapsed_s": elapsed}
+
+
+def bench_topic_map(mode: str, db_path: str, scale: float) -> dict:
+    storage = open_storage(mode, db_path)
+    topics = max(100, int(10_000 * scale))
+    start = time.perf_counter()
+    for t in range(topics):
+        storage.save_topic_mapping(SOURCE, TARGET, t + 1, t + 100_000)
+    flush(storage)
+    insert_elapsed = time.perf_counter() - start
+
+    reads = 50
+    start = time.perf_counter()
+    for _ in range(reads):
+        mapping = storage.get_topic_map(SOURCE, TARGET)
+    read_elapsed = time.perf_counter() - start
+    assert len(mapping) == topics
+    return {
+        "topics": topics,
+        "inserts_per_s": rate(topics, insert_elapsed),
+        "get_topic_map_ms": read_elapsed / reads * 1000,
+    }
+
+
+def bench_failed_churn(mode: str, db_path: str, scale: float) -> dict:
+    storage = open_storage(mode, db_path)
+    rows = max(1000, int(100_000 * scale))
+    topics = 20
+    start = time.perf_counter()
+    for i in range(rows):
+        storage.record_failed_message(SOURCE, TARGET, i % topics, i, "FloodWait")
+    flush(storage)
+    record_elapsed = time.perf_counter() - start
+
+    # Como no retry do serviço: lista por tópico (páginas de 200) e limpa cada uma
+    cleared = 0
+    start = time.perf_counter()
+    for topic in range(topics):
+        while True:
+            ids = storage.list_failed_messages(SOURCE, TARGET, topic)
+            if not ids:
+                break
+            for msg_id in ids:
+                storage.clear_failed_message(SOURCE, TARGET, topic, msg_id)
+            cleared += len(ids)
+            flush(storage)
+    clear_elapsed = time.perf_counter() - start
+    assert cleared == rows
+    return {
+        "rows": rows,
+        "records_per_s": rate(rows, record_elapsed),
+        "clears_per_s": rate(cleared, clear_elapsed),
+    }
+
+
+def _populate_job(db_path: str, source: int, target: int, messages: int):
+    """Histórico de um job: diário de envios, checkpoints, falhas e dedup (sempre em lote)."""
+    storage = BatchedStorage(db_path)
+    for i in range(messages):
+        topic = i % 100
+        storage.reserve_send_part(source, target, topic, i, 0, random.getrandbits(63))
+        storage.mark_send_part_sent(source, target, i, 0, i + 1)
+        if i % 50 == 0:
+            storage.record_failed_message(source, target, topic, i, "erro")
+        if i % 10 == 0:
+            storage.save_dedup_entry(target, random.getrandbits(63), source, topic, i, i + 1)
+    for topic in range(100):
+        storage.save_topic_mapping(source, target, topic, topic + 1)
+        storage.save_last_message_id(source, target, topic, messages)
+    storage.flush()
+
+
+def bench_reset_large(mode: str, db_path: str, scale: float) -> dict:
+    messages = max(1000, int(200_000 * scale))
+    _populate_job(db_path, SOURCE, TARGET, messages)
+    _populate_job(db_path, SOURCE, TARGET - 1, messages)  # outro job no mesmo banco
+    db_mb = sum(os.path.getsize(p) for p in (db_path, f"{db_path}-wal") if os.path.exists(p)) / 1_048_576
+
+    storage = open_storage(mode, db_path)
+    start = time.perf_counter()
+    storage.reset_chat_progress(SOURCE, TARGET)
+    flush(storage)
+    elapsed = time.perf_counter() - start
+    assert storage.get_last_message_id(SOURCE, TARGET - 1, 0) == messages
+    return {"journal_rows": messages * 2, "db_mb": db_mb, "reset_s": elapsed}
+
+
+def bench_many_jobs(mode: str, db_path: str, scale: float) -> dict:
+    """Vários jobs intercalados no mesmo banco (um processo): envio completo de cada mensagem."""
+    storage = open_storage(mode, db_path)
+    jobs = 50
+    per_job = max(20, int(400 * scale))
+    start = time.perf_counter()
+    for i in range(per_job):
+        for job in range(jobs):
+            target = TARGET - job
+            storage.reserve_send_part(SOURCE, target, 1, i, 0, random.getrandbits(63))
+            storage.mark_send_part_sent(SOURCE, target, i, 0, i + 1)
+            storage.save_last_message_id(SOURCE, target, 1, i)
+    flush(storage)
+    elapsed = time.perf_counter() - start
+    messages = jobs * per_job
+    return {"jobs": jobs, "messages": messages, "messages_per_s": rate(messages, elapsed)}
+
+
+def _worker(mode: str, db_path: str, job: int, messages: int, queue):
+    storage = attach_storage(mode, db_path)
+    locked = 0
+    start = time.perf_counter()
+    for i in range(messages):
+        try:
+            storage.reserve_send_part(SOURCE, TARGET - job, 1, i, 0, random.getrandbits(63))
+            storage.mark_send_part_sent(SOURCE, TARGET - job, i, 0, i + 1)
+            storage.save_last_message_id(SOURCE, TARGET - job, 1, i)
+        except sqlite3.OperationalError:
+            locked += 1
+    try:
+        flush(storage)
+    except sqlite3.OperationalError:
+        locked += 1
+    queue.put((time.perf_counter() - start, locked))
+
+
+def bench_multiprocess(mode: str, db_path: str, scale: float) -> dict:
+    """Modo worker: processos escrevendo no mesmo banco ao mesmo tempo."""
+    open_storage(mode, db_path)
+    processes = 4
+    per_process = max(50, int(2000 * scale))
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    workers = [ctx.Process(target=_worker, args=(mode, db_path, p, per_process, queue)) for p in range(processes)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    results = [queue.get(timeout=3600) for _ in workers]
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - start
+    messages = processes * per_process
+    slowest = max(r[0] for r in results)
+    return {
+        "processes": processes,
+        "messages": messages,
+        # Pelo worker mais lento: sem o tempo de subir os processos
+        "messages_per_s": rate(messages, slowest),
+        "slowest_worker_s": slowest,
+        "wall_s": wall,
+        "lock_errors": sum(r[1] for r in results),
+    }
+
+
+BENCHMARKS = {
+    "checkpoint_writes": bench_checkpoint_writes,
+    "topic_map_10k": bench_topic_map,
+    "failed_churn_100k": bench_failed_churn,
+    "reset_large_db": bench_reset_large,
+    "many_jobs": bench_many_jobs,
+    "multiprocess_workers": bench_multiprocess,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do StorageRepository")
+    parser.add_argument("--benchmarks", nargs="*", default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument("--modes", nargs="*", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplica o volume de cada benchmark")
+    parser.add_argument("--json", help="Grava os resultados neste arquivo (padrão: stdout)")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.benchmarks:
+        for mode in args.modes:
+            # Banco novo por medição (em disco: o custo de fsync faz parte do que se mede)
+            with tempfile.TemporaryDirectory(prefix="storage_bench_") as workdir:
+                db_path = os.path.join(workdir, "cloner_data.db")
+                metrics = BENCHMARKS[name](mode, db_path, args.scale)
+            results.append({"benchmark": name, "mode": mode, **metrics})
+            print(f"{name:<22} {mode:<17} {json.dumps(metrics)}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "scale": args.scale,
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
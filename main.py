@@ -1,7 +1,11 @@
+import argparse
 import asyncio
+import contextlib
 import logging
 import os
+import signal
 import sys
+from datetime import datetime
 from telethon import TelegramClient, errors
 from telethon.tl.functions.channels import CreateChannelRequest, ToggleForumRequest
 
@@ -9,35 +13,133 @@ from src.config import setup_logging, AppConfig, save_env_variable
 from src.ui import CLIWizard, console
 from src.storage import StorageRepository
 from src.service import ClonerService
+from src.archive import ArchiveReader, archive_chat_id
+from src.session import BufferedSession
+from src.metrics import Metrics, MetricsExporter, instrument_client, instrument_storage
+from src.tracing import Tracer, trace_storage
+from src.memory import MemoryWatchdog
+from src.dashboard import Dashboard, LiveStatus
+from src.history import RunRecorder
+from src.daemon import JobDaemon, job_settings, load_job_file
+
+def build_session(name: str, settings):
+    """Sessão conforme settings.session_backend (nome = arquivo .session padrão do Telethon)."""
+    if settings.session_backend == "MEMORIA":
+        return BufferedSession(f"{name}.memsession", name)
+    if settings.session_backend == "BANCO":
+        return BufferedSession("cloner_data.db", name)
+    return name
+
+def start_session_flush(client: TelegramClient, settings):
+    if isinstance(client.session, BufferedSession):
+        client.session.start_autoflush(settings.session_flush_s)
+
+async def login(client: TelegramClient, phone: str) -> bool:
+    if await client.is_user_authorized():
+        return True
+    try:
+        console.print(f"[yellow]Enviando código para {phone}...[/]")
+        await client.send_code_request(phone)
+    except Exception as e:
+        console.print(f"[bold red]Erro ao enviar código:[/]. {e}")
+        return False
+
+    code = CLIWizard.request_otp()
+    try:
+        await client.sign_in(phone, code)
+    except errors.SessionPasswordNeededError:
+        pwd = CLIWizard.request_password()
+        await client.sign_in(password=pwd)
+    except Exception as e:
+        console.print(f"[bold red]Falha no Login:[/]. {e}")
+        return False
+    return True
+
+def build_config(api_id: int, api_hash: str, phone: str, settings, session_name: str, **job) -> AppConfig:
+    """AppConfig do job: tempo/limites do settings, infraestrutura das variáveis de ambiente."""
+    return AppConfig(
+        api_id=api_id, api_hash=api_hash, phone=phone,
+        **job,
+        max_session_hours=settings.max_session_hours,
+        pause_duration_hours=settings.pause_duration_hours,
+        delay_between_messages=settings.delay_between_messages,
+        pause_every_x_messages=settings.pause_every_x_messages,
+        pause_duration_s=settings.pause_duration_s,
+        budget_account_per_hour=settings.budget_account_per_hour,
+        budget_account_per_day=settings.budget_account_per_day,
+        budget_target_per_hour=settings.budget_target_per_hour,
+        budget_target_per_day=settings.budget_target_per_day,
+        batch_size=settings.batch_size,
+        session_name=session_name,
+        worker_id=os.getenv('WORKER_ID', ''),
+        metrics_port=int(os.getenv('METRICS_PORT', '0') or 0),
+        metrics_file=os.getenv('METRICS_FILE', ''),
+        metrics_interval_s=int(os.getenv('METRICS_INTERVAL', '30') or 30),
+        trace_file=os.getenv('TRACE_FILE', ''),
+        trace_buffer=int(os.getenv('TRACE_BUFFER', '200000') or 200000),
+        memory_watchdog_cycles=int(os.getenv('MEMORY_WATCHDOG_CYCLES', '0') or 0),
+        memory_top_n=int(os.getenv('MEMORY_TOP', '10') or 10),
+        max_logged_topics=int(os.getenv('MAX_LOGGED_TOPICS', '10000') or 0),
+        max_cached_entities=int(os.getenv('MAX_CACHED_ENTITIES', '20000') or 0),
+    )
+
+def start_telemetry(config: AppConfig, storage: StorageRepository, client: TelegramClient, reader_client=None):
+    """Métricas, exportador, tracer e watchdog de memória (um conjunto por processo)."""
+    metrics = Metrics()
+    # Clientes sempre instrumentados: o histórico de execuções usa a contagem de chamadas à API
+    instrument_client(client, metrics, role="writer")
+    if reader_client:
+        instrument_client(reader_client, metrics, role="reader")
+    exporter = None
+    if config.metrics_port or config.metrics_file:
+        instrument_storage(storage, metrics)
+        exporter = MetricsExporter(metrics, port=config.metrics_port, json_path=config.metrics_file, interval_s=config.metrics_interval_s)
+        exporter.start()
+
+    tracer = Tracer(config.trace_buffer if config.trace_file else 0)
+    if tracer.enabled:
+        trace_storage(storage, tracer)
+    
+    memory = MemoryWatchdog(metrics, every_cycles=config.memory_watchdog_cycles, top_n=config.memory_top_n, max_entities=config.max_cached_entities)
+    return metrics, exporter, tracer, memory
+
+def stop_telemetry(config: AppConfig, exporter, tracer: Tracer):
+    if exporter:
+        exporter.stop()
+    if tracer.enabled:
+        tracer.export(config.trace_file)
+        console.print(f"[dim]Trace gravado em {config.trace_file} (abrir em ui.perfetto.dev)[/]")
 
 async def main():
     CLIWizard.show_welcome()
     
     api_id, api_hash, phone = CLIWizard.get_initial_credentials()
+
+    settings = CLIWizard.load_settings()
     
     console.print("\n[yellow]Conectando aos servidores do Telegram...[/]")
-    # Usa sempre o mesmo nome de sessão (evita criar várias sessões sem querer)
-    session_name = "cloner_session"
-    client = TelegramClient(session_name, api_id, api_hash)
+    # Usa sempre o mesmo nome de sessão (evita criar várias sessões sem querer).
+    # No modo worker, cada processo precisa da sua: SESSION_NAME=cloner_w2 WORKER_ID=w2
+    session_name = os.getenv('SESSION_NAME', "cloner_session")
+    client = TelegramClient(build_session(session_name, settings), api_id, api_hash)
     await client.connect()
+    start_session_flush(client, settings)
     
-    if not await client.is_user_authorized():
-        try:
-            console.print(f"[yellow]Enviando código para {phone}...[/]")
-            await client.send_code_request(phone)
-        except Exception as e:
-            console.print(f"[bold red]Erro ao enviar código:[/]. {e}")
-            return
+    if not await login(client, phone):
+        return
 
-        code = CLIWizard.request_otp()
-        try:
-            await client.sign_in(phone, code)
-        except errors.SessionPasswordNeededError:
-            pwd = CLIWizard.request_password()
-            await client.sign_in(password=pwd)
-        except Exception as e:
-            console.print(f"[bold red]Falha no Login:[/]. {e}")
-            return
+    # Conta leitora opcional (membro da origem): leituras de histórico não consomem os limites da conta que envia
+    reader_client = None
+    reader_session = os.getenv('READER_SESSION')
+    if reader_session:
+        console.print("[yellow]Conectando conta leitora...[/]")
+        reader_client = TelegramClient(build_session(reader_session, settings), api_id, api_hash)
+        await reader_client.connect()
+        start_session_flush(reader_client, settings)
+        if not await reader_client.is_user_authorized():
+            reader_phone = os.getenv('READER_PHONE') or CLIWizard.request_reader_phone()
+            if not await login(reader_client, reader_phone):
+                return
 
     console.print("[bold green]Login realizado com sucesso![/]")
     await asyncio.sleep(1)
@@ -45,7 +147,6 @@ async def main():
     me = await client.get_me()
     is_premium = getattr(me, 'premium', False)
 
-    settings = CLIWizard.load_settings()
     setup_logging(clean_visual=settings.clean_visual)
 
     storage = StorageRepository()
@@ -53,6 +154,9 @@ async def main():
     src = 0
     tgt = 0
     target_created_by_app = False
+    archive_dir = ""
+    restore_dir = ""
+    extra_targets = []
 
     while True:
         choice = CLIWizard.main_menu(is_premium)
@@ -66,6 +170,31 @@ async def main():
             # CORREÇÃO: Lógica para voltar ao menu principal
             if src == 0 and tgt == 0:
                 continue
+
+            # Exportação para pasta local: sem destino no Telegram.
+            # É incremental, então mantém checkpoints e arquivos de exportações anteriores.
+            if tgt == -3:
+                archive_dir = CLIWizard.get_archive_dir(src)
+                save_env_variable('ARCHIVE_DIR', archive_dir)
+                tgt = archive_chat_id(archive_dir)
+                save_env_variable('TARGET_CHAT', str(tgt))
+                save_env_variable('RUN_MODE', 'archive')
+                break
+
+            # Restore: a "origem" é o backup local; o destino segue o fluxo normal (existente ou criado)
+            source_title = None
+            if src == -4:
+                restore_dir, tgt = CLIWizard.get_restore_options()
+                if not restore_dir:
+                    continue
+                archived_source = ArchiveReader(restore_dir).source
+                src, source_title = archived_source.id, archived_source.title
+                save_env_variable('RESTORE_DIR', restore_dir)
+                save_env_variable('SOURCE_CHAT', str(src))
+                save_env_variable('TARGET_CHAT', str(tgt))
+                save_env_variable('RUN_MODE', 'restore')
+            else:
+                save_env_variable('RUN_MODE', 'clone')
             
                         # ATUALIZAÇÃO: Criação automática de destino (canal / grupo normal / fórum)
             # Sentinelas:
@@ -75,8 +204,10 @@ async def main():
             if tgt in (0, -1, -2):
                 try:
                     console.print("\n[yellow]Obtendo dados da origem para criar novo destino...[/]")
-                    source_entity = await client.get_entity(src)
-                    new_title = f"{source_entity.title} [Backup]"
+                    if source_title is None:
+                        source_entity = await client.get_entity(src)
+                        source_title = source_entity.title
+                    new_title = f"{source_title} [Backup]"
 
                     if tgt == -2:
                         console.print(f"[yellow]Criando canal: {new_title}...[/]")
@@ -115,8 +246,15 @@ async def main():
                     input("Enter para voltar...")
                     continue
 
+            # Fan-out: destinos extras recebem os mesmos lotes lidos da origem
+            if not restore_dir:
+                extra_targets = CLIWizard.get_extra_targets()
+                save_env_variable('EXTRA_TARGETS', ",".join(str(t) for t in extra_targets))
+
             console.print("[yellow]Limpando dados anteriores para novo clone...[/]")
             storage.reset_chat_progress(src, tgt)
+            for extra in extra_targets:
+                storage.reset_chat_progress(src, extra)
             break
             
         elif choice == 2:
@@ -127,6 +265,13 @@ async def main():
                 input("\nEnter para voltar...")
                 continue
             src, tgt = int(src_raw), int(tgt_raw)
+            run_mode = os.getenv('RUN_MODE', 'clone')
+            if run_mode == 'clone':
+                extra_targets = [int(t) for t in os.getenv('EXTRA_TARGETS', '').split(",") if t.strip()]
+            elif run_mode == 'archive':
+                archive_dir = os.getenv('ARCHIVE_DIR', '')
+            elif run_mode == 'restore':
+                restore_dir = os.getenv('RESTORE_DIR', '')
             break
             
         elif choice == 3:
@@ -140,34 +285,120 @@ async def main():
         # ATUALIZAÇÃO: Opção Sair renumerada
         elif choice == 5:
             await client.disconnect()
+            if reader_client:
+                await reader_client.disconnect()
             sys.exit(0)
     
-    config = AppConfig(
-        api_id=api_id, api_hash=api_hash, phone=phone,
+    config = build_config(
+        api_id, api_hash, phone, settings, session_name,
         source_chat_id=src, target_chat_id=tgt,
-        max_session_hours=settings.max_session_hours,
-        pause_duration_hours=settings.pause_duration_hours,
-        delay_between_messages=settings.delay_between_messages,
-        pause_every_x_messages=settings.pause_every_x_messages,
-        pause_duration_s=settings.pause_duration_s,
-        batch_size=settings.batch_size,
-        session_name=session_name,
         target_created_by_app=target_created_by_app,
+        archive_dir=archive_dir,
+        restore_dir=restore_dir,
+        extra_target_chat_ids=extra_targets,
     )
-    
-    service = ClonerService(client, config, settings, storage)
+    metrics, exporter, tracer, memory = start_telemetry(config, storage, client, reader_client)
+
+    status = LiveStatus(enabled=settings.live_dashboard)
+    history = RunRecorder(storage, metrics, config, settings)
+    service = ClonerService(client, config, settings, storage, source_client=reader_client, metrics=metrics, tracer=tracer, memory=memory, status=status, history=history)
 
     CLIWizard.show_start_feedback()
 
+    # Painel ao vivo: os logs vão só para o arquivo (o painel ocupa o terminal)
+    if status.enabled:
+        setup_logging(clean_visual=settings.clean_visual, console_output=False)
+    dashboard = Dashboard(service, console=console) if status.enabled else contextlib.nullcontext()
+
     try:
-        await service.run_cloning_cycle()
+        with dashboard:
+            await service.run_cloning_cycle()
     except KeyboardInterrupt:
         console.print("\n[yellow]Parado pelo usuário.[/]")
+    finally:
+        stop_telemetry(config, exporter, tracer)
+        await client.disconnect()
+        if reader_client:
+            await reader_client.disconnect()
+
+async def run_daemon(jobs_file: str):
+    """Modo daemon (sem terminal): jobs, configurações e tópicos vêm do arquivo de jobs (ver src/daemon.py).
+
+    Usa a sessão já salva; sem login, encerra com erro em vez de pedir código.
+    """
+    api_id, api_hash, phone = os.getenv('API_ID'), os.getenv('API_HASH'), os.getenv('PHONE', '')
+    if not api_id or not api_hash:
+        sys.exit("❌ Modo daemon: defina API_ID e API_HASH no .env (ou rode `python main.py` uma vez)")
+    try:
+        load_job_file(jobs_file)
+    except (OSError, ValueError) as e:
+        sys.exit(f"❌ Arquivo de jobs {jobs_file}: {e}")
+
+    settings = CLIWizard.load_settings()
+    setup_logging(clean_visual=settings.clean_visual)
+
+    session_name = os.getenv('SESSION_NAME', "cloner_session")
+    client = TelegramClient(build_session(session_name, settings), int(api_id), api_hash)
+    reader_client = None
+    await client.connect()
+    start_session_flush(client, settings)
+    try:
+        if not await client.is_user_authorized():
+            logging.error("❌ Sessão sem login: rode `python main.py` uma vez para entrar na conta")
+            sys.exit(1)
+
+        reader_session = os.getenv('READER_SESSION')
+        if reader_session:
+            reader_client = TelegramClient(build_session(reader_session, settings), int(api_id), api_hash)
+            await reader_client.connect()
+            start_session_flush(reader_client, settings)
+            if not await reader_client.is_user_authorized():
+                logging.error("❌ Conta leitora sem login: rode `python main.py` uma vez com READER_SESSION")
+                sys.exit(1)
+
+        storage = StorageRepository()
+        infra = build_config(int(api_id), api_hash, phone, settings, session_name)
+        metrics, exporter, tracer, memory = start_telemetry(infra, storage, client, reader_client)
+        run_id = f"daemon-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        # Relógio de trabalho (max_session_hours) contínuo entre os jobs
+        session_start_time = 0.0
+
+        async def run_job(job):
+            nonlocal session_start_time
+            job_cfg = job_settings(settings, job)
+            config = build_config(
+                int(api_id), api_hash, phone, job_cfg, session_name,
+                **job.config_fields(), interactive=False, max_cycles=1,
+            )
+            history = RunRecorder(storage, metrics, config, job_cfg, run_id=run_id)
+            service = ClonerService(client, config, job_cfg, storage, source_client=reader_client, metrics=metrics, tracer=tracer, memory=memory, history=history)
+            service.session_start_time = session_start_time
+            try:
+                await service.run_cloning_cycle()
+            finally:
+                session_start_time = service.session_start_time
+
+        # Supervisor (systemd, Docker...) encerra com SIGTERM: sai pelo finally, gravando sessão e trace
+        with contextlib.suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+
+        logging.info(f"🤖 Modo daemon: {jobs_file}")
+        try:
+            await JobDaemon(jobs_file, run_job).run()
+        except asyncio.CancelledError:
+            logging.info("🛑 Encerrando daemon...")
+        finally:
+            stop_telemetry(infra, exporter, tracer)
     finally:
         await client.disconnect()
+        if reader_client:
+            await reader_client.disconnect()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EncScript - clonagem de chats do Telegram")
+    parser.add_argument("--jobs", default=os.getenv('JOBS_FILE', ''), help="Modo daemon: arquivo de jobs (JSON), sem menus nem prompts")
+    args = parser.parse_args()
     try:
-        asyncio.run(main())
+        asyncio.run(run_daemon(args.jobs) if args.jobs else main())
     except KeyboardInterrupt:
         print("\nSaindo...")
\ No newline at end of file
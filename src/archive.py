@@ -0,0 +1,390 @@
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from telethon import utils
+from telethon.tl.types import MessageMediaWebPage, MessageService
+
+MANIFEST_NAME = "manifest.json"
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl.gz"
+# Início de todo membro gzip (magic + método deflate)
+GZIP_MAGIC = b"\x1f\x8b\x08"
+READ_CHUNK = 64 * 1024
+
+
+def archive_chat_id(root: str) -> int:
+    """ID estável (negativo) que representa o arquivo local nas tabelas de checkpoint.
+
+    IDs de entidades do Telegram usados pelo serviço são sempre positivos, então
+    um valor negativo nunca colide com um destino real.
+    """
+    path = os.path.abspath(root).encode('utf-8')
+    return -(zlib.crc32(path) or 1)
+
+
+# ===== Serialização TL <-> JSON =====
+def to_jsonable(obj):
+    """Converte o resultado de TLObject.to_dict() em algo serializável em JSON."""
+    if isinstance(obj, dict):
+        return {k: to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    if isinstance(obj, bytes):
+        return {"__bytes__": base64.b64encode(obj).decode('ascii')}
+    if isinstance(obj, datetime):
+        return {"__date__": obj.isoformat()}
+    return obj
+
+
+def from_jsonable(obj):
+    """Inverso de to_jsonable: reconstrói bytes, datas e objetos TL (chave '_')."""
+    from telethon.tl import types
+
+    if isinstance(obj, list):
+        return [from_jsonable(v) for v in obj]
+    if not isinstance(obj, dict):
+        return obj
+    if "__bytes__" in obj:
+        return base64.b64decode(obj["__bytes__"])
+    if "__date__" in obj:
+        return datetime.fromisoformat(obj["__date__"])
+
+    data = {k: from_jsonable(v) for k, v in obj.items()}
+    name = data.pop('_', None)
+    if name is None:
+        return data
+    cls = getattr(types, name, None)
+    if cls is None:
+        return None
+    return cls(**data)
+
+
+def media_key(msg) -> Optional[str]:
+    """Chave de conteúdo da mídia: o próprio ID de foto/documento do Telegram."""
+    if getattr(msg, 'photo', None) is not None:
+        return f"photo-{msg.photo.id}"
+    if getattr(msg, 'document', None) is not None:
+        return f"doc-{msg.document.id}"
+    return None
+
+
+def serialize_message(msg, topic_id: int, media_file: Optional[str] = None) -> dict:
+    """Converte uma Message do Telethon em um registro JSON do arquivo."""
+    record = {
+        "id": msg.id,
+        "date": msg.date.isoformat() if msg.date else None,
+        "topic_id": topic_id,
+        "sender_id": msg.sender_id,
+        "text": msg.message or "",
+        "entities": [to_jsonable(e.to_dict()) for e in (msg.entities or [])],
+        "pinned": bool(getattr(msg, 'pinned', False)),
+        "grouped_id": msg.grouped_id,
+    }
+
+    reply = msg.reply_to
+    if reply is not None:
+        record["reply_to"] = {
+            "msg_id": getattr(reply, 'reply_to_msg_id', None),
+            "top_id": getattr(reply, 'reply_to_top_id', None),
+            "forum_topic": bool(getattr(reply, 'forum_topic', False)),
+        }
+
+    if isinstance(msg, MessageService):
+        record["service"] = type(msg.action).__name__
+        return record
+
+    media = msg.media
+    if media is None:
+        return record
+
+    if isinstance(media, MessageMediaWebPage):
+        record["media"] = {"type": "webpage", "url": getattr(media.webpage, 'url', None)}
+    elif msg.photo is not None:
+        record["media"] = {"type": "photo", "key": media_key(msg), "file": media_file}
+    elif msg.document is not None:
+        doc = msg.document
+        record["media"] = {
+            "type": "document",
+            "key": media_key(msg),
+            "file": media_file,
+            "mime": doc.mime_type,
+            "size": doc.size,
+            "attributes": [to_jsonable(a.to_dict()) for a in doc.attributes],
+        }
+    else:
+        # geo, contato, enquete, dado...: guarda o objeto bruto para reconstruir no restore
+        record["media"] = {"type": "other", "raw": to_jsonable(media.to_dict())}
+
+    if getattr(media, 'spoiler', False):
+        record["media"]["spoiler"] = True
+    return record
+
+
+# ===== Membros gzip =====
+def _read_member(f, start: int) -> Optional[Tuple[int, bytes]]:
+    """Descomprime o membro gzip que começa em `start`; (fim, conteúdo) ou None se estiver corrompido/truncado."""
+    f.seek(start)
+    d = zlib.decompressobj(wbits=31)
+    out = []
+    consumed = 0
+    while not d.eof:
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            return None
+        try:
+            out.append(d.decompress(chunk))
+        except zlib.error:
+            return None
+        consumed += len(chunk)
+    return start + consumed - len(d.unused_data), b"".join(out)
+
+
+def _next_magic(f, pos: int) -> Optional[int]:
+    """Posição do próximo início de membro gzip a partir de `pos`."""
+    f.seek(pos)
+    tail = b""
+    while True:
+        chunk = f.read(READ_CHUNK)
+        if not chunk:
+            return None
+        data = tail + chunk
+        i = data.find(GZIP_MAGIC)
+        if i >= 0:
+            return pos - len(tail) + i
+        tail = data[-(len(GZIP_MAGIC) - 1):]
+        pos += len(chunk)
+
+
+def iter_members(path: str) -> Iterator[Tuple[int, int, bytes]]:
+    """(início, fim, conteúdo) de cada membro gzip íntegro do segmento.
+
+    Um membro quebrado (escrita interrompida) é pulado: a leitura continua no
+    próximo início de membro válido em vez de descartar o resto do segmento.
+    """
+    with open(path, 'rb') as f:
+        pos = 0
+        while True:
+            start = _next_magic(f, pos)
+            if start is None:
+                return
+            member = _read_member(f, start)
+            if member is None:
+                pos = start + 1
+                continue
+            end, payload = member
+            yield start, end, payload
+            pos = end
+
+
+class MediaStore:
+    """Diretório de mídias endereçado por conteúdo (ID de foto/documento), sem duplicatas."""
+
+    def __init__(self, root: str):
+        self.root = os.path.join(root, "media")
+
+    def relative_path(self, key: str, ext: str) -> str:
+        shard = hashlib.sha1(key.encode('utf-8')).hexdigest()[:2]
+        return os.path.join("media", shard, f"{key}{ext}")
+
+    def exists(self, rel_path: str) -> bool:
+        return os.path.exists(os.path.join(os.path.dirname(self.root), rel_path))
+
+    def partial_path(self, rel_path: str) -> str:
+        """Caminho temporário de download; só vira definitivo via commit()."""
+        full = os.path.join(os.path.dirname(self.root), rel_path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        return full + ".part"
+
+    def commit(self, rel_path: str):
+        full = os.path.join(os.path.dirname(self.root), rel_path)
+        os.replace(full + ".part", full)
+
+    @staticmethod
+    def extension_for(msg) -> str:
+        try:
+            return utils.get_extension(msg.media) or ""
+        except Exception:
+            return ""
+
+
+class ArchiveWriter:
+    """Escreve o arquivo local: manifest.json + segmentos JSONL comprimidos por tópico.
+
+    Cada lote vira um membro gzip acrescentado ao segmento atual (append-only).
+    Um corte no meio da escrita deixa o último membro truncado: ao reabrir o
+    segmento, o writer corta o arquivo de volta ao fim do último membro íntegro
+    antes de acrescentar (o lote perdido não entrou no checkpoint e é regravado).
+    """
+
+    def __init__(self, root: str, segment_max_bytes: int = 64 * 1024 * 1024):
+        self.root = root
+        self.segment_max_bytes = segment_max_bytes
+        self.media = MediaStore(root)
+        self.chat_id = archive_chat_id(root)
+        self._current_segment: Dict[int, str] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def write_manifest(self, data: dict):
+        path = os.path.join(self.root, MANIFEST_NAME)
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    def _topic_dir(self, topic_id: int) -> str:
+        path = os.path.join(self.root, "topics", str(topic_id))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _segment_for(self, topic_id: int) -> str:
+        path = self._current_segment.get(topic_id)
+        if path is None:
+            topic_dir = self._topic_dir(topic_id)
+            existing = sorted(f for f in os.listdir(topic_dir) if f.startswith(SEGMENT_PREFIX) and f.endswith(SEGMENT_SUFFIX))
+            name = existing[-1] if existing else f"{SEGMENT_PREFIX}{1:06d}{SEGMENT_SUFFIX}"
+            path = os.path.join(topic_dir, name)
+            if os.path.exists(path):
+                self._truncate_broken_tail(path)
+
+        if os.path.exists(path) and os.path.getsize(path) >= self.segment_max_bytes:
+            index = int(os.path.basename(path)[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) + 1
+            path = os.path.join(os.path.dirname(path), f"{SEGMENT_PREFIX}{index:06d}{SEGMENT_SUFFIX}")
+
+        self._current_segment[topic_id] = path
+        return path
+
+    @staticmethod
+    def _truncate_broken_tail(path: str):
+        """Remove o membro truncado deixado por uma escrita interrompida no fim do segmento."""
+        good_end = 0
+        for _, end, _ in iter_members(path):
+            good_end = end
+        size = os.path.getsize(path)
+        if good_end < size:
+            logging.warning(f"⚠️ Segmento {path} com final corrompido: descartando {size - good_end} bytes")
+            with open(path, 'r+b') as f:
+                f.truncate(good_end)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def append_records(self, topic_id: int, records: List[dict]):
+        if not records:
+            return
+        payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode('utf-8')
+        path = self._segment_for(topic_id)
+        with open(path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as gz:
+                gz.write(payload)
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+# ===== Leitura (restore) =====
+@dataclass
+class ArchivedChat:
+    """Substitui a entidade de origem durante o restore (só o que o serviço usa)."""
+    id: int
+    title: str
+    forum: bool = False
+    broadcast: bool = False
+
+
+@dataclass
+class ArchivedTopic:
+    """Mesmos atributos de ForumTopic usados na criação de tópicos no destino."""
+    id: int
+    title: str
+    icon_color: int = 0x6FB9F0
+    icon_emoji_id: Optional[int] = None
+    closed: bool = False
+    pinned: bool = False
+
+
+class ArchiveReader:
+    """Lê um arquivo gerado pelo ArchiveWriter sem carregá-lo inteiro na memória.
+
+    Os segmentos são descomprimidos em streaming, membro a membro; segmentos
+    inteiramente anteriores ao checkpoint são pulados olhando apenas o
+    primeiro registro do segmento seguinte.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.media = MediaStore(root)
+        with open(os.path.join(root, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+
+    @property
+    def source(self) -> ArchivedChat:
+        return ArchivedChat(
+            id=int(self.manifest["source_chat_id"]),
+            title=self.manifest.get("title") or "Chat",
+            forum=bool(self.manifest.get("forum")),
+            broadcast=bool(self.manifest.get("broadcast")),
+        )
+
+    @property
+    def topics(self) -> List[ArchivedTopic]:
+        topics = []
+        for t in self.manifest.get("topics", []):
+            topics.append(ArchivedTopic(
+                id=int(t["id"]),
+                title=t.get("title") or f"Tópico {t['id']}",
+                icon_color=t.get("icon_color") or 0x6FB9F0,
+                icon_emoji_id=t.get("icon_emoji_id"),
+                closed=bool(t.get("closed")),
+                pinned=bool(t.get("pinned")),
+            ))
+        return topics
+
+    def media_path(self, rel_path: str) -> str:
+        return os.path.join(self.root, rel_path)
+
+    def _segments(self, topic_id: int) -> List[str]:
+        topic_dir = os.path.join(self.root, "topics", str(topic_id))
+        if not os.path.isdir(topic_dir):
+            return []
+        names = sorted(f for f in os.listdir(topic_dir) if f.startswith(SEGMENT_PREFIX) and f.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(topic_dir, n) for n in names]
+
+    @staticmethod
+    def _read_segment(path: str) -> Iterator[dict]:
+        # Membros quebrados são pulados; os seguintes continuam sendo lidos
+        for _, _, payload in iter_members(path):
+            for line in payload.decode('utf-8', errors='replace').splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def _first_id(self, path: str) -> Optional[int]:
+        for record in self._read_segment(path):
+            return int(record["id"])
+        return None
+
+    def iter_records(self, topic_id: int, after_id: int = 0) -> Iterator[dict]:
+        """Registros do tópico com ID > after_id, em ordem e sem duplicatas."""
+        segments = self._segments(topic_id)
+        last_id = after_id
+        for i, path in enumerate(segments):
+            if i + 1 < len(segments):
+                next_first = self._first_id(segments[i + 1])
+                if next_first is not None and next_first <= after_id:
+                    continue
+            for record in self._read_segment(path):
+                # Um lote regravado após queda antes do checkpoint aparece repetido
+                if record["id"] <= last_id:
+                    continue
+                last_id = record["id"]
+                yield record
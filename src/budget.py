@@ -0,0 +1,90 @@
+import time
+from typing import Optional
+
+from .storage import StorageRepository
+
+# Janelas deslizantes dos limites
+HOUR_S = 3600
+DAY_S = 86400
+
+
+class SendBudget:
+    """Limites de envio por hora e por dia, por conta e por destino, em janela deslizante.
+
+    Os envios são contados por minuto no SQLite (tabela send_budget): os limites
+    continuam valendo depois de reiniciar o processo e são somados entre todos
+    os processos que usam o mesmo banco. Além do teto de cada janela, os envios
+    são espaçados por igual (janela / limite) em vez de sair em rajada e depois
+    esperar o descanso. Limite 0 = desligado.
+    """
+
+    def __init__(self, storage: StorageRepository, account_per_hour: int = 0, account_per_day: int = 0, target_per_hour: int = 0, target_per_day: int = 0):
+        self.storage = storage
+        # ID da conta que envia (definido pelo serviço após o get_me)
+        self.account_id = 0
+        limits = {
+            "account": [(HOUR_S, account_per_hour), (DAY_S, account_per_day)],
+            "target": [(HOUR_S, target_per_hour), (DAY_S, target_per_day)],
+        }
+        self.limits = {scope: [(w, n) for w, n in windows if n > 0] for scope, windows in limits.items()}
+        self._last_sent: dict[tuple[str, int], float] = {}
+        self._pruned_minute = 0
+
+    @property
+    def enabled(self) -> bool:
+        return any(self.limits.values())
+
+    def next_send_in(self, target_id: int, now: Optional[float] = None) -> tuple[float, str]:
+        """Segundos até o próximo envio permitido (0 = pode enviar) e o limite que está segurando."""
+        if not self.enabled:
+            return 0.0, ""
+        now = time.time() if now is None else now
+        wait, reason = 0.0, ""
+        for scope, key in (("account", self.account_id), ("target", target_id)):
+            windows = self.limits[scope]
+            if not windows:
+                continue
+            longest = max(w for w, _ in windows)
+            usage = self.storage.get_send_budget_usage(scope, key, int((now - longest) // 60))
+            for window_s, limit in windows:
+                window_wait = self._window_wait(scope, key, usage, now, window_s, limit)
+                if window_wait > wait:
+                    per = "h" if window_s == HOUR_S else "dia"
+                    wait, reason = window_wait, f"{limit}/{per} por {'conta' if scope == 'account' else 'destino'}"
+        return wait, reason
+
+    def _window_wait(self, scope: str, key: int, usage: list, now: float, window_s: int, limit: int) -> float:
+        # Um minuto conta na janela enquanto o seu fim estiver dentro dela
+        first = int((now - window_s) // 60)
+        buckets = [(minute, sent) for minute, sent in usage if minute >= first]
+        wait = 0.0
+
+        excess = sum(sent for _, sent in buckets) - limit + 1
+        if excess > 0:
+            # Janela cheia: espera sair dela o minuto que libera a primeira vaga
+            for minute, sent in buckets:
+                excess -= sent
+                if excess <= 0:
+                    wait = (minute + 1) * 60 + window_s - now
+                    break
+
+        # Espaçamento uniforme; sem envio nesta execução, parte do último minuto gravado
+        last = self._last_sent.get((scope, key))
+        if last is None and buckets:
+            last = buckets[-1][0] * 60
+        if last is not None:
+            wait = max(wait, last + window_s / limit - now)
+        return wait
+
+    def record(self, target_id: int, sent: int = 1, now: Optional[float] = None):
+        if not self.enabled:
+            return
+        now = time.time() if now is None else now
+        minute = int(now // 60)
+        self.storage.add_send_budget_usage(self.account_id, target_id, minute, sent)
+        self._last_sent[("account", self.account_id)] = self._last_sent[("target", target_id)] = now
+
+        # Minutos fora da maior janela não servem mais (limpeza uma vez por hora)
+        if minute - self._pruned_minute >= 60:
+            self.storage.prune_send_budget(minute - DAY_S // 60 - 1)
+            self._pruned_minute = minute
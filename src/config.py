@@ -1,7 +1,13 @@
+import atexit
+import json
 import os
+import queue
 import sys
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
 from dotenv import load_dotenv, set_key
 
 load_dotenv()
@@ -30,9 +36,52 @@ class AppSettings:
     pause_every_x_messages: int = 300
     pause_duration_s: int = 60
 
+    # Limites de envio em janela deslizante, gravados no banco (0 = desligado): por conta e por destino
+    budget_account_per_hour: int = 0
+    budget_account_per_day: int = 0
+    budget_target_per_hour: int = 0
+    budget_target_per_day: int = 0
+
     # Performance
     batch_size: int = 100
 
+    # Leitura da origem via sessão takeout (limites de flood mais generosos para exportação em massa)
+    use_takeout: bool = False
+
+    # Exportação local (backup em disco)
+    archive_download_workers: int = 4
+    archive_segment_mb: int = 64
+    restore_upload_ahead: int = 4
+
+    # Deduplicação de reposts: OFF | PULAR (não envia) | LINK (envia link para a 1ª cópia)
+    dedup_mode: str = "OFF"
+
+    # Filtros pré-envio (ver src/filters.py). Ex: {"exclude_media_types": ["sticker"], "date_from": "2024-01-01"}
+    message_filters: dict = field(default_factory=dict)
+
+    # Sincroniza fixados da origem a cada ciclo (inclusive pins/desafixações feitos depois da clonagem)
+    sync_pins: bool = False
+
+    # Modo worker: validade do lease de um tópico (renovado a cada ~1/3 do tempo)
+    lease_ttl_s: int = 120
+
+    # Sessão do Telethon: TELETHON (arquivo .session padrão) | MEMORIA (memória + gravação
+    # periódica em <sessão>.memsession) | BANCO (memória + gravação periódica no cloner_data.db)
+    session_backend: str = "TELETHON"
+    session_flush_s: int = 60
+
+    # Painel ao vivo (rich.Live) no lugar das linhas de log no console
+    live_dashboard: bool = False
+
+    # Fan-out: lotes que um destino pode acumular antes de segurar a leitura dos demais
+    fanout_buffer_batches: int = 4
+
+    # Janela de clonagem (vazio/0 = sem limite). Datas em 'AAAA-MM-DD' ou ISO completo.
+    start_date: str = ""
+    end_date: str = ""
+    min_message_id: int = 0
+    max_message_id: int = 0
+
 @dataclass
 class AppConfig:
     """Configurações de infraestrutura e credenciais."""
@@ -49,12 +98,54 @@ class AppConfig:
     delay_between_messages: float = 5.0
     pause_every_x_messages: int = 300
     pause_duration_s: int = 60
+
+    # Limites de envio por hora/dia (ver src/budget.py; 0 = desligado)
+    budget_account_per_hour: int = 0
+    budget_account_per_day: int = 0
+    budget_target_per_hour: int = 0
+    budget_target_per_day: int = 0
     
     session_name: str = "cloner_session"
 
     # Ajuda o serviço a decidir comportamentos (ex: renomear destino)
     target_created_by_app: bool = False
 
+    # Quando definido, o serviço exporta a origem para esta pasta em vez de enviar a um destino
+    archive_dir: str = ""
+    # Quando definido, o serviço restaura o backup desta pasta no destino
+    restore_dir: str = ""
+
+    # Fan-out: destinos adicionais que recebem os mesmos lotes lidos da origem
+    extra_target_chat_ids: list = field(default_factory=list)
+
+    # Modo worker: vários processos dividem os tópicos via leases no mesmo banco (vazio = desativado)
+    worker_id: str = ""
+
+    # Métricas: porta HTTP local (/metrics e /metrics.json) e arquivo de snapshot JSON (0/vazio = desligado)
+    metrics_port: int = 0
+    metrics_file: str = ""
+    metrics_interval_s: int = 30
+
+    # Tracing: arquivo Chrome trace gravado ao sair (vazio = desligado) e tamanho do buffer circular (spans)
+    trace_file: str = ""
+    trace_buffer: int = 200000
+
+    # Memória: snapshot do tracemalloc a cada N ciclos (0 = desligado) e quantos pontos de crescimento logar
+    memory_watchdog_cycles: int = 0
+    memory_top_n: int = 10
+    # Limites dos caches internos (0 = sem limite): tópicos já logados e entidades em memória do Telethon/sessão
+    max_logged_topics: int = 10000
+    max_cached_entities: int = 20000
+
+    # Ciclos de clonagem antes de encerrar (0 = contínuo, dormindo 60s entre ciclos)
+    max_cycles: int = 0
+
+    # Seleção de tópicos sem o topics_config.txt (modo daemon): só estes / todos menos estes (vazio = sem filtro)
+    topic_ids: list = field(default_factory=list)
+    skip_topic_ids: list = field(default_factory=list)
+    # False = sem terminal (modo daemon): o serviço nunca espera resposta do usuário
+    interactive: bool = True
+
     # Padrão único para nome do backup
     backup_title_template: str = "{title} [Backup]"
 
@@ -65,17 +156,86 @@ class AppConfig:
     def max_session_seconds(self) -> float:
         return self.max_session_hours * 3600
 
-def setup_logging(clean_visual: bool = False):
-    """Configura logging."""
+# Logger das linhas por mensagem (caminho quente): limitado por RateLimitFilter
+MESSAGE_LOGGER = "cloner.messages"
+
+class JsonLinesFormatter(logging.Formatter):
+    """Um objeto JSON por linha, com os campos estruturados (job, tópico, mensagem) quando presentes."""
+    FIELDS = ("job", "topic", "msg_id")
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for name in self.FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                data[name] = value
+        return json.dumps(data, ensure_ascii=False)
+
+class RateLimitFilter(logging.Filter):
+    """Deixa passar no máximo `per_second` registros por segundo; o próximo aceito informa quantos foram suprimidos."""
+
+    def __init__(self, per_second: int):
+        super().__init__()
+        self.per_second = per_second
+        self._window = 0
+        self._count = 0
+        self._suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.per_second <= 0:
+            return True
+        window = int(record.created)
+        if window != self._window:
+            self._window = window
+            self._count = 0
+        self._count += 1
+        if self._count > self.per_second:
+            self._suppressed += 1
+            return False
+        if self._suppressed:
+            record.msg = f"{record.msg} (+{self._suppressed} suprimidas)"
+            self._suppressed = 0
+        return True
+
+_log_listener: Optional[QueueListener] = None
+
+def stop_logging():
+    """Esvazia a fila e fecha os arquivos de log (chamado também no encerramento do processo)."""
+    global _log_listener
+    if _log_listener is None:
+        return
+    _log_listener.stop()
+    for handler in _log_listener.handlers:
+        handler.close()
+    _log_listener = None
+
+def setup_logging(clean_visual: bool = False, console_output: bool = True):
+    """Configura logging.
+
+    O laço de eventos só enfileira os registros (QueueHandler); a escrita em
+    disco e no terminal fica em uma thread própria (QueueListener). Ambiente:
+    LOG_MAX_MB/LOG_BACKUPS (rotação do cloner.log), LOG_JSON=1 (também grava
+    cloner.jsonl estruturado) e LOG_MESSAGES_PER_S (limite das linhas por
+    mensagem; 0 = sem limite). Com `console_output=False` (painel ao vivo)
+    os registros vão só para os arquivos.
+    """
     root = logging.getLogger()
     
     if root.handlers:
         for handler in root.handlers[:]:
             root.removeHandler(handler)
+    stop_logging()
 
     level_console = logging.ERROR if clean_visual else logging.INFO
+    max_bytes = int(float(os.getenv('LOG_MAX_MB', '20') or 0) * 1_048_576)
+    backups = int(os.getenv('LOG_BACKUPS', '5') or 0)
 
-    file_handler = logging.FileHandler("cloner.log", encoding='utf-8')
+    file_handler = RotatingFileHandler("cloner.log", maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', datefmt='%H:%M:%S'))
 
@@ -83,11 +243,29 @@ def setup_logging(clean_visual: bool = False):
     console_handler.setLevel(level_console)
     console_handler.setFormatter(logging.Formatter('%(message)s'))
 
+    handlers = [file_handler, console_handler] if console_output else [file_handler]
+    if os.getenv('LOG_JSON', '').lower() in ('1', 'true', 'sim'):
+        json_handler = RotatingFileHandler("cloner.jsonl", maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        json_handler.setLevel(logging.INFO)
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+
+    global _log_listener
+    log_queue = queue.SimpleQueue()
+    _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+
     root.setLevel(logging.INFO)
-    root.addHandler(file_handler)
-    root.addHandler(console_handler)
+    root.addHandler(QueueHandler(log_queue))
+
+    messages = logging.getLogger(MESSAGE_LOGGER)
+    for old in messages.filters[:]:
+        messages.removeFilter(old)
+    messages.addFilter(RateLimitFilter(int(os.getenv('LOG_MESSAGES_PER_S', '10') or 0)))
     
     logging.getLogger('telethon').setLevel(logging.WARNING)
 
+atexit.register(stop_logging)
+
 def save_env_variable(key: str, value: str):
     set_key('.env', key, str(value))
\ No newline at end of file
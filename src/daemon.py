@@ -0,0 +1,228 @@
+"""Modo daemon: clonagem sem terminal, guiada por um arquivo de jobs (JSON).
+
+    {
+        "settings": {"delay_between_messages": 3},
+        "jobs": [
+            {"name": "forum-a", "source": -1001111, "target": -1002222, "skip_topics": [1]},
+            {"source": -1003333, "target": -1004444, "extra_targets": [-1005555], "settings": {"batch_size": 50}},
+            {"mode": "archive", "source": -1006666, "archive_dir": "backups/canal"},
+            {"mode": "restore", "restore_dir": "backups/canal", "target": -1007777, "enabled": false}
+        ]
+    }
+
+`settings` (no topo e por job) sobrescreve o settings.json. Os jobs rodam um
+ciclo cada, em sequência, e recomeçam; o arquivo é relido quando muda, sem
+reconectar. Um job alterado ou removido no meio do ciclo é interrompido (o
+diário de envios evita duplicatas na retomada).
+"""
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from .archive import ArchiveReader, archive_chat_id
+from .config import AppSettings
+
+# Intervalo de checagem do arquivo de jobs
+JOB_FILE_POLL_S = 10
+# Espera entre rodadas (como o intervalo entre ciclos do serviço)
+ROUND_SLEEP_S = 60
+
+MODES = ("clone", "archive", "restore")
+
+
+@dataclass
+class JobSpec:
+    name: str
+    mode: str = "clone"
+    source: int = 0
+    target: int = 0
+    extra_targets: list = field(default_factory=list)
+    archive_dir: str = ""
+    restore_dir: str = ""
+    # Só estes tópicos / todos menos estes (vazio = sem filtro)
+    topics: list = field(default_factory=list)
+    skip_topics: list = field(default_factory=list)
+    settings: dict = field(default_factory=dict)
+
+    def config_fields(self) -> dict:
+        """Campos do AppConfig deste job (o restante vem do main.build_config)."""
+        fields = {"topic_ids": self.topics, "skip_topic_ids": self.skip_topics}
+        if self.mode == "archive":
+            return {**fields, "source_chat_id": self.source, "target_chat_id": archive_chat_id(self.archive_dir), "archive_dir": self.archive_dir}
+        if self.mode == "restore":
+            source = ArchiveReader(self.restore_dir).source
+            return {**fields, "source_chat_id": source.id, "target_chat_id": self.target, "restore_dir": self.restore_dir}
+        return {**fields, "source_chat_id": self.source, "target_chat_id": self.target, "extra_target_chat_ids": self.extra_targets}
+
+
+def _int_list(value, what: str) -> list:
+    if not isinstance(value, list) or not all(isinstance(v, int) for v in value):
+        raise ValueError(f"{what}: esperado uma lista de IDs numéricos")
+    return value
+
+
+def _check_settings(value, what: str) -> dict:
+    if not isinstance(value, dict):
+        raise ValueError(f"{what}: esperado um objeto")
+    known = {f.name for f in dataclasses.fields(AppSettings)}
+    unknown = sorted(set(value) - known)
+    if unknown:
+        raise ValueError(f"{what}: configurações desconhecidas: {', '.join(unknown)}")
+    return value
+
+
+def parse_job(raw: dict, index: int, base_settings: dict) -> Optional[JobSpec]:
+    """Valida um job do arquivo; None se estiver desligado (`"enabled": false`)."""
+    what = f"jobs[{index}]"
+    if not isinstance(raw, dict):
+        raise ValueError(f"{what}: esperado um objeto")
+    if not raw.get("enabled", True):
+        return None
+
+    mode = raw.get("mode", "clone")
+    if mode not in MODES:
+        raise ValueError(f"{what}: mode deve ser um de {', '.join(MODES)}")
+    for key in ("source", "target"):
+        if not isinstance(raw.get(key, 0), int):
+            raise ValueError(f"{what}: {key} deve ser um ID numérico")
+
+    source, target = raw.get("source", 0), raw.get("target", 0)
+    if mode != "restore" and not source:
+        raise ValueError(f"{what}: falta o source")
+    if mode != "archive" and not target:
+        raise ValueError(f"{what}: falta o target (o destino precisa existir; o daemon não cria chats)")
+    if mode == "archive" and not raw.get("archive_dir"):
+        raise ValueError(f"{what}: falta o archive_dir")
+    if mode == "restore" and not raw.get("restore_dir"):
+        raise ValueError(f"{what}: falta o restore_dir")
+
+    settings = dict(base_settings)
+    settings.update(_check_settings(raw.get("settings", {}), f"{what}.settings"))
+    return JobSpec(
+        name=str(raw.get("name") or f"{source or raw.get('restore_dir')}->{target or raw.get('archive_dir')}"),
+        mode=mode,
+        source=source,
+        target=target,
+        extra_targets=_int_list(raw.get("extra_targets", []), f"{what}.extra_targets"),
+        archive_dir=raw.get("archive_dir", ""),
+        restore_dir=raw.get("restore_dir", ""),
+        topics=_int_list(raw.get("topics", []), f"{what}.topics"),
+        skip_topics=_int_list(raw.get("skip_topics", []), f"{what}.skip_topics"),
+        settings=settings,
+    )
+
+
+def load_job_file(path: str) -> list[JobSpec]:
+    """Lê e valida o arquivo de jobs (ValueError com a causa se estiver inválido)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON inválido: {e}") from e
+    if not isinstance(data, dict) or not isinstance(data.get("jobs"), list):
+        raise ValueError('esperado um objeto com a lista "jobs"')
+
+    base_settings = _check_settings(data.get("settings", {}), "settings")
+    jobs = []
+    for i, raw in enumerate(data["jobs"]):
+        job = parse_job(raw, i, base_settings)
+        if job is not None:
+            jobs.append(job)
+    names = [job.name for job in jobs]
+    duplicated = sorted({n for n in names if names.count(n) > 1})
+    if duplicated:
+        raise ValueError(f"nomes de job repetidos: {', '.join(duplicated)}")
+    return jobs
+
+
+def job_settings(base: AppSettings, job: JobSpec) -> AppSettings:
+    """settings.json com as sobrescritas do arquivo de jobs (sem painel ao vivo: não há terminal)."""
+    return dataclasses.replace(base, **{**job.settings, "live_dashboard": False})
+
+
+class JobDaemon:
+    """Roda os jobs do arquivo em rodízio e acompanha as mudanças do arquivo.
+
+    `run_job(job)` executa um ciclo do job (o main.py monta o serviço). O arquivo
+    é checado a cada JOB_FILE_POLL_S: uma versão inválida é ignorada (fica valendo
+    a anterior) e um job em andamento que mudou ou saiu do arquivo é cancelado.
+    """
+
+    def __init__(self, path: str, run_job: Callable[[JobSpec], Awaitable[None]], poll_s: float = JOB_FILE_POLL_S):
+        self.path = path
+        self.run_job = run_job
+        self.poll_s = poll_s
+        self.jobs: list[JobSpec] = load_job_file(path)
+        self._mtime = self._file_mtime()
+        self._changed = asyncio.Event()
+        self._current: Optional[JobSpec] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _file_mtime(self) -> float:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return 0.0
+
+    async def run(self):
+        watcher = asyncio.ensure_future(self._watch())
+        try:
+            while True:
+                self._changed.clear()
+                if not self.jobs:
+                    logging.info(f"📄 Nenhum job ativo em {self.path}. Aguardando alterações...")
+                for job in list(self.jobs):
+                    if job not in self.jobs:
+                        continue
+                    await self._run_one(job)
+                    if self._changed.is_set() and job not in self.jobs:
+                        # Arquivo alterado: recomeça pela nova lista
+                        break
+                if not self._changed.is_set():
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), timeout=ROUND_SLEEP_S if self.jobs else None)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            watcher.cancel()
+            if self._task is not None:
+                self._task.cancel()
+
+    async def _run_one(self, job: JobSpec):
+        logging.info(f"▶️ Job {job.name} ({job.mode})")
+        self._current = job
+        self._task = asyncio.ensure_future(self.run_job(job))
+        try:
+            # wait() não repassa o cancelamento do job (só o do daemon)
+            await asyncio.wait({self._task})
+        finally:
+            self._current = None
+        if self._task.cancelled():
+            logging.info(f"🔄 Job {job.name} interrompido: alterado ou removido do arquivo de jobs")
+        elif self._task.exception() is not None:
+            e = self._task.exception()
+            logging.error(f"❌ Job {job.name} falhou: {type(e).__name__}: {e}")
+        self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_s)
+            mtime = self._file_mtime()
+            if mtime == self._mtime:
+                continue
+            self._mtime = mtime
+            try:
+                jobs = load_job_file(self.path)
+            except (OSError, ValueError) as e:
+                logging.error(f"❌ Arquivo de jobs inválido ({e}); mantendo a versão anterior")
+                continue
+
+            logging.info(f"📄 Arquivo de jobs recarregado: {len(jobs)} job(s) ativo(s)")
+            self.jobs = jobs
+            if self._current is not None and self._current not in jobs and self._task is not None:
+                self._task.cancel()
+            self._changed.set()
@@ -0,0 +1,204 @@
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from rich.console import Group
+from rich.live import Live
+from rich.panel import Panel
+from rich.progress_bar import ProgressBar
+from rich.table import Table
+
+# Taxa fixa de redesenho do painel (independente da vazão de mensagens)
+REFRESH_PER_SECOND = 2
+# Janela da taxa de envio exibida
+RATE_WINDOW_S = 60
+# Intervalo mínimo entre consultas ao banco (fila de falhas) feitas pelo painel
+FAILED_POLL_S = 5
+# Tópicos exibidos (os mais recentes)
+MAX_TOPIC_ROWS = 12
+
+
+class TopicProgress:
+    __slots__ = ("title", "top_id", "start_id", "last_id", "sent", "done")
+
+    def __init__(self, title: str, top_id: int):
+        self.title = title
+        self.top_id = top_id
+        self.start_id = 0
+        self.last_id = 0
+        self.sent = 0
+        self.done = False
+
+
+class LiveStatus:
+    """Estado do ciclo lido pelo painel ao vivo.
+
+    O serviço só atualiza campos (custo de atribuição); quem formata e
+    desenha é a thread do rich.Live, na sua própria cadência. Desligado
+    (`enabled=False`), todas as chamadas retornam na hora.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.phase = "Iniciando..."
+        self.job: Optional[tuple[int, int]] = None
+        self.topics: "OrderedDict[int, TopicProgress]" = OrderedDict()
+        self.total_sent = 0
+        self._sent_at: deque = deque()
+        self.flood_waits: deque = deque(maxlen=8)
+
+    def set_phase(self, phase: str):
+        if self.enabled:
+            self.phase = phase
+
+    def set_job(self, source_id: int, target_id: int):
+        if self.enabled:
+            self.job = (source_id, target_id)
+
+    def plan(self, topics: dict[int, tuple[str, int]]):
+        """Tópicos do ciclo: ID -> (título, último ID conhecido na origem; 0 = desconhecido)."""
+        if not self.enabled:
+            return
+        for topic_id, (title, top_id) in topics.items():
+            progress = self.topics.get(topic_id)
+            if progress is None:
+                self.topics[topic_id] = TopicProgress(title, top_id)
+            else:
+                progress.title, progress.top_id = title, max(top_id, progress.top_id)
+
+    def topic_started(self, topic_id: int, last_id: int):
+        if not self.enabled:
+            return
+        progress = self.topics.get(topic_id)
+        if progress is None:
+            progress = self.topics[topic_id] = TopicProgress(f"Tópico {topic_id}", 0)
+        progress.start_id = progress.last_id = last_id
+        progress.done = False
+        # Tópico ativo vai para o fim (as linhas exibidas são as mais recentes)
+        self.topics.move_to_end(topic_id)
+
+    def message_sent(self, topic_id: int, msg_id: int):
+        if not self.enabled:
+            return
+        self.total_sent += 1
+        now = time.monotonic()
+        self._sent_at.append(now)
+        while self._sent_at and self._sent_at[0] < now - RATE_WINDOW_S:
+            self._sent_at.popleft()
+        progress = self.topics.get(topic_id)
+        if progress is not None:
+            progress.sent += 1
+            progress.last_id = max(progress.last_id, msg_id)
+
+    def topic_done(self, topic_id: int):
+        progress = self.topics.get(topic_id) if self.enabled else None
+        if progress is not None:
+            progress.done = True
+
+    def flood_wait(self, seconds: int):
+        if self.enabled:
+            self.flood_waits.append((time.time(), seconds))
+
+    def send_rate(self) -> float:
+        sent_at = list(self._sent_at)
+        if not sent_at:
+            return 0.0
+        window = min(RATE_WINDOW_S, max(1.0, time.monotonic() - sent_at[0]))
+        return len([t for t in sent_at if t >= time.monotonic() - RATE_WINDOW_S]) / window
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = max(0, int(seconds))
+    return f"{seconds // 3600:d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class Dashboard:
+    """Painel rich.Live com o progresso do serviço, redesenhado em taxa fixa por uma thread própria."""
+
+    def __init__(self, service, console=None):
+        self.service = service
+        self.status: LiveStatus = service.status
+        self._live = Live(self, console=console, refresh_per_second=REFRESH_PER_SECOND, transient=False)
+        self._failed = 0
+        self._failed_polled_at = 0.0
+
+    def __enter__(self):
+        self._live.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._live.__exit__(*exc)
+
+    def _failed_count(self) -> int:
+        """Tamanho da fila de falhas (consulta o banco no máximo a cada FAILED_POLL_S)."""
+        job = self.status.job
+        now = time.monotonic()
+        if job is not None and now - self._failed_polled_at >= FAILED_POLL_S:
+            self._failed_polled_at = now
+            try:
+                self._failed = self.service.storage.count_failed_messages(*job)
+            except Exception:
+                pass
+        return self._failed
+
+    def _time_to_pause(self) -> str:
+        service = self.service
+        if service.session_start_time <= 0:
+            return "-"
+        remaining = service.session_start_time + service.config.max_session_seconds - time.time()
+        return _format_duration(remaining)
+
+    def _summary(self) -> Table:
+        status = self.status
+        grid = Table.grid(padding=(0, 3))
+        for _ in range(5):
+            grid.add_column()
+        failed = self._failed_count()
+        grid.add_row(
+            f"[bold]{status.phase}[/]",
+            f"Envio: [bold cyan]{status.send_rate():.2f}[/] msg/s",
+            f"Enviadas: [bold cyan]{status.total_sent}[/]",
+            f"Descanso em: [bold cyan]{self._time_to_pause()}[/]",
+            f"Falhas pendentes: [bold {'red' if failed else 'green'}]{failed}[/]",
+        )
+        return grid
+
+    def _topics_table(self) -> Table:
+        table = Table(expand=True, box=None, pad_edge=False)
+        table.add_column("Tópico", ratio=3, no_wrap=True)
+        table.add_column("Progresso (por ID)", ratio=4)
+        table.add_column("Enviadas", justify="right")
+        table.add_column("Último ID", justify="right")
+
+        try:
+            rows = list(self.status.topics.items())[-MAX_TOPIC_ROWS:]
+        except RuntimeError:
+            # Alterado pelo serviço durante a cópia: fica para o próximo quadro
+            rows = []
+        for topic_id, p in rows:
+            if p.done:
+                bar = ProgressBar(total=1, completed=1, finished_style="green")
+            elif p.top_id > p.start_id:
+                bar = ProgressBar(total=p.top_id - p.start_id, completed=min(p.last_id, p.top_id) - p.start_id)
+            elif p.start_id or p.sent:
+                # Sem o último ID da origem (grupo/canal): barra indeterminada
+                bar = ProgressBar(total=None, pulse=True)
+            else:
+                bar = ProgressBar(total=1, completed=0)
+            table.add_row(f"{p.title} [dim]#{topic_id}[/]", bar, str(p.sent), str(p.last_id or "-"))
+        return table
+
+    def _flood_history(self) -> str:
+        waits = list(self.status.flood_waits)
+        if not waits:
+            return "[dim]Nenhum FloodWait nesta execução[/]"
+        return "FloodWait: " + "  ".join(
+            f"[yellow]{time.strftime('%H:%M:%S', time.localtime(at))}[/] {seconds}s" for at, seconds in reversed(waits)
+        )
+
+    def __rich__(self):
+        # Chamado pela thread de refresh do Live; o serviço nunca espera pelo desenho
+        return Panel(
+            Group(self._summary(), "", self._topics_table(), "", self._flood_history()),
+            title="EncScript — Clonagem", border_style="yellow",
+        )
@@ -0,0 +1,82 @@
+import hashlib
+import math
+from typing import Optional
+
+from telethon.tl.types import MessageMediaDocument, MessageMediaPhoto, MessageMediaWebPage
+
+from .storage import StorageRepository
+
+
+def content_hash(msg) -> Optional[int]:
+    """Hash compacto (64 bits, com sinal para caber no INTEGER do SQLite) do conteúdo da mensagem.
+
+    Mídias são identificadas pelo ID da foto/documento no Telegram (um repost
+    reaproveita o mesmo arquivo); textos puros e com prévia de link, pelo texto
+    + entidades (msg.photo/msg.document também devolvem a imagem da prévia, que
+    posts diferentes podem compartilhar).
+    """
+    media = msg.media
+    if isinstance(media, MessageMediaPhoto) and media.photo is not None:
+        key = f"p:{media.photo.id}"
+    elif isinstance(media, MessageMediaDocument) and media.document is not None:
+        key = f"d:{media.document.id}"
+    elif media is None or isinstance(media, MessageMediaWebPage):
+        text = msg.message or ""
+        if not text:
+            return None
+        entities = ";".join(
+            f"{type(e).__name__}:{e.offset}:{e.length}:{getattr(e, 'url', '')}"
+            for e in (msg.entities or [])
+        )
+        key = f"t:{text}\x00{entities}"
+    else:
+        # Enquetes, localização, contatos...: não deduplicamos
+        return None
+
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class BloomFilter:
+    """Filtro de Bloom em memória: responde "com certeza não existe" sem tocar no banco."""
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: int):
+        digest = hashlib.blake2b(value.to_bytes(8, 'big', signed=True), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, value: int):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value: int) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+class DedupIndex:
+    """Índice de conteúdo já enviado a um destino (SQLite), com Bloom filter na frente."""
+
+    def __init__(self, storage: StorageRepository, target_chat: int, capacity: int = 1_000_000):
+        self.storage = storage
+        self.target_chat = target_chat
+        self.bloom = BloomFilter(capacity)
+        for h in storage.list_dedup_hashes(target_chat):
+            self.bloom.add(h)
+
+    def lookup(self, h: int) -> int:
+        """ID da primeira cópia no destino (0 se o conteúdo é inédito)."""
+        if h not in self.bloom:
+            return 0
+        return self.storage.get_dedup_target_message_id(self.target_chat, h)
+
+    def remember(self, h: int, source_chat: int, topic_id: int, msg_id: int, target_msg_id: int):
+        self.bloom.add(h)
+        self.storage.save_dedup_entry(self.target_chat, h, source_chat, topic_id, msg_id, target_msg_id)
@@ -0,0 +1,152 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from telethon.tl.types import MessageMediaWebPage, MessageService
+
+# Tipos aceitos em "media_types" / "exclude_media_types"
+MEDIA_TYPES = (
+    "text", "webpage", "service", "photo", "video", "round", "voice", "audio",
+    "gif", "sticker", "document", "poll", "geo", "contact", "dice", "other",
+)
+
+# Chaves aceitas em AppSettings.message_filters
+FILTER_KEYS = (
+    "media_types", "exclude_media_types",
+    "min_size", "max_size",
+    "date_from", "date_to",
+    "sender_ids", "exclude_sender_ids",
+    "keywords", "exclude_keywords",
+    "text_regex", "exclude_text_regex",
+)
+
+
+def media_type(msg) -> str:
+    """Classifica a mensagem em um dos MEDIA_TYPES."""
+    if isinstance(msg, MessageService):
+        return "service"
+    media = msg.media
+    if media is None:
+        return "text"
+    if isinstance(media, MessageMediaWebPage):
+        return "webpage"
+    if msg.photo is not None:
+        return "photo"
+    if msg.video_note is not None:
+        return "round"
+    if msg.gif is not None:
+        return "gif"
+    if msg.video is not None:
+        return "video"
+    if msg.voice is not None:
+        return "voice"
+    if msg.audio is not None:
+        return "audio"
+    if msg.sticker is not None:
+        return "sticker"
+    if msg.document is not None:
+        return "document"
+    if msg.poll is not None:
+        return "poll"
+    if msg.geo is not None:
+        return "geo"
+    if msg.contact is not None:
+        return "contact"
+    if msg.dice is not None:
+        return "dice"
+    return "other"
+
+
+def parse_date(value: str, end_of_day: bool = False) -> datetime:
+    """Aceita 'AAAA-MM-DD' ou ISO completo; sem fuso, assume UTC (como msg.date)."""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    if end_of_day and len(value) == 10:
+        # Só a data: inclui o dia inteiro
+        dt += timedelta(days=1)
+    return dt
+
+
+def _compile_text_rule(key: str, value) -> "re.Pattern":
+    """keywords: lista de palavras (qualquer uma); *_regex: expressão regular. Sem diferenciar maiúsculas."""
+    pattern = "|".join(re.escape(w) for w in value) if key.endswith("keywords") else value
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"Regex inválida em {key}: {e}")
+
+
+def compile_message_filter(rules: dict) -> Optional[Callable[[object], bool]]:
+    """Compila as regras de AppSettings.message_filters em um único predicado.
+
+    O predicado retorna True quando a mensagem deve ser enviada. Sem regras,
+    retorna None (nenhum custo por mensagem). Regras inválidas geram ValueError.
+    """
+    if not rules:
+        return None
+
+    unknown = set(rules) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Filtro(s) desconhecido(s): {', '.join(sorted(unknown))}")
+
+    checks = []
+
+    for key in ("media_types", "exclude_media_types"):
+        kinds = rules.get(key)
+        if not kinds:
+            continue
+        invalid = set(kinds) - set(MEDIA_TYPES)
+        if invalid:
+            raise ValueError(f"Tipo(s) de mídia inválido(s) em {key}: {', '.join(sorted(invalid))}")
+        kinds = frozenset(kinds)
+        if key == "media_types":
+            checks.append(lambda m, k=kinds: media_type(m) in k)
+        else:
+            checks.append(lambda m, k=kinds: media_type(m) not in k)
+
+    min_size = int(rules.get("min_size") or 0)
+    max_size = int(rules.get("max_size") or 0)
+    if min_size or max_size:
+        def size_ok(m):
+            file = m.file
+            if file is None or file.size is None:
+                # Sem arquivo: regra de tamanho não se aplica
+                return True
+            if min_size and file.size < min_size:
+                return False
+            if max_size and file.size > max_size:
+                return False
+            return True
+        checks.append(size_ok)
+
+    if rules.get("date_from"):
+        date_from = parse_date(rules["date_from"])
+        checks.append(lambda m: m.date is None or m.date >= date_from)
+    if rules.get("date_to"):
+        date_to = parse_date(rules["date_to"], end_of_day=True)
+        checks.append(lambda m: m.date is None or m.date < date_to)
+
+    if rules.get("sender_ids"):
+        senders = frozenset(int(x) for x in rules["sender_ids"])
+        checks.append(lambda m: m.sender_id in senders)
+    if rules.get("exclude_sender_ids"):
+        blocked = frozenset(int(x) for x in rules["exclude_sender_ids"])
+        checks.append(lambda m: m.sender_id not in blocked)
+
+    for key in ("keywords", "exclude_keywords", "text_regex", "exclude_text_regex"):
+        if not rules.get(key):
+            continue
+        regex = _compile_text_rule(key, rules[key])
+        if not key.startswith("exclude_"):
+            checks.append(lambda m, r=regex: r.search(m.message or "") is not None)
+        else:
+            checks.append(lambda m, r=regex: r.search(m.message or "") is None)
+
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+
+    checks = tuple(checks)
+    return lambda m: all(check(m) for check in checks)
@@ -0,0 +1,176 @@
+"""Histórico de execuções (tabela run_history) e relatório de vazão por configuração.
+
+Relatório:
+    python -m src.history                 # combinações de delay/lote/pausa + execuções recentes
+    python -m src.history --runs 50 --db outro.db
+"""
+import argparse
+import contextlib
+import dataclasses
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from rich.console import Console
+from rich.table import Table
+
+from .config import AppConfig, AppSettings
+from .metrics import Metrics
+from .storage import StorageRepository
+
+
+class RunRecord:
+    """Trecho medido (ciclo ou tópico): guarda os totais do início e grava a diferença no fim."""
+
+    def __init__(self, recorder: "RunRecorder", scope: str, source_id: int, target_id: int, topic_id: int, lane: Optional[int]):
+        self.recorder = recorder
+        self.scope = scope
+        self.source_id = source_id
+        self.target_id = target_id
+        self.topic_id = topic_id
+        self.lane = lane
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._totals = recorder.totals(lane)
+        self.finished = False
+
+    def finish(self, outcome: str = "ok"):
+        """Grava o registro (uma vez só; chamadas seguintes são ignoradas)."""
+        if self.finished:
+            return
+        self.finished = True
+        now = self.recorder.totals(self.lane)
+        delta = {k: now[k] - self._totals[k] for k in now}
+        # Ciclos/tópicos sem envio (manutenção sem mensagens novas) não viram registro
+        if not delta["messages"] and outcome == "ok":
+            return
+        self.recorder.save(self, delta, time.perf_counter() - self._start, outcome)
+
+
+class RunRecorder:
+    """Contadores da execução e gravação de ciclos/tópicos na tabela run_history.
+
+    Compartilhado entre o serviço e os filhos do fan-out: envios, pausas e
+    FloodWaits são contados por destino (`lane`), então os registros de
+    tópico de cada destino não somam os envios dos outros. Chamadas à API
+    vêm das métricas (clientes instrumentados) e são globais.
+    """
+
+    def __init__(self, storage: StorageRepository, metrics: Metrics, config: AppConfig, settings: AppSettings, run_id: str = ""):
+        self.storage = storage
+        self.metrics = metrics
+        self.config = config
+        self.run_id = run_id or f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        self.settings_json = json.dumps(dataclasses.asdict(settings), ensure_ascii=False)
+        self._counts: Counter = Counter()
+
+    # ===== Contadores =====
+    def message_sent(self, lane: int):
+        self._counts["messages", lane] += 1
+
+    def pause(self, lane: int):
+        self._counts["pauses", lane] += 1
+
+    def flood_wait(self, lane: int, seconds: float):
+        self._counts["flood_wait_s", lane] += seconds
+
+    def totals(self, lane: Optional[int] = None) -> dict:
+        totals = {"messages": 0, "pauses": 0, "flood_wait_s": 0.0}
+        for (name, counted_lane), value in list(self._counts.items()):
+            if lane is None or counted_lane == lane:
+                totals[name] += value
+        totals["api_calls"] = int(sum(self.metrics.counter_values("cloner_api_requests_total").values()))
+        return totals
+
+    # ===== Registros =====
+    def begin(self, scope: str, source_id: int, target_id: int, topic_id: int = 0, lane: Optional[int] = None) -> RunRecord:
+        return RunRecord(self, scope, source_id, target_id, topic_id, lane)
+
+    @contextlib.contextmanager
+    def record(self, scope: str, source_id: int, target_id: int, topic_id: int = 0, lane: Optional[int] = None):
+        """Mede o bloco; o resultado é "ok" ou o nome da exceção que interrompeu o trecho."""
+        record = self.begin(scope, source_id, target_id, topic_id, lane)
+        try:
+            yield record
+        except BaseException as e:
+            record.finish(type(e).__name__)
+            raise
+        record.finish()
+
+    def save(self, record: RunRecord, delta: dict, wall_s: float, outcome: str):
+        try:
+            self.storage.save_run_record({
+                "run_id": self.run_id,
+                "scope": record.scope,
+                "source_chat_id": record.source_id,
+                "target_chat_id": record.target_id,
+                "topic_id": record.topic_id,
+                "started_at": record.started_at,
+                "wall_s": wall_s,
+                "messages": delta["messages"],
+                "api_calls": delta["api_calls"],
+                "flood_wait_s": delta["flood_wait_s"],
+                "pauses": delta["pauses"],
+                "delay_s": self.config.delay_between_messages,
+                "batch_size": self.config.batch_size,
+                "pause_every": self.config.pause_every_x_messages,
+                "outcome": outcome,
+                "settings": self.settings_json,
+            })
+        except Exception:
+            # Histórico é diagnóstico: nunca interrompe a clonagem
+            pass
+
+
+# ===== Relatório =====
+def _rate(messages, wall_s) -> str:
+    return f"{(messages or 0) / wall_s:.3f}" if wall_s else "-"
+
+
+def _per_msg(value, messages) -> str:
+    return f"{(value or 0) / messages:.2f}" if messages else "-"
+
+
+def print_report(storage: StorageRepository, runs: int = 20, console: Optional[Console] = None):
+    console = console or Console()
+
+    table = Table(title="Vazão sustentada por configuração (ciclos completos, incluindo pausas e FloodWait)")
+    for column in ("Delay (s)", "Lote", "Pausa a cada", "Execuções", "Ciclos", "Msgs", "Horas", "Msgs/h", "Msgs/s", "FloodWait s/1k msgs", "Chamadas/msg"):
+        table.add_column(column, justify="right")
+    for r in storage.summarize_run_history():
+        messages, wall = r["messages"] or 0, r["wall_s"] or 0
+        table.add_row(
+            f"{r['delay_s']:g}", str(r["batch_size"]), str(r["pause_every"]), str(r["runs"]), str(r["cycles"]),
+            str(messages), f"{wall / 3600:.1f}", f"{messages / wall * 3600:.0f}" if wall else "-", _rate(messages, wall),
+            f"{(r['flood_wait_s'] or 0) / messages * 1000:.1f}" if messages else "-", _per_msg(r["api_calls"], messages),
+        )
+    console.print(table)
+
+    recent = Table(title=f"Últimas {runs} execuções")
+    for column in ("Execução", "Início", "Ciclos", "Msgs", "Horas", "Msgs/s", "FloodWait (s)", "Pausas", "Delay/Lote/Pausa"):
+        recent.add_column(column, justify="left" if column in ("Execução", "Início") else "right")
+    for r in storage.list_runs(runs):
+        wall = r["wall_s"] or 0
+        recent.add_row(
+            r["run_id"], datetime.fromtimestamp(r["started_at"]).strftime("%Y-%m-%d %H:%M"), str(r["cycles"]),
+            str(r["messages"] or 0), f"{wall / 3600:.1f}", _rate(r["messages"], wall), f"{r['flood_wait_s'] or 0:.0f}",
+            str(r["pauses"] or 0), f"{r['delay_s']:g}/{r['batch_size']}/{r['pause_every']}",
+        )
+    console.print(recent)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatório do histórico de execuções")
+    parser.add_argument("--db", default="cloner_data.db", help="Banco do cloner (padrão: cloner_data.db)")
+    parser.add_argument("--runs", type=int, default=20, help="Quantas execuções recentes listar")
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        parser.error(f"Banco não encontrado: {args.db}")
+    print_report(StorageRepository(args.db), runs=args.runs)
+
+
+if __name__ == "__main__":
+    main()
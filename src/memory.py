@@ -0,0 +1,190 @@
+import gc
+import linecache
+import logging
+import os
+import resource
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from .metrics import Metrics
+from .session import BufferedSession
+
+
+class LRUSet:
+    """Conjunto com limite de itens: ao passar de `maxsize`, descarta o usado há mais tempo (0 = sem limite)."""
+
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._items: OrderedDict = OrderedDict()
+
+    def add(self, item):
+        self._items[item] = None
+        self._items.move_to_end(item)
+        if self.maxsize and len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, item):
+        self._items.pop(item, None)
+
+    def __contains__(self, item) -> bool:
+        if item in self._items:
+            self._items.move_to_end(item)
+            return True
+        return False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+def current_rss_bytes() -> int:
+    """RSS atual do processo (Linux: /proc; nos demais, o pico informado pelo getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss: KB no Linux, bytes no macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def trim_entity_cache(client, max_entries: int) -> int:
+    """Limita o cache de entidades em memória do Telethon (_mb_entity_cache).
+
+    O Telethon só poda esse cache no laço de updates; aqui descartamos as
+    entradas mais antigas, preservando a própria conta e os chats com estado
+    de updates. Entidades descartadas voltam da sessão (ou da API) quando usadas.
+    """
+    cache = getattr(client, "_mb_entity_cache", None)
+    if cache is None or not max_entries or len(cache) <= max_entries:
+        return 0
+    message_box = getattr(client, "_message_box", None)
+    keep = set(getattr(message_box, "map", ()) or ())
+    keep.add(cache.self_id)
+    excess = len(cache) - max_entries
+    dropped = set()
+    for entity_id in cache.hash_map:
+        if len(dropped) >= excess:
+            break
+        if entity_id not in keep:
+            dropped.add(entity_id)
+    cache.retain(lambda entity_id: entity_id not in dropped)
+    return len(dropped)
+
+
+class MemoryWatchdog:
+    """Acompanha a memória de execuções longas e mantém os caches internos dentro dos limites.
+
+    A cada ciclo de clonagem: aplica os limites de cache (entidades do Telethon
+    e da sessão) e publica RSS, objetos rastreados pelo GC e tamanho dos caches
+    como métricas. A cada `every_cycles` ciclos (0 = desligado) tira um snapshot
+    do tracemalloc e loga os pontos do código que mais cresceram desde o anterior.
+    """
+
+    def __init__(self, metrics: Optional[Metrics] = None, every_cycles: int = 0, top_n: int = 10, max_entities: int = 0):
+        self.metrics = metrics or Metrics()
+        self.every_cycles = every_cycles
+        self.top_n = top_n
+        self.max_entities = max_entities
+        self.cycles = 0
+        self._logged_topic_evictions = 0
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._baseline_rss = current_rss_bytes()
+
+        if self.every_cycles and not tracemalloc.is_tracing():
+            # Quanto antes, melhor: alocações anteriores ao start não aparecem nos snapshots
+            tracemalloc.start()
+            self._snapshot = self._take_snapshot()
+
+    @staticmethod
+    def _take_snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, "<frozen *>"),
+        ))
+
+    # ===== Ciclo =====
+    def on_cycle(self, service):
+        """Chamado pelo serviço ao fim de cada ciclo (erros aqui não interrompem a clonagem)."""
+        self.cycles += 1
+        try:
+            self.enforce_caps(service)
+            self.sample(service)
+            if self.every_cycles and self.cycles % self.every_cycles == 0:
+                self.log_growth()
+        except Exception as e:
+            logging.error(f"Erro no watchdog de memória: {e}")
+
+    def _clients(self, service) -> list:
+        clients = [service.client]
+        if service.source_client is not service.client:
+            clients.append(service.source_client)
+        return clients
+
+    def enforce_caps(self, service):
+        if not self.max_entities:
+            return
+        for client in self._clients(service):
+            dropped = trim_entity_cache(client, self.max_entities)
+            if isinstance(getattr(client, "session", None), BufferedSession):
+                dropped += client.session.trim(self.max_entities)
+            if dropped:
+                self.metrics.inc("cloner_cache_evictions_total", dropped, cache="entities")
+
+    def sample(self, service):
+        """Publica RSS, contagem de objetos e tamanho dos caches como gauges."""
+        self.metrics.set("cloner_memory_rss_bytes", current_rss_bytes())
+        self.metrics.set("cloner_gc_objects", len(gc.get_objects()))
+
+        sizes = {
+            "logged_topics": len(service.logged_topics),
+            "writer_copies": len(service._writer_copies),
+            "dedup_indexes": len(service._dedup_indexes),
+        }
+        for i, client in enumerate(self._clients(service)):
+            role = "writer" if i == 0 else "reader"
+            cache = getattr(client, "_mb_entity_cache", None)
+            if cache is not None:
+                sizes[f"entity_cache:{role}"] = len(cache)
+            if isinstance(getattr(client, "session", None), BufferedSession):
+                sizes[f"session_entities:{role}"] = len(client.session._rows)
+        for cache, size in sizes.items():
+            self.metrics.set("cloner_cache_entries", size, cache=cache)
+
+        evictions = getattr(service.logged_topics, "evictions", 0)
+        if evictions > self._logged_topic_evictions:
+            self.metrics.inc("cloner_cache_evictions_total", evictions - self._logged_topic_evictions, cache="logged_topics")
+            self._logged_topic_evictions = evictions
+
+    def log_growth(self):
+        """Loga os `top_n` pontos de alocação que mais cresceram e os tipos de objeto mais numerosos."""
+        if not tracemalloc.is_tracing():
+            return
+        snapshot = self._take_snapshot()
+        rss = current_rss_bytes()
+        logging.info(
+            f"🧠 Memória (ciclo {self.cycles}): RSS {rss / 1_048_576:.1f} MB "
+            f"({(rss - self._baseline_rss) / 1_048_576:+.1f} MB desde o início), "
+            f"tracemalloc {tracemalloc.get_traced_memory()[0] / 1_048_576:.1f} MB"
+        )
+
+        if self._snapshot is not None:
+            growth = [s for s in snapshot.compare_to(self._snapshot, "lineno") if s.size_diff > 0]
+            for stat in growth[:self.top_n]:
+                frame = stat.traceback[0]
+                logging.info(
+                    f"🧠   {stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocos) "
+                    f"{frame.filename}:{frame.lineno}"
+                )
+        self._snapshot = snapshot
+
+        types = Counter(type(o).__name__ for o in gc.get_objects())
+        for name, count in types.most_common(self.top_n):
+            self.metrics.set("cloner_objects", count, type=name)
+        logging.info("🧠   Objetos: " + ", ".join(f"{name}={count}" for name, count in types.most_common(self.top_n)))
@@ -0,0 +1,322 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from telethon import errors, utils
+from telethon.tl.tlobject import TLRequest
+
+# Limites (segundos) dos histogramas de latência
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Descrição de cada métrica (linha # HELP do formato Prometheus)
+METRIC_HELP = {
+    "cloner_messages_total": "Mensagens clonadas por job (origem->destino) e tópico",
+    "cloner_messages_per_second": "Vazão de mensagens no último intervalo do exportador",
+    "cloner_checkpoint_lag_seconds": "Idade da última mensagem clonada (data da origem até agora)",
+    "cloner_api_requests_total": "Requisições TL enviadas por tipo",
+    "cloner_api_errors_total": "Requisições TL com erro, por tipo e erro",
+    "cloner_api_request_seconds": "Latência das requisições TL por tipo (inclui esperas internas de FloodWait)",
+    "cloner_floodwait_total": "FloodWaits recebidos por tipo de requisição",
+    "cloner_floodwait_seconds_total": "Segundos de FloodWait por tipo de requisição",
+    "cloner_db_calls_total": "Chamadas ao StorageRepository por método",
+    "cloner_db_seconds_total": "Tempo gasto no StorageRepository por método",
+    "cloner_queue_depth": "Itens pendentes em filas internas",
+    "cloner_uptime_seconds": "Tempo desde o início do processo",
+    "cloner_memory_rss_bytes": "Memória residente (RSS) do processo",
+    "cloner_gc_objects": "Objetos rastreados pelo coletor de lixo",
+    "cloner_objects": "Objetos por tipo (os mais numerosos no último snapshot de memória)",
+    "cloner_cache_entries": "Itens em caches internos",
+    "cloner_cache_evictions_total": "Itens descartados de caches internos pelos limites configurados",
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple, extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """Contadores, gauges e histogramas em memória, com rótulos.
+
+    Thread-safe: o servidor HTTP lê de outra thread enquanto o serviço escreve.
+    Cada série é identificada por (nome, rótulos ordenados).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = defaultdict(float)
+        self._gauges: dict[tuple, float] = {}
+        # (nome, rótulos) -> [contagem por bucket, soma, total]
+        self._histograms: dict[tuple, list] = {}
+        self.started_at = time.time()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] += value
+
+    def set(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    hist[0][i] += 1
+                    break
+            hist[1] += seconds
+            hist[2] += 1
+
+    def counter_values(self, name: str) -> dict[tuple, float]:
+        with self._lock:
+            return {labels: v for (n, labels), v in self._counters.items() if n == name}
+
+    # ===== Atalhos usados pelo serviço =====
+    def message_sent(self, job: str, topic: int, msg_date=None):
+        self.inc("cloner_messages_total", job=job, topic=topic)
+        if msg_date is not None:
+            self.set("cloner_checkpoint_lag_seconds", max(0.0, time.time() - msg_date.timestamp()), job=job, topic=topic)
+
+    def queue_depth(self, queue: str, depth: int):
+        self.set("cloner_queue_depth", depth, queue=queue)
+
+    # ===== Saída =====
+    def render_prometheus(self) -> str:
+        """Formato texto de exposição do Prometheus (0.0.4)."""
+        self.set("cloner_uptime_seconds", time.time() - self.started_at)
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._histograms.items())
+
+        lines = []
+        typed = set()
+
+        def header(name: str, kind: str):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), value in gauges:
+            header(name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), (buckets, total, count) in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                cumulative += n
+                le = 'le="%g"' % bound
+                lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+            inf = 'le="+Inf"'
+            lines.append(f"{name}_bucket{_format_labels(labels, inf)} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Mesmas séries em JSON (para o arquivo de snapshot e /metrics.json)."""
+        with self._lock:
+            counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self._counters.items())]
+            gauges = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self._gauges.items())]
+            histograms = [
+                {"name": n, "labels": dict(l), "count": h[2], "sum": h[1],
+                 "buckets": dict(zip((f"{b:g}" for b in LATENCY_BUCKETS), h[0]))}
+                for (n, l), h in sorted(self._histograms.items())
+            ]
+        return {
+            "timestamp": time.time(),
+            "uptime_s": time.time() - self.started_at,
+            "counters": counters,
+            "gauges": gauges,
+            "histograms": histograms,
+        }
+
+
+# ===== Instrumentação =====
+def _request_name(request) -> str:
+    if utils.is_list_like(request):
+        request = request[0] if request else None
+    # InvokeWithTakeoutRequest / InvokeWithoutUpdatesRequest embrulham a requisição real
+    while isinstance(getattr(request, "query", None), TLRequest):
+        request = request.query
+    return type(request).__name__
+
+
+def instrument_client(client, metrics: Metrics, role: str = "writer"):
+    """Mede cada requisição TL do cliente (contagem, latência, erros e FloodWait por tipo).
+
+    Envolve o `_call` da instância, por onde passam todas as requisições do
+    Telethon (inclusive as feitas via takeout).
+    """
+    original = client._call
+
+    @functools.wraps(original)
+    async def _call(sender, request, ordered=False, flood_sleep_threshold=None):
+        name = _request_name(request)
+        flood_key = getattr(request, "CONSTRUCTOR_ID", None)
+        due_before = client._flood_waited_requests.get(flood_key)
+        start = time.perf_counter()
+        wall_start = time.time()
+        error = None
+        try:
+            return await original(sender, request, ordered=ordered, flood_sleep_threshold=flood_sleep_threshold)
+        except errors.FloodWaitError as e:
+            error = e
+            metrics.inc("cloner_floodwait_total", client=role, request=name)
+            metrics.inc("cloner_floodwait_seconds_total", e.seconds, client=role, request=name)
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.inc("cloner_api_requests_total", client=role, request=name)
+            metrics.observe("cloner_api_request_seconds", elapsed, client=role, request=name)
+            if error is not None:
+                metrics.inc("cloner_api_errors_total", client=role, request=name, error=type(error).__name__)
+            elif flood_key is not None:
+                # FloodWait abaixo do flood_sleep_threshold: o Telethon dorme e repete sem
+                # levantar erro; detectado pelo novo prazo registrado (tempo estimado)
+                due_after = client._flood_waited_requests.get(flood_key)
+                if due_after is not None and due_after != due_before:
+                    metrics.inc("cloner_floodwait_total", client=role, request=name)
+                    metrics.inc("cloner_floodwait_seconds_total", max(0.0, min(due_after - wall_start, elapsed)), client=role, request=name)
+
+    client._call = _call
+    return client
+
+
+def instrument_storage(storage, metrics: Metrics):
+    """Mede chamadas e tempo de cada método público do StorageRepository."""
+    def wrap(name, method):
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                metrics.inc("cloner_db_calls_total", method=name)
+                metrics.inc("cloner_db_seconds_total", time.perf_counter() - start, method=name)
+        return timed
+
+    for name, method in inspect.getmembers(storage, inspect.ismethod):
+        if not name.startswith("_"):
+            setattr(storage, name, wrap(name, method))
+    return storage
+
+
+# ===== Exportação =====
+class MetricsExporter:
+    """Expõe as métricas em HTTP local (/metrics e /metrics.json) e grava snapshots JSON periódicos."""
+
+    def __init__(self, metrics: Metrics, port: int = 0, json_path: str = "", interval_s: float = 30):
+        self.metrics = metrics
+        self.port = port
+        self.json_path = json_path
+        self.interval_s = max(1.0, interval_s)
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_counts: dict[tuple, float] = {}
+        self._last_sample = time.time()
+
+    def _make_handler(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = metrics.render_prometheus().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """Sobe o servidor HTTP (se houver porta) e o laço de snapshots (requer loop rodando)."""
+        if self.port:
+            self._server = ThreadingHTTPServer(("127.0.0.1", self.port), self._make_handler())
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+            logging.info(f"📈 Métricas em http://127.0.0.1:{self.port}/metrics")
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                self.sample()
+            except Exception as e:
+                logging.error(f"Erro gravando snapshot de métricas: {e}")
+
+    def _update_rates(self):
+        now = time.time()
+        elapsed = max(now - self._last_sample, 1e-6)
+        counts = self.metrics.counter_values("cloner_messages_total")
+        for labels, value in counts.items():
+            rate = (value - self._last_counts.get(labels, 0.0)) / elapsed
+            self.metrics.set("cloner_messages_per_second", rate, **dict(labels))
+        self._last_counts = counts
+        self._last_sample = now
+
+    def sample(self):
+        """Atualiza as vazões do intervalo e grava o snapshot JSON (escrita atômica)."""
+        self._update_rates()
+        if not self.json_path:
+            return
+        tmp_path = f"{self.json_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.metrics.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.json_path)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        try:
+            self.sample()
+        except Exception:
+            pass
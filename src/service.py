@@ -1,20 +1,35 @@
 import asyncio
+import collections
+import dataclasses
+import hashlib
 import time
 import logging
 import os
 import socket
 from datetime import datetime
+from types import SimpleNamespace
+from typing import Optional
 from rich.progress import track
 from rich.console import Console
-from telethon import TelegramClient, errors
+from telethon import TelegramClient, errors, helpers, utils
 from telethon.tl.types import (
     MessageService, 
     ForumTopicDeleted, 
     MessageMediaWebPage,
-    MessageActionPinMessage
+    MessageActionPinMessage,
+    MessageActionTopicCreate,
+    MessageEntityMentionName,
+    InputMediaUploadedPhoto,
+    InputMediaUploadedDocument,
+    InputReplyToMessage,
+    InputMessagesFilterPinned,
+    UpdateShortSentMessage,
+    UpdateNewChannelMessage,
+    UpdateNewMessage
 )
 from telethon.tl.functions.channels import (
     GetForumTopicsRequest, 
+    GetForumTopicsByIDRequest,
     CreateForumTopicRequest,
     EditTitleRequest,
     EditPhotoRequest,
@@ -22,38 +37,149 @@ from telethon.tl.functions.channels import (
     UpdatePinnedForumTopicRequest,
     GetFullChannelRequest
 )
-from telethon.tl.functions.messages import EditChatAboutRequest
-
-from .config import AppConfig, AppSettings
+from telethon.tl.functions.messages import EditChatAboutRequest, SearchRequest, SendMediaRequest, SendMessageRequest
+
+from .archive import ArchiveReader, ArchiveWriter, MediaStore, from_jsonable, media_key, serialize_message
+from .config import MESSAGE_LOGGER, AppConfig, AppSettings
+from .dashboard import LiveStatus
+from .dedup import DedupIndex, content_hash
+from .history import RunRecorder
+from .budget import SendBudget
+from .filters import compile_message_filter, parse_date
+from .memory import LRUSet, MemoryWatchdog
+from .metrics import Metrics
+from .tracing import Tracer
 from .storage import StorageRepository
 
 console = Console()
+# Linhas por mensagem: formatação adiada e limite de taxa (ver setup_logging)
+message_log = logging.getLogger(MESSAGE_LOGGER)
 
 class WorkTimeLimitReached(Exception): pass
 
+# Reenvios da mesma mensagem após FloodWait antes de ir para a fila de falhas
+SEND_FLOOD_RETRIES = 3
+
+# Erros de mídia quando o escritor usa referências obtidas por outra conta (leitor)
+FOREIGN_MEDIA_ERRORS = (
+    errors.FileReferenceExpiredError,
+    errors.FileReferenceInvalidError,
+    errors.FileReferenceEmptyError,
+    errors.MediaInvalidError,
+    errors.MediaEmptyError,
+    errors.PhotoInvalidError,
+    errors.DocumentInvalidError,
+)
+
+class LeaseLost(Exception): pass
+
+# Chaves de lease que não são tópicos (modo worker)
+SYNC_LEASE_TOPIC = 0
+INDEX_LEASE_TOPIC = -1
+
+class FanoutFeed:
+    """Fila limitada de lotes da origem entregues a um destino do fan-out."""
+
+    def __init__(self, max_batches: int):
+        self.queue = asyncio.Queue(max(1, max_batches))
+        # Desligado: o destino esvazia a fila e segue lendo a origem sozinho
+        self.detached = False
+
+    async def offer(self, batch: list, timeout: float, writer: asyncio.Future):
+        """Entrega o lote; desliga o destino do fan-out se a fila continuar cheia por `timeout`s
+        ou se o escritor terminar antes (falhou: não há mais quem esvazie a fila)."""
+        put = asyncio.ensure_future(self.queue.put(batch))
+        done, _ = await asyncio.wait({put, writer}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if put not in done:
+            put.cancel()
+            self.detached = True
+
+class FanoutLane:
+    """Um destino do fan-out: serviço próprio (checkpoints, mapa de tópicos e ritmo independentes)."""
+
+    def __init__(self, service: "ClonerService", target):
+        self.service = service
+        self.target = target
+        self.is_forum = bool(getattr(target, 'forum', False))
+        self.is_channel = bool(getattr(target, 'broadcast', False))
+        self.topic_map: dict[int, int] = {}
+        self.topic_titles: dict[int, str] = {}
+
 class ClonerService:
-    def __init__(self, client: TelegramClient, config: AppConfig, settings: AppSettings, storage: StorageRepository):
+    def __init__(self, client: TelegramClient, config: AppConfig, settings: AppSettings, storage: StorageRepository, source_client: Optional[TelegramClient] = None, metrics: Optional[Metrics] = None, tracer: Optional[Tracer] = None, memory: Optional[MemoryWatchdog] = None, status: Optional[LiveStatus] = None, history: Optional[RunRecorder] = None, budget: Optional[SendBudget] = None):
+        # client escreve no destino; source_client (conta leitora opcional) lê a origem
         self.client = client
+        self.source_client = source_client or client
         self.config = config
         self.settings = settings
         self.storage = storage
         self.is_premium = False
         self.session_start_time = 0
         self.messages_sent = 0
-        self.logged_topics = set()
+        # Só evita repetir o log de início do tópico: limitado para execuções de semanas
+        self.logged_topics = LRUSet(config.max_logged_topics)
         self.session_message_count = 0
 
-    def _log_visual(self, message: str, is_error: bool = False, force_clean_view: bool = False):
+        # Telemetria (exportada só quando main.py liga o MetricsExporter)
+        self.metrics = metrics or Metrics()
+        # Spans por fase (desligado por padrão; ver src/tracing.py)
+        self.tracer = tracer or Tracer()
+        # Limites de cache e métricas de memória a cada ciclo (ver src/memory.py)
+        self.memory = memory or MemoryWatchdog(self.metrics)
+        # Estado lido pelo painel ao vivo (desligado por padrão; ver src/dashboard.py)
+        self.status = status or LiveStatus()
+        # Histórico por ciclo/tópico na tabela run_history (ver src/history.py)
+        self.history = history or RunRecorder(storage, self.metrics, config, settings)
+        # Destino (target.id) do tópico em andamento: FloodWaits e pausas contam para ele
+        self._history_lane = config.target_chat_id
+        # Limites de envio por hora/dia persistidos no banco (desligados por padrão; ver src/budget.py)
+        self.budget = budget or SendBudget(
+            storage, config.budget_account_per_hour, config.budget_account_per_day,
+            config.budget_target_per_hour, config.budget_target_per_day,
+        )
+
+        # Leitor da origem: o source_client ou um proxy takeout dele (ver _open_takeout)
+        self.reader = self.source_client
+
+        # Contas separadas: referências de mídia do leitor recusadas pelo escritor -> relê pelo escritor
+        self._writer_refetch = False
+        self._writer_copies: dict[int, object] = {}
+        self._takeout = None
+        self._takeout_retry_at = 0.0
+
+        # Deduplicação de reposts (índice por destino + contagem de reposts por tópico)
+        self._dedup_indexes: dict[int, DedupIndex] = {}
+        self.dedup_counts = collections.Counter()
+
+        # Filtros pré-envio compilados uma única vez (None = sem filtros)
+        self._message_filter = compile_message_filter(settings.message_filters)
+        self.filtered_counts = collections.Counter()
+
+        # Mensagens de serviço a apagar no fim do lote: target.id -> (entidade, IDs)
+        self._service_purge: dict[int, tuple] = {}
+
+        # Modo worker: sinal do heartbeat de que o lease atual foi tomado por outro worker
+        self._lease = SimpleNamespace(lost=False)
+
+        # Fan-out: quando definido, os lotes do histórico chegam por aqui (ver _run_fanout)
+        self._feed: Optional[FanoutFeed] = None
+
+        # Janela de clonagem (datas/IDs)
+        self._window_start = parse_date(settings.start_date) if settings.start_date else None
+        self._window_end = parse_date(settings.end_date, end_of_day=True) if settings.end_date else None
+
+    def _log_visual(self, message: str, is_error: bool = False, force_clean_view: bool = False, extra: Optional[dict] = None):
+        # extra: campos estruturados (job, topic, msg_id) para o cloner.jsonl
         if is_error:
             console.print(f"[bold red]{message}[/]")
-            logging.error(message)
+            logging.error(message, extra=extra)
             return
 
         if self.settings.clean_visual:
             if force_clean_view:
                 console.print(message)
         else:
-            logging.info(message)
+            logging.info(message, extra=extra)
 
     def _check_work_time(self):
         if self.session_start_time > 0:
@@ -63,8 +189,72 @@ class ClonerService:
 
     async def _handle_flood_wait(self, error: errors.FloodWaitError):
         msg = f"⚠️ FloodWait detectado. Aguardando {error.seconds}s..."
-        self._log_visual(msg, is_error=True)
-        await asyncio.sleep(error.seconds + 5)
+        self.status.flood_wait(error.seconds)
+        self.history.flood_wait(self._history_lane, error.seconds)
+        if self.status.enabled:
+            # O painel já mostra o histórico de FloodWait: só o arquivo de log recebe a linha
+            logging.error(msg)
+        else:
+            self._log_visual(msg, is_error=True)
+        previous_phase = self.status.phase
+        self.status.set_phase(f"⚠️ FloodWait {error.seconds}s")
+        with self.tracer.span("sleep:flood_wait", cat="sleep", seconds=error.seconds):
+            await asyncio.sleep(error.seconds + 5)
+        self.status.set_phase(previous_phase)
+
+    # ===== Takeout (leitura da origem) =====
+    async def _open_takeout(self):
+        """Abre uma sessão takeout para ler a origem. Em caso de negação/atraso, segue com leitura normal."""
+        if not self.settings.use_takeout or self._takeout is not None:
+            return
+        if time.time() < self._takeout_retry_at:
+            return
+
+        try:
+            if self.source_client.session.takeout_id:
+                # Sessão takeout pendente de uma execução anterior: reaproveita em vez de pedir outra
+                ctx = self.source_client.takeout(finalize=True)
+            else:
+                # Exportação local também baixa mídias, o que exige o escopo 'files'
+                ctx = self.source_client.takeout(
+                    finalize=True, channels=True, megagroups=True,
+                    files=True if self.config.archive_dir else None,
+                )
+            self.reader = await ctx.__aenter__()
+            self._takeout = ctx
+            self._log_visual("📦 Sessão takeout ativa para leitura da origem", force_clean_view=True)
+        except errors.TakeoutInitDelayError as e:
+            # O Telegram exige confirmação/espera antes de liberar o takeout
+            self._takeout_retry_at = time.time() + e.seconds
+            self._log_visual(f"⚠️ Takeout liberado apenas em {e.seconds}s. Usando leitura normal até lá.", is_error=True)
+        except Exception as e:
+            self._takeout_retry_at = time.time() + 3600
+            self._log_visual(f"⚠️ Takeout negado ({e}). Usando leitura normal.", is_error=True)
+
+    async def _close_takeout(self, success: bool = True):
+        ctx = self._takeout
+        self._takeout = None
+        self.reader = self.source_client
+        if ctx is None:
+            return
+        try:
+            ctx.success = success
+            await ctx.__aexit__(None, None, None)
+        except Exception:
+            # Takeout já invalidado no servidor: só esquece o ID local
+            self.source_client.session.takeout_id = None
+
+    async def _read_source(self, op):
+        """Executa uma leitura da origem pelo leitor atual; volta à leitura normal se o takeout cair."""
+        try:
+            return await op(self.reader)
+        except (errors.TakeoutInvalidError, errors.TakeoutRequiredError) as e:
+            if self._takeout is None:
+                raise
+            self._log_visual(f"⚠️ Sessão takeout invalidada ({e}). Voltando à leitura normal.", is_error=True)
+            self._takeout_retry_at = time.time() + 3600
+            await self._close_takeout(success=False)
+            return await op(self.reader)
 
     def _check_internet_and_time(self):
         """Bloqueia o ciclo até ter internet e hora OK."""
@@ -86,18 +276,36 @@ class ClonerService:
             time.sleep(10)
 
     async def run_cloning_cycle(self):
-        self.session_start_time = time.time()
+        # Já definido (modo daemon): o relógio de trabalho continua de um job para o outro
+        if not self.session_start_time:
+            self.session_start_time = time.time()
         self._check_internet_and_time()
         
         me = await self.client.get_me()
         self.is_premium = getattr(me, 'premium', False)
+        self.budget.account_id = me.id
         
+        if self.config.restore_dir:
+            await self._run_archive_restore()
+            return
+
+        if self.config.archive_dir:
+            try:
+                source = await self.source_client.get_entity(self.config.source_chat_id)
+            except Exception as e:
+                self._log_visual(f"Erro ao acessar chats: {e}", is_error=True)
+                return
+            await self._run_archive_export(source)
+            return
+
         try:
-            source = await self.client.get_entity(self.config.source_chat_id)
-            target = await self.client.get_entity(self.config.target_chat_id)
+            with self.tracer.span("resolve_chats"):
+                source = await self.source_client.get_entity(self.config.source_chat_id)
+                target = await self.client.get_entity(self.config.target_chat_id)
         except Exception as e:
             self._log_visual(f"Erro ao acessar chats: {e}", is_error=True)
             return
+        self.status.set_job(source.id, target.id)
 
         source_is_forum = bool(getattr(source, 'forum', False))
         target_is_forum = bool(getattr(target, 'forum', False))
@@ -116,18 +324,59 @@ class ClonerService:
         except Exception:
             pass
 
+        # Em segundo plano: não atrasa a primeira mensagem
+        group_info_task = None
         if self.settings.update_photo or self.settings.update_desc:
-            await self._sync_group_info(source, target)
+            group_info_task = asyncio.create_task(self._sync_group_info(source, target))
 
-        while True:
-            try:
-                topic_map, topic_titles = await self._sync_topics_with_manifest(
+        try:
+            if self.config.extra_target_chat_ids:
+                await self._run_fanout(source, target, source_is_forum=source_is_forum, source_is_channel=source_is_channel)
+            else:
+                await self._run_cycles(
                     source, target,
                     source_is_forum=source_is_forum,
                     target_is_forum=target_is_forum,
                     source_is_channel=source_is_channel,
                     target_is_channel=target_is_channel,
                 )
+        finally:
+            if group_info_task is not None and not group_info_task.done():
+                group_info_task.cancel()
+            await self._close_takeout()
+
+    async def _run_cycles(self, source, target, *, source_is_forum: bool, target_is_forum: bool, source_is_channel: bool, target_is_channel: bool):
+        cycles = 0
+        while True:
+            # Criado fora do try: os handlers abaixo sempre têm o ciclo
+            cycle = self.history.begin("cycle", source.id, target.id)
+            try:
+                await self._open_takeout()
+
+                # Modo worker: um worker por vez cria/atualiza tópicos (evita tópicos duplicados no destino)
+                self.status.set_phase("🔄 Sincronizando tópicos")
+                with self.tracer.span("topic_sync", cat="topics"):
+                    while True:
+                        acquired, synced = await self._with_lease(
+                            source, target, SYNC_LEASE_TOPIC,
+                            lambda: self._sync_topics_with_manifest(
+                                source, target,
+                                source_is_forum=source_is_forum,
+                                target_is_forum=target_is_forum,
+                                source_is_channel=source_is_channel,
+                                target_is_channel=target_is_channel,
+                            ),
+                        )
+                        if acquired:
+                            break
+                        await asyncio.sleep(5)
+                topic_map, topic_titles = synced
+                if self.status.enabled:
+                    tops = self.storage.get_topic_snapshots(source.id, target.id) if source_is_forum else {}
+                    self.status.plan({
+                        t_id: (topic_titles.get(t_id, f"Tópico {t_id}"), tops.get(t_id, {}).get("top_message", 0))
+                        for t_id in topic_map
+                    })
                 
                 all_topics = sorted(topic_map.items())
                 maintenance_queue = []
@@ -141,40 +390,50 @@ class ClonerService:
 
                 if self.settings.update_msgs_start and maintenance_queue:
                     self._log_visual("⚙️ Atualizando mensagens novas", force_clean_view=True)
+                    self.status.set_phase("⚙️ Atualizando mensagens novas")
                     for src_id, tgt_id in maintenance_queue:
                         self._check_work_time()
-                        await self._process_topic_messages(
-                            source, target, src_id, tgt_id,
-                            source_is_forum=source_is_forum,
-                            target_is_forum=target_is_forum,
-                            target_is_channel=target_is_channel,
-                            topic_titles=topic_titles,
-                        )
+                        with self.tracer.span("maintenance_topic", cat="topics", topic=src_id):
+                            await self._with_lease(
+                                source, target, src_id,
+                                lambda: self._process_topic_messages(
+                                    source, target, src_id, tgt_id,
+                                    source_is_forum=source_is_forum,
+                                    target_is_forum=target_is_forum,
+                                    target_is_channel=target_is_channel,
+                                    topic_titles=topic_titles,
+                                ),
+                            )
                     self._log_visual("✅ Atualização de mensagens completa", force_clean_view=True)
 
                 if cloning_queue:
+                    self.status.set_phase("📤 Clonando")
                     for src_id, tgt_id in cloning_queue:
                         self._check_work_time()
                         
-                        if src_id not in self.logged_topics:
-                            self._log_visual(f"⚙️ Iniciando Clonagem Tópico {src_id}", force_clean_view=True)
-                            self.logged_topics.add(src_id)
-                        
-                        # Forum -> Canal: envia cabeçalho (nome do tópico) antes de clonar
-                        if source_is_forum and target_is_channel and self.settings.forum_to_channel_topic_header:
-                            await self._ensure_topic_header_in_channel(
-                                source, target,
-                                topic_id=src_id,
-                                topic_title=topic_titles.get(src_id, f"Tópico {src_id}"),
+                        async def clone_topic():
+                            if src_id not in self.logged_topics:
+                                self._log_visual(f"⚙️ Iniciando Clonagem Tópico {src_id}", force_clean_view=True)
+                                self.logged_topics.add(src_id)
+
+                            # Forum -> Canal: envia cabeçalho (nome do tópico) antes de clonar
+                            if source_is_forum and target_is_channel and self.settings.forum_to_channel_topic_header:
+                                await self._ensure_topic_header_in_channel(
+                                    source, target,
+                                    topic_id=src_id,
+                                    topic_title=topic_titles.get(src_id, f"Tópico {src_id}"),
+                                )
+
+                            return await self._process_topic_messages(
+                                source, target, src_id, tgt_id,
+                                source_is_forum=source_is_forum,
+                                target_is_forum=target_is_forum,
+                                target_is_channel=target_is_channel,
+                                topic_titles=topic_titles,
                             )
 
-                        success = await self._process_topic_messages(
-                            source, target, src_id, tgt_id,
-                            source_is_forum=source_is_forum,
-                            target_is_forum=target_is_forum,
-                            target_is_channel=target_is_channel,
-                            topic_titles=topic_titles,
-                        )
+                        with self.tracer.span("clone_topic", cat="topics", topic=src_id):
+                            _, success = await self._with_lease(source, target, src_id, clone_topic)
                         
                         if success:
                             self.storage.mark_topic_completed(source.id, target.id, src_id)
@@ -183,91 +442,799 @@ class ClonerService:
                 self._log_visual("✅ Clonagem de Grupo Completa", force_clean_view=True)
 
                 # Forum -> Canal: cria índice final com links para cada cabeçalho
-                if source_is_forum and target_is_channel and self.settings.forum_to_channel_final_index:
-                    await self._send_final_navigation_index(source, target, topic_titles)
+                if source_is_forum and target_is_channel and self.settings.forum_to_channel_final_index and self._claim_index_turn(source, target):
+                    with self.tracer.span("final_index", cat="send"):
+                        await self._send_final_navigation_index(source, target, topic_titles)
 
                 if self.settings.update_msgs_end and maintenance_queue:
                     self._log_visual("⚙️ Atualizando mensagens novas (Verificação Final)", force_clean_view=True)
+                    self.status.set_phase("⚙️ Verificação final")
                     for src_id, tgt_id in maintenance_queue:
                         self._check_work_time()
-                        await self._process_topic_messages(
-                            source, target, src_id, tgt_id,
-                            source_is_forum=source_is_forum,
-                            target_is_forum=target_is_forum,
-                            target_is_channel=target_is_channel,
-                            topic_titles=topic_titles,
-                        )
+                        with self.tracer.span("maintenance_topic", cat="topics", topic=src_id):
+                            await self._with_lease(
+                                source, target, src_id,
+                                lambda: self._process_topic_messages(
+                                    source, target, src_id, tgt_id,
+                                    source_is_forum=source_is_forum,
+                                    target_is_forum=target_is_forum,
+                                    target_is_channel=target_is_channel,
+                                    topic_titles=topic_titles,
+                                ),
+                            )
                     self._log_visual("✅ Atualização de mensagens completa", force_clean_view=True)
 
+                if self.settings.sync_pins:
+                    with self.tracer.span("sync_pins", cat="topics"):
+                        await self._sync_pinned_messages(source, target, target_is_forum=target_is_forum)
+
+                cycle.finish()
+                cycles += 1
+                self.memory.on_cycle(self)
+                if self.config.max_cycles and cycles >= self.config.max_cycles:
+                    return
+
+                logging.info(f"Ciclo concluído. Dormindo 60s...")
+                self.status.set_phase("💤 Aguardando próximo ciclo")
+                with self.tracer.span("sleep:cycle", cat="sleep"):
+                    await asyncio.sleep(60)
+
+            except WorkTimeLimitReached:
+                self.history.pause(self._history_lane)
+                sleep_time = self.config.pause_duration_hours * 3600
+                self._log_visual(f"🛑 Pausa para descanso ({self.config.pause_duration_hours}h)...", force_clean_view=True)
+                self.status.set_phase(f"🛑 Descanso ({self.config.pause_duration_hours}h)")
+                with self.tracer.span("sleep:rest", cat="sleep"):
+                    await asyncio.sleep(sleep_time)
+                self.session_start_time = time.time()
+                # Depois do descanso: a vazão do histórico inclui o tempo parado
+                cycle.finish("WorkTimeLimitReached")
+                
+            except errors.FloodWaitError as e:
+                await self._handle_flood_wait(e)
+                cycle.finish("FloodWaitError")
+            except Exception as e:
+                cycle.finish(type(e).__name__)
+                self._log_visual(f"Erro crítico no ciclo: {e}", is_error=True)
+                await asyncio.sleep(10)
+
+    # ===== Modo worker (leases no banco compartilhado) =====
+    async def _with_lease(self, source, target, topic_id: int, work):
+        """Executa `work()` segurando o lease de (origem, destino, tópico).
+
+        Fora do modo worker executa direto. Retorna (executou, resultado): com o
+        lease válido nas mãos de outro worker, (False, None). Um heartbeat renova
+        o lease; se ele expirar e outro worker assumir, o envio para na próxima
+        mensagem (e o diário de envios cobre a que estava em voo).
+        """
+        worker_id = self.config.worker_id
+        if not worker_id:
+            return True, await work()
+
+        ttl = self.settings.lease_ttl_s
+        if not self.storage.claim_lease(source.id, target.id, topic_id, worker_id, ttl):
+            return False, None
+
+        self._lease.lost = False
+        heartbeat = asyncio.ensure_future(self._lease_heartbeat(source, target, topic_id))
+        try:
+            return True, await work()
+        except LeaseLost:
+            self._log_visual(f"⚠️ Lease do tópico {topic_id} perdido; outro worker assume.", force_clean_view=True)
+            return False, None
+        finally:
+            heartbeat.cancel()
+            self.storage.release_lease(source.id, target.id, topic_id, worker_id)
+
+    async def _lease_heartbeat(self, source, target, topic_id: int):
+        ttl = self.settings.lease_ttl_s
+        while True:
+            await asyncio.sleep(max(1.0, ttl / 3))
+            if not self.storage.renew_lease(source.id, target.id, topic_id, self.config.worker_id, ttl):
+                self._lease.lost = True
+                return
+
+    def _claim_index_turn(self, source, target) -> bool:
+        """Modo worker: só um worker envia o índice final por TTL (o lease não é liberado, apenas expira)."""
+        if not self.config.worker_id:
+            return True
+        return self.storage.claim_lease(source.id, target.id, INDEX_LEASE_TOPIC, self.config.worker_id, self.settings.lease_ttl_s)
+
+    # ===== Fan-out (uma leitura da origem, vários destinos) =====
+    async def _run_fanout(self, source, target, *, source_is_forum: bool, source_is_channel: bool):
+        """Lê cada lote da origem uma única vez e o entrega a todos os destinos.
+
+        Cada destino tem um ClonerService próprio (mapa de tópicos, checkpoints,
+        dedup e pausas independentes). O buffer por destino é limitado: um destino
+        lento segura a leitura por no máximo ~1 lote de envios; depois disso é
+        desligado do fan-out no tópico atual e termina com leituras próprias a
+        partir do seu checkpoint.
+        """
+        lanes = [FanoutLane(self._fanout_child(self.config.target_chat_id), target)]
+        for extra_id in self.config.extra_target_chat_ids:
+            try:
+                lanes.append(FanoutLane(self._fanout_child(extra_id), await self.client.get_entity(extra_id)))
+            except Exception as e:
+                self._log_visual(f"Erro ao acessar destino {extra_id}: {e}", is_error=True)
+
+        self._log_visual(f"🔀 Fan-out para {len(lanes)} destinos", force_clean_view=True)
+
+        cycles = 0
+        while True:
+            # Ciclo do fan-out: soma todos os destinos (criado fora do try, como em _run_cycles)
+            cycle = self.history.begin("cycle", source.id, target.id)
+            try:
+                await self._open_takeout()
+                self.status.set_phase("🔀 Clonando (fan-out)")
+                for lane in lanes:
+                    lane.service.session_start_time = self.session_start_time
+                    lane.topic_map, lane.topic_titles = await lane.service._sync_topics_with_manifest(
+                        source, lane.target,
+                        source_is_forum=source_is_forum,
+                        target_is_forum=lane.is_forum,
+                        source_is_channel=source_is_channel,
+                        target_is_channel=lane.is_channel,
+                    )
+
+                for src_id in sorted(set().union(*(lane.topic_map for lane in lanes))):
+                    self._check_work_time()
+                    active = [lane for lane in lanes if src_id in lane.topic_map]
+
+                    for lane in active:
+                        if source_is_forum and lane.is_channel and self.settings.forum_to_channel_topic_header:
+                            await lane.service._ensure_topic_header_in_channel(
+                                source, lane.target,
+                                topic_id=src_id,
+                                topic_title=lane.topic_titles.get(src_id, f"Tópico {src_id}"),
+                            )
+
+                    await self._fanout_topic(source, src_id, active, source_is_forum=source_is_forum)
+
+                for lane in lanes:
+                    if source_is_forum and lane.is_channel and self.settings.forum_to_channel_final_index:
+                        await lane.service._send_final_navigation_index(source, lane.target, lane.topic_titles)
+                    if self.settings.sync_pins:
+                        await lane.service._sync_pinned_messages(source, lane.target, target_is_forum=lane.is_forum)
+
+                self._log_visual("✅ Clonagem de Grupo Completa", force_clean_view=True)
+
+                cycle.finish()
+                cycles += 1
+                self.memory.on_cycle(self)
+                if self.config.max_cycles and cycles >= self.config.max_cycles:
+                    return
+
                 logging.info(f"Ciclo concluído. Dormindo 60s...")
                 await asyncio.sleep(60)
 
             except WorkTimeLimitReached:
+                self.history.pause(self._history_lane)
                 sleep_time = self.config.pause_duration_hours * 3600
                 self._log_visual(f"🛑 Pausa para descanso ({self.config.pause_duration_hours}h)...", force_clean_view=True)
+                self.status.set_phase(f"🛑 Descanso ({self.config.pause_duration_hours}h)")
                 await asyncio.sleep(sleep_time)
                 self.session_start_time = time.time()
-                
+                # Depois do descanso: a vazão do histórico inclui o tempo parado
+                cycle.finish("WorkTimeLimitReached")
+
             except errors.FloodWaitError as e:
                 await self._handle_flood_wait(e)
+                cycle.finish("FloodWaitError")
             except Exception as e:
+                cycle.finish(type(e).__name__)
                 self._log_visual(f"Erro crítico no ciclo: {e}", is_error=True)
                 await asyncio.sleep(10)
 
+    def _fanout_child(self, target_chat_id: int) -> "ClonerService":
+        config = dataclasses.replace(self.config, target_chat_id=target_chat_id, extra_target_chat_ids=[])
+        child = ClonerService(self.client, config, self.settings, self.storage, self.source_client, self.metrics, self.tracer, memory=self.memory, status=self.status, history=self.history, budget=self.budget)
+        child.is_premium = self.is_premium
+        child.session_start_time = self.session_start_time
+        return child
+
+    async def _fanout_topic(self, source, src_id: int, lanes: list, *, source_is_forum: bool):
+        """Um leitor para o tópico e um escritor por destino, ligados por FanoutFeed."""
+        # Tempo máximo que um destino cheio segura os demais: ~um lote inteiro de envios
+        offer_timeout = max(60.0, self.config.batch_size * self.config.delay_between_messages)
+
+        starts = []
+        for lane in lanes:
+            lane.service._feed = FanoutFeed(self.settings.fanout_buffer_batches)
+            starts.append(await lane.service._get_start_message_id(source, lane.target.id, src_id, source_is_forum=source_is_forum))
+
+        writers = [
+            asyncio.ensure_future(lane.service._process_topic_messages(
+                source, lane.target, src_id, lane.topic_map[src_id],
+                source_is_forum=source_is_forum,
+                target_is_forum=lane.is_forum,
+                target_is_channel=lane.is_channel,
+                topic_titles=lane.topic_titles,
+            ))
+            for lane in lanes
+        ]
+
+        try:
+            # Lê a partir do destino mais atrasado; os demais pulam o que já enviaram
+            last_id = min(starts)
+            while True:
+                feeds = [
+                    (lane.service._feed, writer) for lane, writer in zip(lanes, writers)
+                    if not writer.done() and not lane.service._feed.detached
+                ]
+                if not feeds:
+                    break
+
+                get_kwargs = self._history_kwargs(last_id, src_id, source_is_forum=source_is_forum)
+                batch = list(await self._read_source(lambda r: r.get_messages(source, **get_kwargs)) or [])
+                await asyncio.gather(*(feed.offer(batch, offer_timeout, writer) for feed, writer in feeds))
+                for lane in lanes:
+                    self.metrics.queue_depth(f"fanout:{lane.target.id}", lane.service._feed.queue.qsize())
+
+                if not batch:
+                    break
+                if self._past_window_end(batch[-1]):
+                    # Fim da janela: os escritores param sozinhos; o lote vazio só garante o encerramento
+                    await asyncio.gather(*(feed.offer([], offer_timeout, writer) for feed, writer in feeds if not feed.detached))
+                    break
+                last_id = batch[-1].id
+
+            results = await asyncio.gather(*writers, return_exceptions=True)
+        finally:
+            for writer in writers:
+                if not writer.done():
+                    writer.cancel()
+            for lane in lanes:
+                lane.service._feed = None
+
+        for lane, result in zip(lanes, results):
+            if isinstance(result, (WorkTimeLimitReached, errors.FloodWaitError)):
+                raise result
+            if isinstance(result, Exception):
+                self._log_visual(f"Erro no destino {lane.target.id}: {result}", is_error=True)
+            elif result:
+                self.storage.mark_topic_completed(source.id, lane.target.id, src_id)
+
+    # ===== Exportação para arquivo local (sem destino) =====
+    async def _run_archive_export(self, source):
+        archive = ArchiveWriter(self.config.archive_dir, segment_max_bytes=self.settings.archive_segment_mb * 1024 * 1024)
+        source_is_forum = bool(getattr(source, 'forum', False))
+        self._log_visual(f"💾 Exportando para: {os.path.abspath(self.config.archive_dir)}", force_clean_view=True)
+
+        cycles = 0
+        try:
+            while True:
+                try:
+                    await self._open_takeout()
+
+                    if source_is_forum:
+                        source_topics = [t for t in await self._list_source_topics(source) if not isinstance(t, ForumTopicDeleted)]
+                        allowed_ids = set(await self._select_topics_from_manifest([(t.id, t.title) for t in source_topics]))
+                        topics = [{
+                            "id": t.id,
+                            "title": t.title,
+                            "icon_color": getattr(t, 'icon_color', None),
+                            "icon_emoji_id": getattr(t, 'icon_emoji_id', None),
+                            "closed": bool(getattr(t, 'closed', False)),
+                            "pinned": bool(getattr(t, 'pinned', False)),
+                        } for t in reversed(source_topics) if t.id in allowed_ids or t.id == 1]
+                    else:
+                        topics = [{"id": 1, "title": getattr(source, 'title', 'Chat'), "closed": False, "pinned": False}]
+
+                    archive.write_manifest({
+                        "version": 1,
+                        "source_chat_id": source.id,
+                        "title": getattr(source, 'title', None),
+                        "forum": source_is_forum,
+                        "broadcast": bool(getattr(source, 'broadcast', False)),
+                        "exported_at": datetime.now().isoformat(),
+                        "topics": topics,
+                    })
+
+                    for topic in topics:
+                        if topic["id"] not in self.logged_topics:
+                            self._log_visual(f"⚙️ Exportando Tópico {topic['id']}", force_clean_view=True)
+                            self.logged_topics.add(topic["id"])
+                        await self._export_topic_messages(source, archive, topic["id"], source_is_forum=source_is_forum)
+                        self.storage.mark_topic_completed(source.id, archive.chat_id, topic["id"])
+
+                    self._log_visual("✅ Exportação Completa", force_clean_view=True)
+                    cycles += 1
+                    self.memory.on_cycle(self)
+                    if self.config.max_cycles and cycles >= self.config.max_cycles:
+                        return
+                    logging.info(f"Ciclo concluído. Dormindo 60s...")
+                    await asyncio.sleep(60)
+
+                except errors.FloodWaitError as e:
+                    await self._handle_flood_wait(e)
+                except Exception as e:
+                    self._log_visual(f"Erro crítico na exportação: {e}", is_error=True)
+                    await asyncio.sleep(10)
+        finally:
+            await self._close_takeout()
+
+    async def _export_topic_messages(self, source, archive: ArchiveWriter, topic_id: int, *, source_is_forum: bool):
+        """Lê o tópico em lotes e grava cada lote no segmento; o checkpoint só avança após o fsync."""
+        last_id = await self._get_start_message_id(source, archive.chat_id, topic_id, source_is_forum=source_is_forum)
+
+        while True:
+            get_kwargs = self._history_kwargs(last_id, topic_id, source_is_forum=source_is_forum)
+
+            messages = await self._read_source(lambda r: r.get_messages(source, **get_kwargs))
+            messages = [m for m in messages if m.id > last_id]
+            in_window = [m for m in messages if not self._past_window_end(m)]
+            if len(in_window) < len(messages):
+                # Fim da janela neste lote: grava o que está dentro e encerra o tópico
+                messages, done = in_window, True
+            else:
+                done = False
+            if not messages:
+                return
+
+            files = await self._download_archive_media(archive, messages)
+            archive.append_records(topic_id, [serialize_message(m, topic_id, files.get(m.id)) for m in messages])
+
+            last_id = messages[-1].id
+            self.storage.save_last_message_id(source.id, archive.chat_id, topic_id, last_id)
+            if not self.settings.clean_visual:
+                logging.info(f"Lote exportado: {len(messages)} mensagens (até ID {last_id})")
+            if done:
+                return
+
+    async def _download_archive_media(self, archive: ArchiveWriter, messages) -> dict[int, str]:
+        """Baixa em paralelo (pool limitado) as mídias do lote que ainda não estão no diretório de mídias."""
+        semaphore = asyncio.Semaphore(max(1, self.settings.archive_download_workers))
+        files: dict[int, str] = {}
+        pending: dict[str, asyncio.Task] = {}
+
+        async def fetch(msg, rel_path: str):
+            async with semaphore:
+                with open(archive.media.partial_path(rel_path), 'wb') as f:
+                    await self._read_source(lambda r: r.download_media(msg, file=f))
+                archive.media.commit(rel_path)
+
+        for msg in messages:
+            key = media_key(msg)
+            if key is None or isinstance(msg.media, MessageMediaWebPage):
+                continue
+            rel_path = archive.media.relative_path(key, MediaStore.extension_for(msg))
+            files[msg.id] = rel_path
+            # Mesma foto/documento repostado: baixa uma única vez
+            if rel_path in pending or archive.media.exists(rel_path):
+                continue
+            pending[rel_path] = asyncio.create_task(fetch(msg, rel_path))
+
+        if not pending:
+            return files
+
+        results = await asyncio.gather(*pending.values(), return_exceptions=True)
+        failed = set()
+        for rel_path, result in zip(pending.keys(), results):
+            if isinstance(result, errors.FloodWaitError):
+                raise result
+            if isinstance(result, Exception):
+                self._log_visual(f"Erro baixando mídia {rel_path}: {result}", is_error=True)
+                failed.add(rel_path)
+
+        return {msg_id: (None if rel_path in failed else rel_path) for msg_id, rel_path in files.items()}
+
+    # ===== Restore: arquivo local -> destino =====
+    async def _run_archive_restore(self):
+        reader = ArchiveReader(self.config.restore_dir)
+        source = reader.source
+        try:
+            target = await self.client.get_entity(self.config.target_chat_id)
+        except Exception as e:
+            self._log_visual(f"Erro ao acessar chats: {e}", is_error=True)
+            return
+
+        target_is_forum = bool(getattr(target, 'forum', False))
+        target_is_channel = bool(getattr(target, 'broadcast', False))
+        topic_titles = {t.id: t.title for t in reader.topics}
+        self._log_visual(f"♻️ Restaurando backup: {os.path.abspath(self.config.restore_dir)}", force_clean_view=True)
+        self.status.set_job(source.id, target.id)
+        self.status.plan({t_id: (title, 0) for t_id, title in topic_titles.items()})
+        self.status.set_phase("♻️ Restaurando")
+
+        while True:
+            cycle = self.history.begin("cycle", source.id, target.id)
+            try:
+                topic_map = await self._map_archived_topics(reader, source, target, target_is_forum=target_is_forum)
+
+                for src_id, tgt_id in sorted(topic_map.items()):
+                    self._check_work_time()
+                    if self.storage.is_topic_completed(source.id, target.id, src_id):
+                        continue
+
+                    if src_id not in self.logged_topics:
+                        self._log_visual(f"⚙️ Restaurando Tópico {src_id}", force_clean_view=True)
+                        self.logged_topics.add(src_id)
+
+                    if source.forum and target_is_channel and self.settings.forum_to_channel_topic_header:
+                        await self._ensure_topic_header_in_channel(
+                            source, target,
+                            topic_id=src_id,
+                            topic_title=topic_titles.get(src_id, f"Tópico {src_id}"),
+                        )
+
+                    self._history_lane = target.id
+                    with self.history.record("topic", source.id, target.id, src_id, lane=target.id):
+                        done = await self._restore_topic_messages(reader, source, target, src_id, tgt_id, target_is_forum=target_is_forum)
+                    if not done:
+                        self._log_visual(f"⚠️ Tópico {src_id} com falhas pendentes: será retomado na próxima execução", is_error=True)
+                        continue
+                    self.storage.mark_topic_completed(source.id, target.id, src_id)
+                    self.status.topic_done(src_id)
+                    self._log_visual("✅ Tópico Completo.", force_clean_view=True)
+
+                if source.forum and target_is_channel and self.settings.forum_to_channel_final_index:
+                    await self._send_final_navigation_index(source, target, topic_titles)
+
+                self._log_visual("✅ Restauração Completa", force_clean_view=True)
+                cycle.finish()
+                return
+
+            except WorkTimeLimitReached:
+                self.history.pause(self._history_lane)
+                sleep_time = self.config.pause_duration_hours * 3600
+                self._log_visual(f"🛑 Pausa para descanso ({self.config.pause_duration_hours}h)...", force_clean_view=True)
+                self.status.set_phase(f"🛑 Descanso ({self.config.pause_duration_hours}h)")
+                await asyncio.sleep(sleep_time)
+                self.session_start_time = time.time()
+                # Depois do descanso: a vazão do histórico inclui o tempo parado
+                cycle.finish("WorkTimeLimitReached")
+
+            except errors.FloodWaitError as e:
+                await self._handle_flood_wait(e)
+                cycle.finish("FloodWaitError")
+            except Exception as e:
+                cycle.finish(type(e).__name__)
+                self._log_visual(f"Erro crítico no restore: {e}", is_error=True)
+                await asyncio.sleep(10)
+
+    async def _map_archived_topics(self, reader: ArchiveReader, source, target, *, target_is_forum: bool) -> dict[int, int]:
+        """Mapeia os tópicos do arquivo no destino, criando os que faltarem (mesma lógica do clone)."""
+        current_map = self.storage.get_topic_map(source.id, target.id)
+        topics = reader.topics
+
+        if not target_is_forum:
+            for topic in topics:
+                current_map.setdefault(topic.id, 0)
+            return current_map
+
+        missing = [t for t in topics if t.id not in current_map]
+        if not missing:
+            return current_map
+
+        target_titles = await self._list_target_topic_titles(target)
+        for topic in missing:
+            self._check_work_time()
+            if topic.title in target_titles:
+                current_map[topic.id] = target_titles[topic.title]
+                self.storage.save_topic_mapping(source.id, target.id, topic.id, current_map[topic.id])
+                continue
+            try:
+                real_id = await self._create_target_topic(target, topic)
+                if not real_id: continue
+                self.storage.save_topic_mapping(source.id, target.id, topic.id, real_id)
+                current_map[topic.id] = real_id
+            except errors.FloodWaitError as e:
+                await self._handle_flood_wait(e)
+            except Exception as e:
+                self._log_visual(f"Erro criando tópico {topic.title}: {e}", is_error=True)
+
+        return current_map
+
+    async def _restore_topic_messages(self, reader: ArchiveReader, source, target, src_id: int, tgt_id: int, *, target_is_forum: bool) -> bool:
+        """Reenvia os registros do tópico; os uploads dos próximos registros correm enquanto o atual é enviado.
+
+        Retorna False se ficaram registros na fila de falhas (o tópico não é marcado como completo).
+        """
+        last_id = self.storage.get_last_message_id(source.id, target.id, src_id)
+        self.status.topic_started(src_id, last_id)
+        reply_to = tgt_id if target_is_forum and tgt_id else None
+        await self._retry_failed_records(reader, source, target, src_id, reply_to=reply_to, target_is_forum=target_is_forum)
+
+        records = reader.iter_records(src_id, after_id=last_id)
+        ahead = max(1, self.settings.restore_upload_ahead)
+        window = collections.deque()
+        flood_retries: collections.Counter = collections.Counter()
+
+        def refill():
+            while len(window) < ahead:
+                record = next(records, None)
+                if record is None:
+                    return
+                window.append((record, asyncio.ensure_future(self._upload_archived_media(reader, record))))
+
+        try:
+            refill()
+            while window:
+                self._check_work_time()
+                record, upload = window.popleft()
+                refill()
+                self.metrics.queue_depth("restore_uploads", len(window))
+
+                if record.get("service"):
+                    last_id = record["id"]
+                    self.storage.save_last_message_id(source.id, target.id, src_id, last_id)
+                    continue
+
+                if not self.settings.clean_visual:
+                    self.session_message_count += 1
+                    message_log.info(
+                        "MENSAGEM %d ID -> %d", self.session_message_count, record['id'],
+                        extra={"job": f"{source.id}->{target.id}", "topic": src_id, "msg_id": record['id']},
+                    )
+
+                try:
+                    media = await upload
+                    sent_msgs = await self._send_archived_record(source, target, src_id, record, media, reply_to=reply_to, target_is_forum=target_is_forum)
+                    if sent_msgs is None:
+                        # Mídia não baixada na exportação e sem legenda: nada a enviar
+                        last_id = record["id"]
+                        self.storage.save_last_message_id(source.id, target.id, src_id, last_id)
+                        continue
+
+                    last_id = record["id"]
+                    self.storage.save_last_message_id(source.id, target.id, src_id, last_id)
+                    self.metrics.message_sent(f"{source.id}->{target.id}", src_id, parse_date(record["date"]) if record.get("date") else None)
+                    self.status.message_sent(src_id, record["id"])
+                    self.history.message_sent(target.id)
+                    await asyncio.sleep(self.config.delay_between_messages)
+
+                except errors.FloodWaitError as e:
+                    await self._handle_flood_wait(e)
+                    flood_retries[record["id"]] += 1
+                    if flood_retries[record["id"]] > SEND_FLOOD_RETRIES:
+                        self.storage.record_failed_message(source.id, target.id, src_id, record["id"], f"FloodWait {e.seconds}s")
+                        continue
+                    # Reenvia o mesmo registro: reaproveita o upload concluído, refaz o que falhou
+                    if upload.cancelled() or upload.exception() is not None:
+                        upload = asyncio.ensure_future(self._upload_archived_media(reader, record))
+                    window.appendleft((record, upload))
+                except Exception as e:
+                    self._log_visual(f"Erro msg {record['id']}: {e}", is_error=True)
+                    self.storage.record_failed_message(source.id, target.id, src_id, record["id"], str(e))
+                    await asyncio.sleep(2)
+            await self._flush_service_messages()
+        finally:
+            for _, upload in window:
+                upload.cancel()
+
+        # Falhas deste passe: mais uma tentativa; o que sobrar mantém o tópico aberto para a próxima execução
+        await self._retry_failed_records(reader, source, target, src_id, reply_to=reply_to, target_is_forum=target_is_forum)
+        return not self.storage.list_failed_messages(source.id, target.id, src_id)
+
+    async def _send_archived_record(self, source, target, src_id: int, record: dict, media, *, reply_to, target_is_forum: bool) -> Optional[list[int]]:
+        """Envia um registro do arquivo (e fixa, se era fixado). None se não há nada a enviar."""
+        text = record.get("text") or ""
+        if media is None and not text:
+            return None
+
+        entities = [
+            e for e in from_jsonable(record.get("entities") or [])
+            if e is not None and not isinstance(e, MessageEntityMentionName)
+        ]
+        is_webpage = (record.get("media") or {}).get("type") == "webpage"
+        sent_msgs = await self._send_content(
+            target, text, media=media, entities=entities, reply_to=reply_to, link_preview=is_webpage,
+            journal=(source.id, src_id, record["id"])
+        )
+
+        if record.get("pinned") and sent_msgs:
+            await self._pin_cloned(target, sent_msgs[0], target_is_forum=target_is_forum)
+            if len(self._service_purge.get(target.id, (None, []))[1]) >= 100:
+                await self._flush_service_messages()
+
+        await self._pace_after_send(len(sent_msgs))
+        return sent_msgs
+
+    async def _retry_failed_records(self, reader: ArchiveReader, source, target, src_id: int, *, reply_to, target_is_forum: bool):
+        """Reenvia os registros do tópico que ficaram na fila de falhas (atrás do checkpoint).
+
+        O diário de envios impede duplicatas: partes já entregues não são reenviadas.
+        FloodWait sobe para o laço do restore, que espera e recomeça o tópico.
+        """
+        failed = set(self.storage.list_failed_messages(source.id, target.id, src_id))
+        if not failed:
+            return
+        with self.tracer.span("retry_failed", cat="send", topic=src_id):
+            for record in reader.iter_records(src_id, after_id=min(failed) - 1):
+                if record["id"] not in failed:
+                    continue
+                failed.discard(record["id"])
+                try:
+                    media = await self._upload_archived_media(reader, record)
+                    sent_msgs = await self._send_archived_record(source, target, src_id, record, media, reply_to=reply_to, target_is_forum=target_is_forum)
+                    self.storage.clear_failed_message(source.id, target.id, src_id, record["id"])
+                    if sent_msgs:
+                        self.status.message_sent(src_id, record["id"])
+                        self.history.message_sent(target.id)
+                        await asyncio.sleep(self.config.delay_between_messages)
+                except errors.FloodWaitError:
+                    raise
+                except Exception as e:
+                    self._log_visual(f"Erro no reenvio da msg {record['id']}: {e}", is_error=True)
+                if not failed:
+                    break
+            # Registros que não existem mais no arquivo não têm como ser reenviados
+            for msg_id in failed:
+                self.storage.clear_failed_message(source.id, target.id, src_id, msg_id)
+
+    async def _upload_archived_media(self, reader: ArchiveReader, record: dict):
+        """Monta a InputMedia de um registro do arquivo, enviando o arquivo local quando existir."""
+        media = record.get("media")
+        if not media:
+            return None
+
+        kind = media.get("type")
+        if kind == "other":
+            try:
+                return utils.get_input_media(from_jsonable(media.get("raw")))
+            except Exception:
+                return None
+
+        if kind not in ("photo", "document") or not media.get("file"):
+            return None
+        path = reader.media_path(media["file"])
+        if not os.path.exists(path):
+            return None
+
+        uploaded = await self.client.upload_file(path)
+        spoiler = bool(media.get("spoiler"))
+        if kind == "photo":
+            return InputMediaUploadedPhoto(file=uploaded, spoiler=spoiler)
+
+        attributes = [a for a in from_jsonable(media.get("attributes") or []) if a is not None]
+        return InputMediaUploadedDocument(
+            file=uploaded,
+            mime_type=media.get("mime") or "application/octet-stream",
+            attributes=attributes,
+            spoiler=spoiler,
+        )
+
     async def _sync_group_info(self, source, target):
-        if self.settings.update_photo and getattr(source, 'photo', None):
+        """Copia foto/descrição da origem só quando mudaram desde a última aplicação."""
+        applied_photo_id, applied_about_hash = self.storage.get_chat_info_state(source.id, target.id)
+
+        photo_id = getattr(getattr(source, 'photo', None), 'photo_id', None)
+        if self.settings.update_photo and photo_id and photo_id != applied_photo_id:
             try:
-                path = await self.client.download_profile_photo(source, file="temp_photo.jpg")
-                if path:
-                    file = await self.client.upload_file(path)
-                    await self.client(EditPhotoRequest(target, photo=file))
-                    os.remove(path)
+                with self.tracer.span("group_photo", cat="group_info"):
+                    # Baixa direto para a memória (sem arquivo temporário)
+                    data = await self.source_client.download_profile_photo(source, file=bytes)
+                    if data:
+                        file = await self.client.upload_file(data, file_name="photo.jpg")
+                        await self.client(EditPhotoRequest(target, photo=file))
+                        self.storage.save_chat_photo_id(source.id, target.id, photo_id)
+                        logging.info("🖼️ Foto do destino atualizada.")
             except Exception: pass
             
         if self.settings.update_desc:
             try:
-                full_source = await self.client(GetFullChannelRequest(source))
-                source_desc = full_source.full_chat.about
-                if source_desc:
-                    await self.client(EditChatAboutRequest(target, source_desc))
+                with self.tracer.span("group_about", cat="group_info"):
+                    full_source = await self.source_client(GetFullChannelRequest(source))
+                    source_desc = full_source.full_chat.about
+                    if source_desc:
+                        about_hash = hashlib.sha1(source_desc.encode('utf-8')).hexdigest()
+                        if about_hash != applied_about_hash:
+                            await self.client(EditChatAboutRequest(target, source_desc))
+                            self.storage.save_chat_about_hash(source.id, target.id, about_hash)
+                            logging.info("📝 Descrição do destino atualizada.")
             except Exception: pass
 
+    async def _list_source_topics(self, source, snapshots: Optional[dict] = None) -> list:
+        """Pagina os tópicos do fórum de origem (inclui ForumTopicDeleted).
+
+        O servidor devolve primeiro os fixados e depois os demais por atividade
+        mais recente. Com `snapshots`, a paginação para na página em que aparece
+        um tópico não fixado com o mesmo top_message do snapshot: renomear,
+        trocar ícone, fechar ou reabrir gera mensagem de serviço no tópico (e
+        muda o top_message), então dali para trás nada mudou.
+        """
+        source_topics = []
+        offset_date, offset_id, offset_topic = None, 0, 0
+        while True:
+            req = await self._read_source(lambda r: r(GetForumTopicsRequest(
+                channel=source, offset_date=offset_date, offset_id=offset_id, offset_topic=offset_topic, limit=100
+            )))
+            if not req.topics:
+                break
+            source_topics.extend(req.topics)
+
+            live = [t for t in req.topics if not isinstance(t, ForumTopicDeleted)]
+            if snapshots and any(
+                not t.pinned and snapshots.get(t.id, {}).get("top_message") == t.top_message
+                for t in live
+            ):
+                break
+            if len(req.topics) < 100 or not live:
+                break
+
+            last = live[-1]
+            dates = {m.id: m.date for m in req.messages}
+            offset_date, offset_id, offset_topic = dates.get(last.top_message), last.top_message, last.id
+        return source_topics
+
+    async def _get_source_topics_by_id(self, source, topic_ids: list[int]) -> list:
+        """Busca tópicos específicos da origem (inclui ForumTopicDeleted)."""
+        topics = []
+        for i in range(0, len(topic_ids), 100):
+            chunk = topic_ids[i:i + 100]
+            req = await self._read_source(lambda r: r(GetForumTopicsByIDRequest(channel=source, topics=chunk)))
+            topics.extend(req.topics)
+        return topics
+
+    @staticmethod
+    def _topic_snapshot(topic, top_message: Optional[int] = None) -> dict:
+        return {
+            "title": topic.title,
+            "icon_color": topic.icon_color,
+            "icon_emoji_id": topic.icon_emoji_id,
+            "closed": bool(topic.closed),
+            "pinned": bool(topic.pinned),
+            "top_message": topic.top_message if top_message is None else top_message,
+        }
+
+    async def _select_topics_from_manifest(self, topics_list: list[tuple[int, str]]) -> list[int]:
+        """Gera o topics_config.txt na primeira vez e retorna os IDs liberados (ON/P).
+
+        Sem terminal (modo daemon) a seleção vem do job (`topic_ids`/`skip_topic_ids`)
+        e o manifesto não é usado: ele é um arquivo só, compartilhado por todos os jobs.
+        """
+        if not self.config.interactive or self.config.topic_ids or self.config.skip_topic_ids:
+            allowed = set(self.config.topic_ids) or {t_id for t_id, _ in topics_list}
+            return [t_id for t_id, _ in topics_list if t_id in allowed and t_id not in self.config.skip_topic_ids]
+
+        if not os.path.exists("topics_config.txt"):
+            logging.info("Gerando manifesto de tópicos...")
+            txt_path = self.storage.export_topics_manifest(topics_list)
+            console.print(f"\n[bold yellow]⚠️  ARQUIVO GERADO: {txt_path}[/]")
+            console.print("[dim]Abra o arquivo .txt, mude 'ON' para 'OFF' nos tópicos indesejados.[/]")
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: input("Depois de salvar, aperte ENTER para continuar...")
+            )
+
+        return self.storage.read_topics_manifest()
+
     async def _sync_topics_with_manifest(self, source, target, *, source_is_forum: bool, target_is_forum: bool, source_is_channel: bool, target_is_channel: bool):
         self._check_work_time()
         topic_titles: dict[int, str] = {}
 
         # ===== Origem: fórum (tópicos) =====
         if source_is_forum:
-            source_topics = []
-            offset_id = 0
+            snapshots = self.storage.get_topic_snapshots(source.id, target.id)
+            # Sem snapshot ou sem manifesto: listagem completa (o manifesto precisa de todos os tópicos).
+            # No modo daemon não há manifesto: basta o snapshot
+            incremental = bool(snapshots) and (not self.config.interactive or os.path.exists("topics_config.txt"))
             try:
-                while True:
-                    req = await self.client(GetForumTopicsRequest(
-                        channel=source, offset_date=None, offset_id=offset_id, offset_topic=0, limit=100
-                    ))
-                    if not req.topics:
-                        break
-                    source_topics.extend(req.topics)
-                    offset_id = req.topics[-1].top_message
-                    if len(req.topics) < 100:
-                        break
+                with self.tracer.span("list_source_topics", cat="topics", incremental=incremental):
+                    source_topics = await self._list_source_topics(source, snapshots if incremental else None)
+                if incremental:
+                    # Fora da listagem parcial: falhas pendentes (top_message -1) e
+                    # fixados que sumiram do topo (desafixados)
+                    listed_ids = {t.id for t in source_topics}
+                    extra_ids = [
+                        t_id for t_id, snap in snapshots.items()
+                        if t_id not in listed_ids and (snap["top_message"] == -1 or snap["pinned"])
+                    ]
+                    if extra_ids:
+                        with self.tracer.span("get_source_topics_by_id", cat="topics", count=len(extra_ids)):
+                            source_topics.extend(await self._get_source_topics_by_id(source, extra_ids))
             except Exception as e:
                 self._log_visual(f"Erro listando tópicos origem: {e}", is_error=True)
                 return {}, {}
 
-            topics_list = [(t.id, t.title) for t in source_topics if not isinstance(t, ForumTopicDeleted)]
-            topic_titles = {t_id: title for t_id, title in topics_list}
+            deleted_ids = [t.id for t in source_topics if isinstance(t, ForumTopicDeleted) and t.id in snapshots]
+            if deleted_ids:
+                self.storage.delete_topic_snapshots(source.id, target.id, deleted_ids)
+            source_topics = [t for t in source_topics if not isinstance(t, ForumTopicDeleted)]
 
-            if not os.path.exists("topics_config.txt"):
-                logging.info("Gerando manifesto de tópicos...")
-                txt_path = self.storage.export_topics_manifest(topics_list)
-                console.print(f"\n[bold yellow]⚠️  ARQUIVO GERADO: {txt_path}[/]")
-                console.print("[dim]Abra o arquivo .txt, mude 'ON' para 'OFF' nos tópicos indesejados.[/]")
-                await asyncio.get_running_loop().run_in_executor(
-                    None, lambda: input("Depois de salvar, aperte ENTER para continuar...")
-                )
+            topic_titles = {t_id: snap["title"] for t_id, snap in snapshots.items() if t_id not in deleted_ids}
+            topic_titles.update((t.id, t.title) for t in source_topics)
 
-            allowed_ids = self.storage.read_topics_manifest()
+            allowed_ids = await self._select_topics_from_manifest(list(topic_titles.items()))
             if not allowed_ids:
                 # se o usuário apagou tudo, não faz nada
                 return {}, {}
@@ -284,41 +1251,14 @@ class ClonerService:
         if not target_is_forum:
             for t_id in allowed_ids:
                 current_map.setdefault(t_id, 0)
+            if source_is_forum:
+                self.storage.save_topic_snapshots(source.id, target.id, {t.id: self._topic_snapshot(t) for t in source_topics})
             return current_map, topic_titles
 
-        # ===== Destino: fórum =====
-        target_titles = {}
-        try:
-            # Paginação completa do destino (evita limite de 100)
-            all_target = []
-            offset_id = 0
-            while True:
-                t_req = await self.client(GetForumTopicsRequest(
-                    channel=target, offset_date=None, offset_id=offset_id, offset_topic=0, limit=100
-                ))
-                if not t_req.topics:
-                    break
-                all_target.extend(t_req.topics)
-                offset_id = t_req.topics[-1].top_message
-                if len(t_req.topics) < 100:
-                    break
-            target_titles = {t.title: t.id for t in all_target}
-        except Exception:
-            target_titles = {}
-
-        # Lista de "tópicos" a criar no destino
-        if source_is_forum:
-            topics_to_process = [t for t in reversed(source_topics) if not isinstance(t, ForumTopicDeleted)]
-        else:
-            topics_to_process = []
-        
-        iter_topics = topics_to_process
-        if not self.settings.clean_visual:
-            iter_topics = track(topics_to_process, description="Sincronizando Tópicos...")
-
         # Caso origem NÃO seja fórum (grupo/canal), garantimos um tópico único no destino
         if not source_is_forum:
             if 1 not in current_map:
+                target_titles = await self._list_target_topic_titles(target)
                 title = topic_titles.get(1, 'Chat')
                 if title in target_titles:
                     current_map[1] = target_titles[title]
@@ -342,114 +1282,262 @@ class ClonerService:
 
             return current_map, topic_titles
 
-        for topic in iter_topics:
-            self._check_work_time()
-            if topic.id not in allowed_ids and topic.id != 1: continue
-            if topic.id in current_map: continue
+        # ===== Destino: fórum =====
+        # Lista de "tópicos" a processar (criar ou atualizar), do mais antigo para o mais recente
+        topics_to_process = list(reversed(source_topics))
+        to_create = [t for t in topics_to_process if (t.id in allowed_ids or t.id == 1) and t.id not in current_map]
+        # O destino só é listado quando há tópico a criar
+        target_titles = {}
+        if to_create:
+            with self.tracer.span("list_target_topics", cat="topics"):
+                target_titles = await self._list_target_topic_titles(target)
 
-            if topic.title in target_titles:
-                tgt_id = target_titles[topic.title]
-                self.storage.save_topic_mapping(source.id, target.id, topic.id, tgt_id)
-                current_map[topic.id] = tgt_id
-                continue
+        iter_topics = topics_to_process
+        # Com o painel ao vivo não há barra própria (só um rich.Live por vez)
+        if not self.settings.clean_visual and not self.status.enabled and to_create:
+            iter_topics = track(topics_to_process, description="Sincronizando Tópicos...")
 
-            try:
-                icon_color = getattr(topic, 'icon_color', 0x6FB9F0)
-                icon_emoji = getattr(topic, 'icon_emoji_id', None)
-                if not self.is_premium: icon_emoji = None
-                
-                await self.client(CreateForumTopicRequest(
-                    channel=target, title=topic.title, 
-                    icon_color=icon_color, icon_emoji_id=icon_emoji
-                ))
-                await asyncio.sleep(2)
+        new_snapshots: dict[int, dict] = {}
+        try:
+            for topic in iter_topics:
+                self._check_work_time()
+                snap = snapshots.get(topic.id)
+                new_snapshots[topic.id] = self._topic_snapshot(topic)
 
-                req = await self.client(GetForumTopicsRequest(
-                    channel=target, offset_date=None, offset_id=0, offset_topic=0, limit=100
-                ))
-                
-                real_id = None
-                for t in req.topics:
-                    if t.title == topic.title:
-                        real_id = t.id
-                        break
-                
-                if not real_id: continue
-                
-                self.storage.save_topic_mapping(source.id, target.id, topic.id, real_id)
-                current_map[topic.id] = real_id
-                
-                await asyncio.sleep(0.5)
-                await self._cleanup_service_messages(target, real_id)
+                if topic.id not in allowed_ids and topic.id != 1: continue
 
-                if self.settings.fix_topics and getattr(topic, 'pinned', False):
+                # Já existe no destino: replica só o que mudou desde o último snapshot
+                if topic.id in current_map:
+                    if snap is None:
+                        continue
                     try:
-                        await self.client(UpdatePinnedForumTopicRequest(
-                            channel=target, topic_id=real_id, pinned=True
-                        ))
-                    except Exception: pass
-
-                should_close = (
-                    self.settings.close_topics == "ON" or 
-                    (self.settings.close_topics == "PARCIAL" and getattr(topic, 'closed', False))
-                )
-                if should_close:
-                    await self.client(EditForumTopicRequest(
-                        channel=target, topic_id=real_id, closed=True
-                    ))
+                        with self.tracer.span("apply_topic_changes", cat="topics", topic=topic.id):
+                            await self._apply_topic_changes(target, topic, snap, current_map[topic.id])
+                    except errors.FloodWaitError as e:
+                        new_snapshots[topic.id] = dict(snap, top_message=-1)
+                        await self._handle_flood_wait(e)
+                    except Exception as e:
+                        new_snapshots[topic.id] = dict(snap, top_message=-1)
+                        self._log_visual(f"Erro atualizando tópico {topic.title}: {e}", is_error=True)
+                    continue
 
-            except errors.FloodWaitError as e:
-                await self._handle_flood_wait(e)
-            except Exception as e:
-                self._log_visual(f"Erro criando tópico {topic.title}: {e}", is_error=True)
+                if topic.title in target_titles:
+                    tgt_id = target_titles[topic.title]
+                    self.storage.save_topic_mapping(source.id, target.id, topic.id, tgt_id)
+                    current_map[topic.id] = tgt_id
+                    continue
+
+                try:
+                    with self.tracer.span("create_topic", cat="topics", topic=topic.id):
+                        real_id = await self._create_target_topic(target, topic)
+                    if not real_id:
+                        new_snapshots[topic.id] = self._topic_snapshot(topic, top_message=-1)
+                        continue
+
+                    self.storage.save_topic_mapping(source.id, target.id, topic.id, real_id)
+                    current_map[topic.id] = real_id
+
+                except errors.FloodWaitError as e:
+                    new_snapshots[topic.id] = self._topic_snapshot(topic, top_message=-1)
+                    await self._handle_flood_wait(e)
+                except Exception as e:
+                    new_snapshots[topic.id] = self._topic_snapshot(topic, top_message=-1)
+                    self._log_visual(f"Erro criando tópico {topic.title}: {e}", is_error=True)
+        finally:
+            # Uma única escrita por ciclo (inclusive se o limite de trabalho interromper o loop)
+            self.storage.save_topic_snapshots(source.id, target.id, new_snapshots)
+
+        await self._flush_service_messages()
 
         return current_map, topic_titles
 
-        
+    async def _apply_topic_changes(self, target, topic, snap: dict, tgt_topic_id: int) -> bool:
+        """Replica no tópico do destino as mudanças do tópico de origem desde o snapshot."""
+        edit = {}
+        if topic.title != snap["title"]:
+            edit["title"] = topic.title
+        if self.is_premium and topic.icon_emoji_id != snap["icon_emoji_id"]:
+            # 0 volta para o ícone padrão
+            edit["icon_emoji_id"] = topic.icon_emoji_id or 0
+        if self.settings.close_topics == "PARCIAL" and bool(topic.closed) != snap["closed"]:
+            edit["closed"] = bool(topic.closed)
+        pin_changed = self.settings.fix_topics and bool(topic.pinned) != snap["pinned"]
+
+        if not edit and not pin_changed:
+            return False
+
+        if edit:
+            result = await self.client(EditForumTopicRequest(channel=target, topic_id=tgt_topic_id, **edit))
+            self._queue_service_messages(target, result)
+        if pin_changed:
+            await self.client(UpdatePinnedForumTopicRequest(
+                channel=target, topic_id=tgt_topic_id, pinned=bool(topic.pinned)
+            ))
+
+        logging.info(f"🔄 Tópico {topic.id} atualizado no destino: {', '.join(list(edit) + (['pinned'] if pin_changed else []))}")
+        return True
 
-    async def _cleanup_service_messages(self, target, topic_id):
+    async def _list_target_topic_titles(self, target) -> dict[str, int]:
+        """Título -> ID de todos os tópicos do fórum de destino (paginação completa)."""
         try:
-            msgs = await self.client.get_messages(target, limit=5, reply_to=topic_id)
-            for m in msgs:
-                if isinstance(m, MessageService):
-                    await self.client.delete_messages(target, m.id)
-        except Exception: pass
+            all_target = []
+            offset_id = 0
+            while True:
+                t_req = await self.client(GetForumTopicsRequest(
+                    channel=target, offset_date=None, offset_id=offset_id, offset_topic=0, limit=100
+                ))
+                if not t_req.topics:
+                    break
+                all_target.extend(t_req.topics)
+                offset_id = t_req.topics[-1].top_message
+                if len(t_req.topics) < 100:
+                    break
+            return {t.title: t.id for t in all_target}
+        except Exception:
+            return {}
+
+    async def _create_target_topic(self, target, topic) -> Optional[int]:
+        """Cria no destino um tópico equivalente a `topic` (título, ícone, fixação, fechamento).
+
+        `topic` só precisa dos atributos de ForumTopic (id, title, icon_color,
+        icon_emoji_id, pinned, closed). Retorna o ID real do tópico criado.
+        """
+        icon_color = getattr(topic, 'icon_color', 0x6FB9F0)
+        icon_emoji = getattr(topic, 'icon_emoji_id', None)
+        if not self.is_premium: icon_emoji = None
+
+        await self.client(CreateForumTopicRequest(
+            channel=target, title=topic.title,
+            icon_color=icon_color, icon_emoji_id=icon_emoji
+        ))
+        await asyncio.sleep(2)
+
+        req = await self.client(GetForumTopicsRequest(
+            channel=target, offset_date=None, offset_id=0, offset_topic=0, limit=100
+        ))
+
+        real_id = None
+        for t in req.topics:
+            if t.title == topic.title:
+                real_id = t.id
+                break
+
+        if not real_id:
+            return None
+
+        if self.settings.fix_topics and getattr(topic, 'pinned', False):
+            try:
+                await self.client(UpdatePinnedForumTopicRequest(
+                    channel=target, topic_id=real_id, pinned=True
+                ))
+            except Exception: pass
 
-    async def _process_topic_messages(self, source, target, src_id, tgt_id, *, source_is_forum: bool, target_is_forum: bool, target_is_channel: bool, topic_titles: dict[int, str]) -> bool:
-        last_id = self.storage.get_last_message_id(source.id, target.id, src_id)
+        should_close = (
+            self.settings.close_topics == "ON" or
+            (self.settings.close_topics == "PARCIAL" and getattr(topic, 'closed', False))
+        )
+        if should_close:
+            result = await self.client(EditForumTopicRequest(
+                channel=target, topic_id=real_id, closed=True
+            ))
+            self._queue_service_messages(target, result)
+
+        return real_id
+
+    # ===== Limpeza de mensagens de serviço =====
+    def _queue_service_messages(self, target, result):
+        """Enfileira as mensagens de serviço (pin, edição de tópico...) vindas na própria resposta.
+
+        `result` é o Updates de uma requisição ou a Message devolvida por
+        pin_message. A criação do tópico (MessageActionTopicCreate) nunca entra:
+        apagá-la apagaria o tópico.
+        """
+        if result is None:
+            return
+        if isinstance(result, MessageService):
+            messages = [result]
+        else:
+            messages = [
+                u.message for u in getattr(result, 'updates', [])
+                if isinstance(u, (UpdateNewChannelMessage, UpdateNewMessage))
+            ]
+        ids = [
+            m.id for m in messages
+            if isinstance(m, MessageService) and not isinstance(m.action, MessageActionTopicCreate)
+        ]
+        if ids:
+            self._service_purge.setdefault(target.id, (target, []))[1].extend(ids)
+            self.metrics.queue_depth("service_purge", sum(len(v[1]) for v in self._service_purge.values()))
+
+    async def _flush_service_messages(self):
+        """Apaga as mensagens de serviço enfileiradas (delete_messages agrupa até 100 IDs por requisição)."""
+        pending, self._service_purge = self._service_purge, {}
+        self.metrics.queue_depth("service_purge", 0)
+        for target, ids in pending.values():
+            try:
+                with self.tracer.span("cleanup:service_messages", cat="send", count=len(ids)):
+                    await self.client.delete_messages(target, ids)
+            except errors.FloodWaitError as e:
+                await self._handle_flood_wait(e)
+                self._service_purge.setdefault(target.id, (target, []))[1].extend(ids)
+            except Exception: pass
+
+    async def _process_topic_messages(self, source, target, src_id, tgt_id, **kwargs) -> bool:
+        """Clona o tópico e grava o trecho no histórico de execuções (envios, chamadas, FloodWait, pausas)."""
+        self._history_lane = target.id
+        with self.history.record("topic", source.id, target.id, src_id, lane=target.id):
+            return await self._clone_topic_messages(source, target, src_id, tgt_id, **kwargs)
+
+    async def _clone_topic_messages(self, source, target, src_id, tgt_id, *, source_is_forum: bool, target_is_forum: bool, target_is_channel: bool, topic_titles: dict[int, str]) -> bool:
+        last_id = await self._get_start_message_id(source, target.id, src_id, source_is_forum=source_is_forum)
+        self.status.topic_started(src_id, last_id)
 
         # 1) Tenta reenviar falhas antigas primeiro
         try:
-            for failed_id in self.storage.list_failed_messages(source.id, target.id, src_id):
-                if failed_id <= last_id:
-                    # já passou desse ponto
-                    self.storage.clear_failed_message(source.id, target.id, src_id, failed_id)
-                    continue
-                ok = await self._clone_single_message(source, target, failed_id, src_id, tgt_id, source_is_forum, target_is_forum)
-                if ok:
-                    last_id = max(last_id, failed_id)
-                    self.storage.save_last_message_id(source.id, target.id, src_id, last_id)
-                    self.storage.clear_failed_message(source.id, target.id, src_id, failed_id)
-                    await asyncio.sleep(self.config.delay_between_messages)
+            # Mesmo atrás do checkpoint: o diário de envios impede duplicatas (partes já enviadas são puladas)
+            with self.tracer.span("retry_failed", cat="send", topic=src_id):
+                for failed_id in self.storage.list_failed_messages(source.id, target.id, src_id):
+                    ok = await self._clone_single_message(source, target, failed_id, src_id, tgt_id, source_is_forum, target_is_forum)
+                    if ok:
+                        last_id = max(last_id, failed_id)
+                        self.storage.save_last_message_id(source.id, target.id, src_id, last_id)
+                        self.storage.clear_failed_message(source.id, target.id, src_id, failed_id)
+                        await asyncio.sleep(self.config.delay_between_messages)
         except Exception:
             pass
         
         while True:
             self._check_work_time()
             
-            get_kwargs = dict(min_id=last_id, limit=self.config.batch_size, reverse=True)
-            if source_is_forum:
-                get_kwargs['reply_to'] = src_id
+            get_kwargs = self._history_kwargs(last_id, src_id, source_is_forum=source_is_forum)
 
-            messages = await self.client.get_messages(source, **get_kwargs)
+            with self.tracer.span("history_fetch", cat="read", topic=src_id):
+                messages = await self._next_history_batch(source, get_kwargs)
             
             if not messages: 
+                await self._flush_service_messages()
+                self._report_topic_skips(src_id)
+                self.status.topic_done(src_id)
                 return True 
+
+            if self._writer_refetch:
+                with self.tracer.span("prefetch_writer_copies", cat="read"):
+                    await self._prefetch_writer_copies(messages)
             
             for msg in messages:
                 if msg.id <= last_id: 
                     continue
 
+                if self._lease.lost:
+                    raise LeaseLost()
+
+                # Passou do fim da janela: o tópico está completo para esta janela
+                if self._past_window_end(msg):
+                    await self._flush_service_messages()
+                    self._report_topic_skips(src_id)
+                    self.status.topic_done(src_id)
+                    return True
+
                 current_msg_id = msg.id
                 
                 if isinstance(msg, MessageService):
@@ -457,109 +1545,415 @@ class ClonerService:
                     self.storage.save_last_message_id(source.id, target.id, src_id, last_id)
                     continue
 
+                # Filtrada: não envia, mas o checkpoint avança
+                if self._message_filter is not None and not self._message_filter(msg):
+                    self.filtered_counts[src_id] += 1
+                    last_id = current_msg_id
+                    self.storage.save_last_message_id(source.id, target.id, src_id, last_id)
+                    continue
+
                 if not self.settings.clean_visual:
                     # ATUALIZAÇÃO 2: Contador sequencial no log
                     self.session_message_count += 1
-                    logging.info(f"MENSAGEM {self.session_message_count} ID -> {msg.id}")
-
-                media = msg.media
-                if isinstance(media, MessageMediaWebPage):
-                    media = None 
-
-                text = msg.message or ""
-                limit = 4096
-                if media:
-                    limit = 2048 if self.is_premium else 1024
-                
-                should_split = len(text) > limit
+                    message_log.info(
+                        "MENSAGEM %d ID -> %d", self.session_message_count, msg.id,
+                        extra={"job": f"{source.id}->{target.id}", "topic": src_id, "msg_id": msg.id},
+                    )
 
-                try:
-                    sent_msgs = []
+                content_h = content_hash(msg) if self.settings.dedup_mode != "OFF" else None
 
-                    reply_to = tgt_id if target_is_forum and tgt_id else None
+                flood_retries = 0
+                while True:
+                    try:
+                        reply_to = tgt_id if target_is_forum and tgt_id else None
+                        first_copy = self._get_dedup_index(target).lookup(content_h) if content_h is not None else 0
+
+                        with self.tracer.span("send", cat="send", topic=src_id, msg=current_msg_id):
+                            if first_copy:
+                                # Repost de conteúdo já enviado a este destino
+                                self.dedup_counts[src_id] += 1
+                                sent_msgs = []
+                                if self.settings.dedup_mode == "LINK":
+                                    link = self._build_message_link(target, first_copy)
+                                    sent_msgs = await self._send_content(
+                                        target, f"🔁 Repost: {link}", reply_to=reply_to,
+                                        journal=(source.id, src_id, current_msg_id)
+                                    )
+                            else:
+                                sent_msgs = await self._send_source_message(
+                                    target, msg, reply_to=reply_to, journal=(source.id, src_id, current_msg_id)
+                                )
+
+                            if getattr(msg, 'pinned', False) and sent_msgs:
+                                await self._pin_cloned(target, sent_msgs[0], target_is_forum=target_is_forum)
+
+                            if content_h is not None and sent_msgs:
+                                self._get_dedup_index(target).remember(content_h, source.id, src_id, current_msg_id, sent_msgs[0])
+
+                        await self._pace_after_send(len(sent_msgs))
+
+                        last_id = current_msg_id
+                        self.storage.save_last_message_id(source.id, target.id, src_id, last_id)
+                        # Repost pulado (PULAR) não conta como enviado: fica só no dedup_counts
+                        if sent_msgs:
+                            self.metrics.message_sent(f"{source.id}->{target.id}", src_id, msg.date)
+                            self.status.message_sent(src_id, current_msg_id)
+                            self.history.message_sent(target.id)
+                            with self.tracer.span("sleep:delay", cat="sleep"):
+                                await asyncio.sleep(self.config.delay_between_messages)
                     
-                    if should_split:
-                        if not self.settings.clean_visual:
-                            logging.info(f"Mensagem em Partes -> {msg.id}")
-
-                        parts = [text[i:i+limit] for i in range(0, len(text), limit)]
-                        
-                        s1 = await self.client.send_message(
-                            target, parts[0], file=media, reply_to=reply_to, link_preview=False
-                        )
-                        if not isinstance(s1, list): s1 = [s1]
-                        sent_msgs.extend(s1)
-
-                        for p in parts[1:]:
-                            await asyncio.sleep(0.5)
-                            s2 = await self.client.send_message(target, p, reply_to=reply_to)
-                            if not isinstance(s2, list): s2 = [s2]
-                            sent_msgs.extend(s2)
-                    else:
-                        s = await self.client.send_message(
-                            target, message=msg, reply_to=reply_to, link_preview=False
+                    except errors.FloodWaitError as e:
+                        await self._handle_flood_wait(e)
+                        # Reenvia a mesma mensagem (o diário de envios evita duplicar partes já entregues);
+                        # esgotadas as tentativas, fica na fila de falhas em vez de ser pulada
+                        flood_retries += 1
+                        if flood_retries <= SEND_FLOOD_RETRIES:
+                            continue
+                        self.storage.record_failed_message(source.id, target.id, src_id, current_msg_id, f"FloodWait {e.seconds}s")
+                    except Exception as e:
+                        # Não avança checkpoint em erro: registra para retry
+                        self._log_visual(
+                            f"Erro msg {msg.id}: {e}", is_error=True,
+                            extra={"job": f"{source.id}->{target.id}", "topic": src_id, "msg_id": current_msg_id},
                         )
-                        if not isinstance(s, list): s = [s]
-                        sent_msgs.extend(s)
-                    
-                    if getattr(msg, 'pinned', False) and sent_msgs:
-                        try:
-                            main_sent = sent_msgs[0]
-                            await self.client.pin_message(target, main_sent, notify=False)
-                            await asyncio.sleep(0.5)
-                            if target_is_forum and tgt_id:
-                                await self._cleanup_service_messages(target, tgt_id)
-                        except Exception: pass
-
-                    self.messages_sent += len(sent_msgs)
-                    if self.messages_sent >= self.config.pause_every_x_messages:
-                        self._log_visual("⏸ Pausando para evitar flood...", force_clean_view=True)
-                        await asyncio.sleep(self.config.pause_duration_s)
-                        self.session_start_time += self.config.pause_duration_s
-                        self.messages_sent = 0
+                        self.storage.record_failed_message(source.id, target.id, src_id, current_msg_id, str(e))
+                        await asyncio.sleep(2)
+                    break
 
-                    last_id = current_msg_id
-                    self.storage.save_last_message_id(source.id, target.id, src_id, last_id)
-                    await asyncio.sleep(self.config.delay_between_messages)
-                    
-                except errors.FloodWaitError as e:
-                    await self._handle_flood_wait(e)
-                except Exception as e:
-                    # Não avança checkpoint em erro: registra para retry
-                    self._log_visual(f"Erro msg {msg.id}: {e}", is_error=True)
-                    self.storage.record_failed_message(source.id, target.id, src_id, current_msg_id, str(e))
-                    await asyncio.sleep(2)
+            # Fim do lote: apaga de uma vez as mensagens de serviço dos pins
+            await self._flush_service_messages()
+            # Solta o lote (objetos TL completos) antes de buscar o próximo: no máximo um lote vivo por vez
+            messages = None
+            self._writer_copies = {}
         
         return True
 
+    # ===== Sincronização de fixados =====
+    @staticmethod
+    async def _search_pinned_ids(call, chat) -> set[int]:
+        """IDs fixados no chat inteiro (em fóruns, de todos os tópicos), via filtro de busca de fixados."""
+        pinned = set()
+        offset_id = 0
+        while True:
+            result = await call(SearchRequest(
+                peer=chat, q='', filter=InputMessagesFilterPinned(),
+                min_date=None, max_date=None, offset_id=offset_id, add_offset=0,
+                limit=100, max_id=0, min_id=0, hash=0
+            ))
+            ids = [m.id for m in result.messages]
+            pinned.update(ids)
+            if len(ids) < 100:
+                return pinned
+            offset_id = ids[-1]
+
+    async def _sync_pinned_messages(self, source, target, *, target_is_forum: bool):
+        """Aplica no destino só a diferença entre os fixados da origem e os do destino.
+
+        Uma busca por lado no chat inteiro (não uma por tópico): o custo por ciclo
+        não cresce com o número de tópicos. A correspondência de IDs vem do diário
+        de envios: fixados de tópicos fora da seleção não têm cópia e são ignorados,
+        e fixados do destino que não vieram da origem (cabeçalhos, índice) nunca são tocados.
+        """
+        read_source = lambda req: self._read_source(lambda r: r(req))
+        try:
+            source_pinned = await self._search_pinned_ids(read_source, source)
+            target_pinned = await self._search_pinned_ids(self.client, target)
+        except errors.FloodWaitError as e:
+            await self._handle_flood_wait(e)
+            return
+        except Exception as e:
+            self._log_visual(f"Erro listando fixados: {e}", is_error=True)
+            return
+
+        wanted = self.storage.get_target_message_ids(source.id, target.id, sorted(source_pinned))
+        cloned_pinned = self.storage.get_source_message_ids(source.id, target.id, sorted(target_pinned))
+
+        to_pin = sorted(set(wanted.values()) - target_pinned)
+        to_unpin = sorted(t_id for t_id, s_id in cloned_pinned.items() if s_id not in source_pinned)
+        if not to_pin and not to_unpin:
+            return
+
+        for t_id in to_unpin:
+            try:
+                await self.client.unpin_message(target, t_id)
+            except errors.FloodWaitError as e:
+                await self._handle_flood_wait(e)
+            except Exception: pass
+        for t_id in to_pin:
+            await self._pin_cloned(target, t_id, target_is_forum=target_is_forum)
+        await self._flush_service_messages()
+
+        logging.info(f"📌 Fixados sincronizados: +{len(to_pin)} / -{len(to_unpin)}")
+
+    async def _next_history_batch(self, source, get_kwargs: dict) -> list:
+        """Próximo lote do histórico: do fan-out (lido uma vez para todos os destinos) ou direto da origem."""
+        feed = self._feed
+        if feed is not None and not (feed.detached and feed.queue.empty()):
+            return await feed.queue.get()
+        return await self._read_source(lambda r: r.get_messages(source, **get_kwargs))
+
+    # ===== Janela de clonagem (datas/IDs) =====
+    def _history_kwargs(self, last_id: int, topic_id: int, *, source_is_forum: bool) -> dict:
+        get_kwargs = dict(min_id=last_id, limit=self.config.batch_size, reverse=True)
+        if self.settings.max_message_id:
+            # max_id é exclusivo: o próprio servidor corta o fim da janela
+            get_kwargs['max_id'] = self.settings.max_message_id + 1
+        if source_is_forum:
+            get_kwargs['reply_to'] = topic_id
+        return get_kwargs
+
+    def _past_window_end(self, msg) -> bool:
+        if self.settings.max_message_id and msg.id > self.settings.max_message_id:
+            return True
+        return self._window_end is not None and msg.date is not None and msg.date >= self._window_end
+
+    async def _get_start_message_id(self, source, target_key: int, topic_id: int, *, source_is_forum: bool) -> int:
+        """Checkpoint do tópico; num clone novo com janela, salta direto para o primeiro ID da janela."""
+        last_id = self.storage.get_last_message_id(source.id, target_key, topic_id)
+        if last_id or not (self._window_start or self.settings.min_message_id):
+            return last_id
+
+        seed = max(0, self.settings.min_message_id - 1)
+        if self._window_start is not None:
+            first_id = await self._find_first_id_from_date(source, topic_id, source_is_forum=source_is_forum)
+            seed = max(seed, first_id - 1)
+
+        if seed:
+            self._log_visual(f"⏩ Tópico {topic_id}: iniciando a partir do ID {seed + 1}", force_clean_view=True)
+            self.storage.save_last_message_id(source.id, target_key, topic_id, seed)
+        return seed
+
+    async def _find_first_id_from_date(self, source, topic_id: int, *, source_is_forum: bool) -> int:
+        """Primeiro ID com data >= start_date: uma consulta por offset_date, com busca binária como fallback."""
+        start = self._window_start
+        base_kwargs = {'reply_to': topic_id} if source_is_forum else {}
+
+        try:
+            msgs = await self._read_source(lambda r: r.get_messages(source, limit=1, offset_date=start, reverse=True, **base_kwargs))
+            if msgs and msgs[0].date >= start:
+                return msgs[0].id
+        except errors.FloodWaitError:
+            raise
+        except Exception:
+            pass
+
+        # Fallback: busca binária nos IDs (~log2(N) consultas de 1 mensagem)
+        newest = await self._read_source(lambda r: r.get_messages(source, limit=1, **base_kwargs))
+        if not newest:
+            return 0
+        if newest[0].date < start:
+            # Nada dentro da janela ainda: começa depois da última mensagem
+            return newest[0].id + 1
+
+        lo, hi = 1, newest[0].id
+        while lo < hi:
+            mid = (lo + hi) // 2
+            # Mensagem mais recente com ID <= mid
+            found = await self._read_source(lambda r: r.get_messages(source, limit=1, offset_id=mid + 1, **base_kwargs))
+            if not found or found[0].date < start:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _get_dedup_index(self, target) -> DedupIndex:
+        index = self._dedup_indexes.get(target.id)
+        if index is None:
+            index = DedupIndex(self.storage, target.id)
+            self._dedup_indexes[target.id] = index
+        return index
+
+    def _report_topic_skips(self, topic_id: int):
+        """Resumo por tópico do que deixou de ser enviado (reposts e filtros)."""
+        count = self.dedup_counts.pop(topic_id, 0)
+        if count:
+            action = "viraram link" if self.settings.dedup_mode == "LINK" else "ignorados"
+            self._log_visual(f"🔁 {count} reposts {action} no tópico {topic_id}", force_clean_view=True)
+
+        filtered = self.filtered_counts.pop(topic_id, 0)
+        if filtered:
+            self._log_visual(f"🔎 {filtered} mensagens filtradas no tópico {topic_id}", force_clean_view=True)
+
+    def _text_limit(self, media) -> int:
+        """Limite de caracteres do Telegram: legenda de mídia (premium tem o dobro) ou texto puro."""
+        if media:
+            return 2048 if self.is_premium else 1024
+        return 4096
+
+    async def _send_content(self, target, text: str, *, media=None, entities=None, reply_to=None, source_msg=None, link_preview: bool = False, journal: Optional[tuple] = None) -> list[int]:
+        """Envia um conteúdo ao destino, dividindo textos acima do limite em várias mensagens.
+
+        Com `source_msg` (e sem divisão) a mensagem original é reenviada como está;
+        caso contrário são usados `text`, `entities` e `media`.
+
+        Com `journal` = (chat de origem, tópico, ID da mensagem), cada parte ganha
+        um random_id gravado antes do envio: um reenvio (retry ou queda antes do
+        checkpoint) reaproveita o mesmo random_id, o Telegram descarta a duplicata
+        e partes já confirmadas nem são reenviadas. Retorna os IDs no destino.
+        """
+        limit = self._text_limit(media)
+
+        if len(text) > limit:
+            if not self.settings.clean_visual:
+                logging.info(f"Mensagem em Partes -> {source_msg.id if source_msg else '?'}")
+
+            chunks = [text[i:i+limit] for i in range(0, len(text), limit)]
+            # entities=None: as partes passam pelo parse_mode do client
+            parts = [(chunks[0], media, None)] + [(c, None, None) for c in chunks[1:]]
+            link_preview = False
+        elif source_msg is not None:
+            parts = [(source_msg.message or "", media, source_msg.entities)]
+            link_preview = isinstance(source_msg.media, MessageMediaWebPage)
+        else:
+            parts = [(text, media, entities or [])]
+
+        sent_ids = []
+        for part, (part_text, part_media, part_entities) in enumerate(parts):
+            sent_id = await self._send_part(
+                target, part, part_text, media=part_media, entities=part_entities,
+                reply_to=reply_to, link_preview=link_preview, journal=journal
+            )
+            if sent_id > 0:
+                sent_ids.append(sent_id)
+        return sent_ids
+
+    async def _send_part(self, target, part: int, text: str, *, media, entities, reply_to, link_preview: bool, journal: Optional[tuple]) -> int:
+        """Envia uma parte com random_id explícito (do diário, quando houver)."""
+        random_id = helpers.generate_random_long()
+        if journal is not None:
+            source_chat, topic_id, msg_id = journal
+            random_id, sent_id = self.storage.reserve_send_part(source_chat, target.id, topic_id, msg_id, part, random_id)
+            if sent_id:
+                return sent_id
+
+        if part:
+            await asyncio.sleep(0.5)
+        await self._wait_send_budget(target.id)
+
+        if entities is None:
+            text, entities = await self.client._parse_message_text(text, ())
+
+        entity = await self.client.get_input_entity(target)
+        reply = InputReplyToMessage(reply_to) if reply_to else None
+        if media is not None:
+            request = SendMediaRequest(
+                peer=entity, media=utils.get_input_media(media), message=text,
+                entities=entities, reply_to=reply, random_id=random_id
+            )
+        else:
+            request = SendMessageRequest(
+                peer=entity, message=text, entities=entities,
+                no_webpage=not link_preview, reply_to=reply, random_id=random_id
+            )
+
+        try:
+            result = await self.client(request)
+            self.budget.record(target.id)
+            if isinstance(result, UpdateShortSentMessage):
+                sent_id = result.id
+            else:
+                sent = self.client._get_response_message(request, result, entity)
+                sent_id = sent.id if sent else -1
+        except errors.RandomIdDuplicateError:
+            # Chegou ao Telegram numa tentativa anterior: não há o que reenviar
+            sent_id = -1
+
+        if journal is not None:
+            self.storage.mark_send_part_sent(source_chat, target.id, msg_id, part, sent_id)
+        return sent_id
+
+    async def _wait_send_budget(self, target_id: int):
+        """Espera a vez do próximo envio dentro dos limites por hora/dia (conta e destino)."""
+        while True:
+            wait, reason = self.budget.next_send_in(target_id)
+            if wait <= 0:
+                return
+            if wait < 60:
+                with self.tracer.span("sleep:budget", cat="sleep"):
+                    await asyncio.sleep(wait)
+                continue
+            self._log_visual(f"⏳ Limite de envio ({reason}): próximo envio em {wait / 60:.0f} min", force_clean_view=True)
+            phase = self.status.phase
+            self.status.set_phase(f"⏳ Limite de envio ({reason})")
+            with self.tracer.span("sleep:budget", cat="sleep"):
+                await asyncio.sleep(wait)
+            self.status.set_phase(phase)
+
+    async def _send_source_message(self, target, msg, *, reply_to, journal: tuple) -> list[int]:
+        """Reenvia uma mensagem da origem.
+
+        Com contas separadas, a mídia vem com referências do leitor; se o escritor
+        as recusar, a mensagem é relida por ID pelo escritor e reenviada (o mesmo
+        random_id do diário é reaproveitado), e os próximos lotes já são relidos
+        de uma vez em _prefetch_writer_copies.
+        """
+        msg = self._writer_copies.pop(msg.id, msg)
+        media = msg.media
+        if isinstance(media, MessageMediaWebPage):
+            media = None
+
+        try:
+            return await self._send_content(
+                target, msg.message or "", media=media, reply_to=reply_to, source_msg=msg, journal=journal
+            )
+        except FOREIGN_MEDIA_ERRORS:
+            if media is None or self.source_client is self.client:
+                raise
+            self._writer_refetch = True
+            writer_msg = await self.client.get_messages(self.config.source_chat_id, ids=msg.id)
+            if not writer_msg:
+                raise
+        return await self._send_content(
+            target, writer_msg.message or "", media=writer_msg.media, reply_to=reply_to, source_msg=writer_msg, journal=journal
+        )
+
+    async def _prefetch_writer_copies(self, messages):
+        """Relê pelo escritor, numa única chamada, as mensagens com mídia do lote."""
+        ids = [m.id for m in messages if m.media is not None and not isinstance(m.media, MessageMediaWebPage)]
+        self._writer_copies = {}
+        if not ids:
+            return
+        try:
+            copies = await self.client.get_messages(self.config.source_chat_id, ids=ids)
+            self._writer_copies = {m.id: m for m in copies if m is not None}
+        except errors.FloodWaitError:
+            raise
+        except Exception:
+            # Sem acesso do escritor à origem: segue com as referências do leitor
+            pass
+
+    async def _pin_cloned(self, target, sent, *, target_is_forum: bool):
+        try:
+            with self.tracer.span("pin", cat="send"):
+                service_msg = await self.client.pin_message(target, sent, notify=False)
+            if target_is_forum:
+                self._queue_service_messages(target, service_msg)
+        except Exception: pass
+
+    async def _pace_after_send(self, sent_count: int):
+        """Micro pausa a cada `pause_every_x_messages` mensagens enviadas."""
+        self.messages_sent += sent_count
+        if self.messages_sent >= self.config.pause_every_x_messages:
+            self._log_visual("⏸ Pausando para evitar flood...", force_clean_view=True)
+            self.history.pause(self._history_lane)
+            with self.tracer.span("sleep:pace", cat="sleep"):
+                await asyncio.sleep(self.config.pause_duration_s)
+            self.session_start_time += self.config.pause_duration_s
+            self.messages_sent = 0
+
     async def _clone_single_message(self, source, target, message_id: int, src_topic_id: int, tgt_topic_id: int, source_is_forum: bool, target_is_forum: bool) -> bool:
         """Reenvia uma msg específica (usado no retry)."""
         try:
-            msg = await self.client.get_messages(source, ids=message_id)
+            msg = await self._read_source(lambda r: r.get_messages(source, ids=message_id))
             if not msg:
                 return True
             if isinstance(msg, MessageService):
                 return True
 
-            media = msg.media
-            if isinstance(media, MessageMediaWebPage):
-                media = None
-
-            text = msg.message or ""
-            limit = 4096
-            if media:
-                limit = 2048 if self.is_premium else 1024
-            should_split = len(text) > limit
             reply_to = tgt_topic_id if target_is_forum and tgt_topic_id else None
-
-            if should_split:
-                parts = [text[i:i+limit] for i in range(0, len(text), limit)]
-                await self.client.send_message(target, parts[0], file=media, reply_to=reply_to, link_preview=False)
-                for p in parts[1:]:
-                    await asyncio.sleep(0.5)
-                    await self.client.send_message(target, p, reply_to=reply_to)
-            else:
-                await self.client.send_message(target, message=msg, reply_to=reply_to, link_preview=False)
+            await self._send_source_message(
+                target, msg, reply_to=reply_to, journal=(source.id, src_topic_id, message_id)
+            )
 
             return True
         except errors.FloodWaitError as e:
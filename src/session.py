@@ -0,0 +1,287 @@
+import asyncio
+import datetime
+import itertools
+import os
+import sqlite3
+from typing import Optional
+
+from telethon import utils
+from telethon.crypto import AuthKey
+from telethon.sessions import MemorySession, SQLiteSession
+from telethon.tl.types import PeerChannel, PeerChat, PeerUser, updates
+
+
+class BufferedSession(MemorySession):
+    """Sessão do Telethon mantida em memória e gravada em SQLite em intervalos.
+
+    A SQLiteSession padrão grava entidades e estados de update no disco a cada
+    resposta. Aqui essas mudanças ficam acumuladas e vão para o banco em uma
+    única transação a cada `flush_interval_s` (e no encerramento). Mudanças de
+    DC/chave de autorização são gravadas na hora (sem elas o login se perde).
+
+    `db_path` pode ser o próprio cloner_data.db: as tabelas têm prefixo
+    tg_session_ e são separadas por `name`.
+    """
+
+    def __init__(self, db_path: str, name: str):
+        super().__init__()
+        self.db_path = db_path
+        self.name = name
+
+        # ID -> linha (id, hash, username, phone, name). _entities aponta para a
+        # view dos valores, então as buscas herdadas do MemorySession continuam valendo
+        self._rows: dict[int, tuple] = {}
+        self._entities = self._rows.values()
+
+        self._dirty_rows: dict[int, tuple] = {}
+        self._dirty_states: set[int] = set()
+        # Linhas descartadas por trim(): buscas que falham na memória consultam o banco
+        self._trimmed = False
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self._init_db()
+        if not self._load():
+            self._import_telethon_session()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS tg_session (
+                    name TEXT PRIMARY KEY,
+                    dc_id INTEGER,
+                    server_address TEXT,
+                    port INTEGER,
+                    auth_key BLOB,
+                    takeout_id INTEGER
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS tg_session_entities (
+                    name TEXT,
+                    id INTEGER,
+                    hash INTEGER,
+                    username TEXT,
+                    phone TEXT,
+                    display_name TEXT,
+                    PRIMARY KEY (name, id)
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS tg_session_update_state (
+                    name TEXT,
+                    entity_id INTEGER,
+                    pts INTEGER,
+                    qts INTEGER,
+                    date INTEGER,
+                    seq INTEGER,
+                    PRIMARY KEY (name, entity_id)
+                )
+            """)
+            conn.commit()
+
+    def _load(self) -> bool:
+        """Carrega a sessão salva; False se ainda não existe nenhuma com este nome."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT dc_id, server_address, port, auth_key, takeout_id
+                FROM tg_session WHERE name = ?
+            """, (self.name,))
+            row = cursor.fetchone()
+            if not row:
+                return False
+
+            self._dc_id, self._server_address, self._port = row[0] or 0, row[1], row[2]
+            self._auth_key = AuthKey(data=row[3]) if row[3] else None
+            self._takeout_id = row[4]
+
+            cursor.execute("""
+                SELECT id, hash, username, phone, display_name
+                FROM tg_session_entities WHERE name = ?
+            """, (self.name,))
+            for r in cursor.fetchall():
+                self._rows[r[0]] = tuple(r)
+
+            cursor.execute("""
+                SELECT entity_id, pts, qts, date, seq
+                FROM tg_session_update_state WHERE name = ?
+            """, (self.name,))
+            for entity_id, pts, qts, date, seq in cursor.fetchall():
+                self._update_states[entity_id] = updates.State(
+                    pts, qts, datetime.datetime.fromtimestamp(date, tz=datetime.timezone.utc), seq, unread_count=0
+                )
+        return True
+
+    def _import_telethon_session(self):
+        """Primeira execução: reaproveita o login do arquivo .session do Telethon, se existir."""
+        if not os.path.exists(f"{self.name}.session"):
+            return
+        old = SQLiteSession(self.name)
+        try:
+            self._dc_id, self._server_address, self._port = old.dc_id, old.server_address, old.port
+            self._auth_key = old.auth_key
+            self._takeout_id = old.takeout_id
+            cursor = old._cursor()
+            cursor.execute("SELECT id, hash, username, phone, name FROM entities")
+            for r in cursor.fetchall():
+                self._rows[r[0]] = self._dirty_rows[r[0]] = tuple(r)
+            cursor.close()
+        finally:
+            old.close()
+        self.flush()
+
+    # ===== Mudanças críticas: gravadas na hora =====
+    def set_dc(self, dc_id, server_address, port):
+        super().set_dc(dc_id, server_address, port)
+        self.flush()
+
+    @MemorySession.auth_key.setter
+    def auth_key(self, value):
+        self._auth_key = value
+        self.flush()
+
+    @MemorySession.takeout_id.setter
+    def takeout_id(self, value):
+        self._takeout_id = value
+        self.flush()
+
+    # ===== Mudanças acumuladas até o próximo flush =====
+    def process_entities(self, tlo):
+        for row in self._entities_to_rows(tlo):
+            if self._rows.get(row[0]) != row:
+                self._rows[row[0]] = self._dirty_rows[row[0]] = row
+
+    def set_update_state(self, entity_id, state):
+        super().set_update_state(entity_id, state)
+        self._dirty_states.add(entity_id)
+
+    def get_entity_rows_by_id(self, id, exact=True):
+        if not exact:
+            # ID sem marca (int positivo): tenta como usuário, grupo e canal
+            for peer in (PeerUser, PeerChat, PeerChannel):
+                result = self.get_entity_rows_by_id(utils.get_peer_id(peer(id)))
+                if result is not None:
+                    return result
+            return None
+
+        # Busca O(1) pelo dicionário (o MemorySession percorre todas as entidades)
+        row = self._rows.pop(id, None)
+        if row is None and self._trimmed:
+            row = self._load_row("id", id)
+        if row is None:
+            return None
+        # Reinsere no fim: a ordem do dicionário vira a ordem de uso (LRU do trim)
+        self._rows[id] = row
+        return row[0], row[1]
+
+    def get_entity_rows_by_username(self, username):
+        return super().get_entity_rows_by_username(username) or self._restore_row("username", username)
+
+    def get_entity_rows_by_phone(self, phone):
+        return super().get_entity_rows_by_phone(phone) or self._restore_row("phone", phone)
+
+    def get_entity_rows_by_name(self, name):
+        return super().get_entity_rows_by_name(name) or self._restore_row("display_name", name)
+
+    def _restore_row(self, column: str, value) -> Optional[tuple]:
+        """Busca no banco uma linha descartada pelo trim() e a devolve à memória."""
+        if not self._trimmed:
+            return None
+        row = self._load_row(column, value)
+        if row is None:
+            return None
+        self._rows[row[0]] = row
+        return row[0], row[1]
+
+    def _load_row(self, column: str, value) -> Optional[tuple]:
+        # `column` vem só deste módulo (id, username, phone, display_name)
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT id, hash, username, phone, display_name
+                FROM tg_session_entities WHERE name = ? AND {column} = ?
+            """, (self.name, value))
+            row = cursor.fetchone()
+        return tuple(row) if row else None
+
+    def trim(self, max_entities: int) -> int:
+        """Mantém no máximo `max_entities` entidades em memória, descartando as usadas há mais tempo.
+
+        As pendentes são gravadas antes, então nada se perde: continuam no banco
+        e voltam para a memória na próxima busca (por ID, username, telefone ou nome).
+        """
+        excess = len(self._rows) - max_entities
+        if max_entities <= 0 or excess <= 0:
+            return 0
+        if self._dirty_rows:
+            self.flush()
+        for id in list(itertools.islice(self._rows, excess)):
+            del self._rows[id]
+        self._trimmed = True
+        return excess
+
+    # ===== Gravação =====
+    def flush(self):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR REPLACE INTO tg_session (name, dc_id, server_address, port, auth_key, takeout_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                self.name, self._dc_id, self._server_address, self._port,
+                self._auth_key.key if self._auth_key else b'', self._takeout_id,
+            ))
+
+            if self._dirty_rows:
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO tg_session_entities (name, id, hash, username, phone, display_name)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, [(self.name, *row) for row in self._dirty_rows.values()])
+                self._dirty_rows = {}
+
+            if self._dirty_states:
+                rows = []
+                for entity_id in self._dirty_states:
+                    state = self._update_states.get(entity_id)
+                    if state is None:
+                        continue
+                    date = state.date.timestamp() if isinstance(state.date, datetime.datetime) else (state.date or 0)
+                    rows.append((self.name, entity_id, state.pts, state.qts, int(date), state.seq))
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO tg_session_update_state (name, entity_id, pts, qts, date, seq)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, rows)
+                self._dirty_states = set()
+
+            conn.commit()
+
+    def save(self):
+        self.flush()
+
+    def start_autoflush(self, interval_s: float):
+        """Grava as mudanças acumuladas a cada `interval_s` segundos (requer loop rodando)."""
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._autoflush(interval_s))
+
+    async def _autoflush(self, interval_s: float):
+        while True:
+            await asyncio.sleep(interval_s)
+            if self._dirty_rows or self._dirty_states:
+                self.flush()
+
+    def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self.flush()
+
+    def delete(self):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            for table in ("tg_session", "tg_session_entities", "tg_session_update_state"):
+                cursor.execute(f"DELETE FROM {table} WHERE name = ?", (self.name,))
+            conn.commit()
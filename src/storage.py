@@ -1,5 +1,6 @@
 import sqlite3
 import os
+import time
 from typing import Dict, List, Tuple
 
 class StorageRepository:
@@ -7,9 +8,15 @@ class StorageRepository:
         self.db_path = db_path
         self._init_db()
 
+    def _connect(self) -> sqlite3.Connection:
+        # busy timeout: vários processos (modo worker) podem escrever no mesmo banco
+        return sqlite3.connect(self.db_path, timeout=30)
+
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
+            # WAL: leitores não bloqueiam o escritor (persistente no arquivo do banco)
+            cursor.execute("PRAGMA journal_mode=WAL")
             
             # Tabela de Mapeamento
             cursor.execute("""
@@ -68,6 +75,118 @@ class StorageRepository:
                 )
             """)
 
+            # Último estado conhecido de cada tópico da origem (sincronização incremental de metadados)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS topic_snapshot (
+                    source_chat_id INTEGER,
+                    target_chat_id INTEGER,
+                    topic_id INTEGER,
+                    title TEXT,
+                    icon_color INTEGER,
+                    icon_emoji_id INTEGER,
+                    closed INTEGER DEFAULT 0,
+                    pinned INTEGER DEFAULT 0,
+                    top_message INTEGER DEFAULT 0,
+                    PRIMARY KEY (source_chat_id, target_chat_id, topic_id)
+                )
+            """)
+
+            # Última foto/descrição aplicadas no destino (evita reenviar o que não mudou)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS chat_info_state (
+                    source_chat_id INTEGER,
+                    target_chat_id INTEGER,
+                    photo_id INTEGER DEFAULT 0,
+                    about_hash TEXT DEFAULT '',
+                    PRIMARY KEY (source_chat_id, target_chat_id)
+                )
+            """)
+
+            # Diário de envios: random_id estável por parte de cada mensagem (reenvio sem duplicatas)
+            # target_message_id: 0 = ainda não confirmado, -1 = confirmado sem ID conhecido
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS send_journal (
+                    source_chat_id INTEGER,
+                    target_chat_id INTEGER,
+                    topic_id INTEGER,
+                    message_id INTEGER,
+                    part INTEGER,
+                    random_id INTEGER,
+                    target_message_id INTEGER DEFAULT 0,
+                    PRIMARY KEY (source_chat_id, target_chat_id, message_id, part)
+                )
+            """)
+
+            # Busca reversa (ID no destino -> ID na origem) usada na sincronização de fixados
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_send_journal_target
+                ON send_journal (target_chat_id, target_message_id)
+            """)
+
+            # Leases do modo worker: (origem, destino, tópico) pertence a um worker até expires_at
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS work_leases (
+                    source_chat_id INTEGER,
+                    target_chat_id INTEGER,
+                    topic_id INTEGER,
+                    worker_id TEXT,
+                    expires_at REAL,
+                    PRIMARY KEY (source_chat_id, target_chat_id, topic_id)
+                )
+            """)
+
+            # Índice de conteúdo já enviado por destino (deduplicação de reposts)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS dedup_index (
+                    target_chat_id INTEGER,
+                    content_hash INTEGER,
+                    source_chat_id INTEGER,
+                    topic_id INTEGER,
+                    message_id INTEGER,
+                    target_message_id INTEGER,
+                    PRIMARY KEY (target_chat_id, content_hash)
+                )
+            """)
+
+            # Histórico de execuções: um registro por ciclo e por tópico com envios (não é apagado no reset)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS run_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT,
+                    scope TEXT,
+                    source_chat_id INTEGER,
+                    target_chat_id INTEGER,
+                    topic_id INTEGER,
+                    started_at REAL,
+                    wall_s REAL,
+                    messages INTEGER,
+                    api_calls INTEGER,
+                    flood_wait_s REAL,
+                    pauses INTEGER,
+                    delay_s REAL,
+                    batch_size INTEGER,
+                    pause_every INTEGER,
+                    outcome TEXT,
+                    settings TEXT
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_run_history_run
+                ON run_history (run_id, scope)
+            """)
+
+            # Orçamento de envio: mensagens enviadas por minuto, por conta (scope='account')
+            # e por destino (scope='target'); sobrevive a reinícios e é compartilhado entre processos
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS send_budget (
+                    scope TEXT,
+                    key INTEGER,
+                    minute INTEGER,
+                    sent INTEGER,
+                    PRIMARY KEY (scope, key, minute)
+                )
+            """)
+
             # Migração leve de bancos antigos (v1) caso existam em instalações anteriores.
             self._migrate_if_needed(cursor)
             
@@ -124,7 +243,7 @@ class StorageRepository:
             return
 
     def reset_chat_progress(self, source_chat: int, target_chat: int):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 DELETE FROM topic_map 
@@ -135,10 +254,14 @@ class StorageRepository:
             cursor.execute("DELETE FROM topic_status WHERE source_chat_id = ? AND target_chat_id = ?", (source_chat, target_chat))
             cursor.execute("DELETE FROM topic_header WHERE source_chat_id = ? AND target_chat_id = ?", (source_chat, target_chat))
             cursor.execute("DELETE FROM failed_messages WHERE source_chat_id = ? AND target_chat_id = ?", (source_chat, target_chat))
+            cursor.execute("DELETE FROM dedup_index WHERE source_chat_id = ? AND target_chat_id = ?", (source_chat, target_chat))
+            cursor.execute("DELETE FROM topic_snapshot WHERE source_chat_id = ? AND target_chat_id = ?", (source_chat, target_chat))
+            cursor.execute("DELETE FROM chat_info_state WHERE source_chat_id = ? AND target_chat_id = ?", (source_chat, target_chat))
+            cursor.execute("DELETE FROM send_journal WHERE source_chat_id = ? AND target_chat_id = ?", (source_chat, target_chat))
             conn.commit()
 
     def is_topic_completed(self, source_chat: int, target_chat: int, topic_id: int) -> bool:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT completed FROM topic_status
@@ -148,7 +271,7 @@ class StorageRepository:
             return bool(row and row[0])
 
     def mark_topic_completed(self, source_chat: int, target_chat: int, topic_id: int):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT OR REPLACE INTO topic_status (source_chat_id, target_chat_id, topic_id, completed)
@@ -208,7 +331,7 @@ class StorageRepository:
         return on_ids
 
     def get_topic_map(self, source_chat: int, target_chat: int) -> Dict[int, int]:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT source_topic_id, target_topic_id 
@@ -218,7 +341,7 @@ class StorageRepository:
             return {row[0]: row[1] for row in cursor.fetchall()}
 
     def save_topic_mapping(self, source_chat: int, target_chat: int, src_id: int, tgt_id: int):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT OR REPLACE INTO topic_map 
@@ -227,8 +350,54 @@ class StorageRepository:
             """, (source_chat, target_chat, src_id, tgt_id))
             conn.commit()
 
+    # ===== Snapshot de tópicos =====
+    def get_topic_snapshots(self, source_chat: int, target_chat: int) -> Dict[int, dict]:
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT topic_id, title, icon_color, icon_emoji_id, closed, pinned, top_message
+                FROM topic_snapshot
+                WHERE source_chat_id = ? AND target_chat_id = ?
+            """, (source_chat, target_chat))
+            return {
+                row[0]: {
+                    "title": row[1],
+                    "icon_color": row[2],
+                    "icon_emoji_id": row[3],
+                    "closed": bool(row[4]),
+                    "pinned": bool(row[5]),
+                    "top_message": row[6],
+                }
+                for row in cursor.fetchall()
+            }
+
+    def save_topic_snapshots(self, source_chat: int, target_chat: int, snapshots: Dict[int, dict]):
+        if not snapshots:
+            return
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT OR REPLACE INTO topic_snapshot
+                (source_chat_id, target_chat_id, topic_id, title, icon_color, icon_emoji_id, closed, pinned, top_message)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (source_chat, target_chat, topic_id, snap["title"], snap["icon_color"], snap["icon_emoji_id"],
+                 int(snap["closed"]), int(snap["pinned"]), snap["top_message"])
+                for topic_id, snap in snapshots.items()
+            ])
+            conn.commit()
+
+    def delete_topic_snapshots(self, source_chat: int, target_chat: int, topic_ids: List[int]):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                "DELETE FROM topic_snapshot WHERE source_chat_id = ? AND target_chat_id = ? AND topic_id = ?",
+                [(source_chat, target_chat, t_id) for t_id in topic_ids]
+            )
+            conn.commit()
+
     def get_last_message_id(self, source_chat: int, target_chat: int, topic_id: int) -> int:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT last_message_id FROM sync_state 
@@ -238,7 +407,7 @@ class StorageRepository:
             return res[0] if res else 0
 
     def save_last_message_id(self, source_chat: int, target_chat: int, topic_id: int, msg_id: int):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?)
@@ -247,7 +416,7 @@ class StorageRepository:
 
     # ===== Cabeçalho / Índice =====
     def get_topic_header_message_id(self, source_chat: int, target_chat: int, topic_id: int) -> int:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT header_message_id FROM topic_header
@@ -257,7 +426,7 @@ class StorageRepository:
             return int(row[0]) if row and row[0] else 0
 
     def save_topic_header_message_id(self, source_chat: int, target_chat: int, topic_id: int, msg_id: int):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT OR REPLACE INTO topic_header VALUES (?, ?, ?, ?)
@@ -267,7 +436,7 @@ class StorageRepository:
     # ===== Falhas / Retry =====
     def record_failed_message(self, source_chat: int, target_chat: int, topic_id: int, msg_id: int, error: str):
         import time
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO failed_messages (source_chat_id, target_chat_id, topic_id, message_id, error, attempts, last_attempt_ts)
@@ -281,7 +450,7 @@ class StorageRepository:
             conn.commit()
 
     def clear_failed_message(self, source_chat: int, target_chat: int, topic_id: int, msg_id: int):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 DELETE FROM failed_messages
@@ -290,7 +459,7 @@ class StorageRepository:
             conn.commit()
 
     def list_failed_messages(self, source_chat: int, target_chat: int, topic_id: int, limit: int = 200):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT message_id FROM failed_messages
@@ -298,4 +467,244 @@ class StorageRepository:
                 ORDER BY message_id ASC
                 LIMIT ?
             """, (source_chat, target_chat, topic_id, limit))
-            return [int(r[0]) for r in cursor.fetchall()]
\ No newline at end of file
+            return [int(r[0]) for r in cursor.fetchall()]
+
+    def count_failed_messages(self, source_chat: int, target_chat: int) -> int:
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*) FROM failed_messages
+                WHERE source_chat_id = ? AND target_chat_id = ?
+            """, (source_chat, target_chat))
+            return int(cursor.fetchone()[0])
+
+    # ===== Diário de envios =====
+    def reserve_send_part(self, source_chat: int, target_chat: int, topic_id: int, msg_id: int, part: int, random_id: int) -> Tuple[int, int]:
+        """Grava o random_id da parte antes do envio (se ainda não existir).
+
+        Retorna (random_id, target_message_id) já registrados: o random_id de
+        uma tentativa anterior é reaproveitado.
+        """
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR IGNORE INTO send_journal
+                (source_chat_id, target_chat_id, topic_id, message_id, part, random_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (source_chat, target_chat, topic_id, msg_id, part, random_id))
+            cursor.execute("""
+                SELECT random_id, target_message_id FROM send_journal
+                WHERE source_chat_id = ? AND target_chat_id = ? AND message_id = ? AND part = ?
+            """, (source_chat, target_chat, msg_id, part))
+            row = cursor.fetchone()
+            conn.commit()
+            return int(row[0]), int(row[1] or 0)
+
+    def mark_send_part_sent(self, source_chat: int, target_chat: int, msg_id: int, part: int, target_msg_id: int):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE send_journal SET target_message_id = ?
+                WHERE source_chat_id = ? AND target_chat_id = ? AND message_id = ? AND part = ?
+            """, (target_msg_id, source_chat, target_chat, msg_id, part))
+            conn.commit()
+
+    def get_target_message_ids(self, source_chat: int, target_chat: int, msg_ids: List[int]) -> Dict[int, int]:
+        """ID na origem -> ID da 1ª parte no destino (só mensagens com envio confirmado)."""
+        result = {}
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            for i in range(0, len(msg_ids), 500):
+                chunk = msg_ids[i:i + 500]
+                cursor.execute(f"""
+                    SELECT message_id, target_message_id FROM send_journal
+                    WHERE source_chat_id = ? AND target_chat_id = ? AND part = 0 AND target_message_id > 0
+                    AND message_id IN ({",".join("?" * len(chunk))})
+                """, (source_chat, target_chat, *chunk))
+                result.update((int(r[0]), int(r[1])) for r in cursor.fetchall())
+        return result
+
+    def get_source_message_ids(self, source_chat: int, target_chat: int, target_msg_ids: List[int]) -> Dict[int, int]:
+        """ID da 1ª parte no destino -> ID na origem (inverso de get_target_message_ids)."""
+        result = {}
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            for i in range(0, len(target_msg_ids), 500):
+                chunk = target_msg_ids[i:i + 500]
+                cursor.execute(f"""
+                    SELECT target_message_id, message_id FROM send_journal
+                    WHERE source_chat_id = ? AND target_chat_id = ? AND part = 0
+                    AND target_message_id IN ({",".join("?" * len(chunk))})
+                """, (source_chat, target_chat, *chunk))
+                result.update((int(r[0]), int(r[1])) for r in cursor.fetchall())
+        return result
+
+    # ===== Leases (modo worker) =====
+    def claim_lease(self, source_chat: int, target_chat: int, topic_id: int, worker_id: str, ttl_s: float) -> bool:
+        """Pega (ou renova) o lease se estiver livre, expirado ou já for deste worker."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO work_leases (source_chat_id, target_chat_id, topic_id, worker_id, expires_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(source_chat_id, target_chat_id, topic_id) DO UPDATE
+                SET worker_id = excluded.worker_id, expires_at = excluded.expires_at
+                WHERE work_leases.expires_at < ? OR work_leases.worker_id = excluded.worker_id
+            """, (source_chat, target_chat, topic_id, worker_id, now + ttl_s, now))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def renew_lease(self, source_chat: int, target_chat: int, topic_id: int, worker_id: str, ttl_s: float) -> bool:
+        """Heartbeat: False se o lease expirou e foi tomado por outro worker."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE work_leases SET expires_at = ?
+                WHERE source_chat_id = ? AND target_chat_id = ? AND topic_id = ? AND worker_id = ?
+            """, (time.time() + ttl_s, source_chat, target_chat, topic_id, worker_id))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def release_lease(self, source_chat: int, target_chat: int, topic_id: int, worker_id: str):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM work_leases
+                WHERE source_chat_id = ? AND target_chat_id = ? AND topic_id = ? AND worker_id = ?
+            """, (source_chat, target_chat, topic_id, worker_id))
+            conn.commit()
+
+    # ===== Foto/descrição do grupo =====
+    def get_chat_info_state(self, source_chat: int, target_chat: int) -> Tuple[int, str]:
+        """(photo_id, hash da descrição) aplicados por último no destino."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT photo_id, about_hash FROM chat_info_state
+                WHERE source_chat_id = ? AND target_chat_id = ?
+            """, (source_chat, target_chat))
+            row = cursor.fetchone()
+            return (int(row[0] or 0), row[1] or "") if row else (0, "")
+
+    def save_chat_photo_id(self, source_chat: int, target_chat: int, photo_id: int):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO chat_info_state (source_chat_id, target_chat_id, photo_id)
+                VALUES (?, ?, ?)
+                ON CONFLICT(source_chat_id, target_chat_id) DO UPDATE SET photo_id = excluded.photo_id
+            """, (source_chat, target_chat, photo_id))
+            conn.commit()
+
+    def save_chat_about_hash(self, source_chat: int, target_chat: int, about_hash: str):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO chat_info_state (source_chat_id, target_chat_id, about_hash)
+                VALUES (?, ?, ?)
+                ON CONFLICT(source_chat_id, target_chat_id) DO UPDATE SET about_hash = excluded.about_hash
+            """, (source_chat, target_chat, about_hash))
+            conn.commit()
+
+    # ===== Histórico de execuções =====
+    def save_run_record(self, record: dict):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO run_history
+                (run_id, scope, source_chat_id, target_chat_id, topic_id, started_at, wall_s, messages,
+                 api_calls, flood_wait_s, pauses, delay_s, batch_size, pause_every, outcome, settings)
+                VALUES (:run_id, :scope, :source_chat_id, :target_chat_id, :topic_id, :started_at, :wall_s, :messages,
+                        :api_calls, :flood_wait_s, :pauses, :delay_s, :batch_size, :pause_every, :outcome, :settings)
+            """, record)
+            conn.commit()
+
+    def list_runs(self, limit: int = 20) -> List[dict]:
+        """Execuções mais recentes (soma dos ciclos de cada run_id)."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT run_id, MIN(started_at), COUNT(*), SUM(wall_s), SUM(messages), SUM(api_calls),
+                       SUM(flood_wait_s), SUM(pauses), delay_s, batch_size, pause_every
+                FROM run_history
+                WHERE scope = 'cycle'
+                GROUP BY run_id
+                ORDER BY MIN(started_at) DESC
+                LIMIT ?
+            """, (limit,))
+            keys = ("run_id", "started_at", "cycles", "wall_s", "messages", "api_calls",
+                    "flood_wait_s", "pauses", "delay_s", "batch_size", "pause_every")
+            return [dict(zip(keys, row)) for row in cursor.fetchall()]
+
+    def summarize_run_history(self, min_messages: int = 1) -> List[dict]:
+        """Ciclos agrupados por combinação de delay/lote/pausa, da maior vazão sustentada para a menor."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT delay_s, batch_size, pause_every, COUNT(DISTINCT run_id), COUNT(*),
+                       SUM(wall_s), SUM(messages), SUM(api_calls), SUM(flood_wait_s), SUM(pauses)
+                FROM run_history
+                WHERE scope = 'cycle'
+                GROUP BY delay_s, batch_size, pause_every
+                HAVING SUM(messages) >= ?
+                ORDER BY SUM(messages) / MAX(SUM(wall_s), 1) DESC
+            """, (min_messages,))
+            keys = ("delay_s", "batch_size", "pause_every", "runs", "cycles",
+                    "wall_s", "messages", "api_calls", "flood_wait_s", "pauses")
+            return [dict(zip(keys, row)) for row in cursor.fetchall()]
+
+    # ===== Orçamento de envio =====
+    def add_send_budget_usage(self, account_id: int, target_chat: int, minute: int, sent: int = 1):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO send_budget (scope, key, minute, sent) VALUES (?, ?, ?, ?)
+                ON CONFLICT(scope, key, minute) DO UPDATE SET sent = sent + excluded.sent
+            """, [("account", account_id, minute, sent), ("target", target_chat, minute, sent)])
+            conn.commit()
+
+    def get_send_budget_usage(self, scope: str, key: int, since_minute: int) -> List[Tuple[int, int]]:
+        """(minuto, enviadas) a partir de `since_minute`, do mais antigo para o mais recente."""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT minute, sent FROM send_budget
+                WHERE scope = ? AND key = ? AND minute >= ?
+                ORDER BY minute
+            """, (scope, key, since_minute))
+            return [(r[0], r[1]) for r in cursor.fetchall()]
+
+    def prune_send_budget(self, before_minute: int):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM send_budget WHERE minute < ?", (before_minute,))
+            conn.commit()
+
+    # ===== Deduplicação =====
+    def list_dedup_hashes(self, target_chat: int) -> List[int]:
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT content_hash FROM dedup_index WHERE target_chat_id = ?", (target_chat,))
+            return [int(r[0]) for r in cursor.fetchall()]
+
+    def get_dedup_target_message_id(self, target_chat: int, content_hash: int) -> int:
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT target_message_id FROM dedup_index
+                WHERE target_chat_id = ? AND content_hash = ?
+            """, (target_chat, content_hash))
+            row = cursor.fetchone()
+            return int(row[0]) if row and row[0] else 0
+
+    def save_dedup_entry(self, target_chat: int, content_hash: int, source_chat: int, topic_id: int, msg_id: int, target_msg_id: int):
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            # Mantém sempre a PRIMEIRA cópia como referência
+            cursor.execute("""
+                INSERT OR IGNORE INTO dedup_index
+                (target_chat_id, content_hash, source_chat_id, topic_id, message_id, target_message_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (target_chat, content_hash, source_chat, topic_id, msg_id, target_msg_id))
+            conn.commit()
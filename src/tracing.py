@@ -0,0 +1,127 @@
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+
+class _NullSpan:
+    """Span do tracer desligado: não registra nada."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "tid", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.tid = self.tracer._current_tid()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args = dict(self.args, error=exc_type.__name__)
+        self.tracer._events.append((self.name, self.cat, self.tid, self.start, end - self.start, self.args))
+        return False
+
+
+class Tracer:
+    """Spans por fase gravados em um buffer circular e exportados como Chrome trace JSON.
+
+    Com `capacity` 0 o tracer fica desligado e `span()` devolve um span vazio
+    compartilhado (custo de uma chamada). Cada task asyncio vira uma "thread"
+    no trace, então fases concorrentes (fan-out, uploads adiantados, sync de
+    foto em segundo plano) aparecem em linhas separadas no Perfetto.
+    """
+
+    def __init__(self, capacity: int = 0):
+        self.enabled = capacity > 0
+        # (nome, categoria, tid, início, duração, args); os mais antigos são descartados
+        self._events: deque = deque(maxlen=max(1, capacity))
+        self._tids: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._thread_tids: dict[int, int] = {}
+        self._tid_names: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def span(self, name: str, cat: str = "cycle", **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def _current_tid(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+
+        with self._lock:
+            if task is not None:
+                tid = self._tids.get(task)
+                if tid is None:
+                    tid = self._tids[task] = len(self._tid_names) + 1
+                    self._tid_names[tid] = task.get_name()
+                return tid
+            # Fora do loop (ex.: threads do servidor de métricas)
+            ident = threading.get_ident()
+            tid = self._thread_tids.get(ident)
+            if tid is None:
+                tid = self._thread_tids[ident] = len(self._tid_names) + 1
+                self._tid_names[tid] = threading.current_thread().name
+            return tid
+
+    def export(self, path: str):
+        """Grava o buffer no formato Chrome trace (abre em ui.perfetto.dev ou chrome://tracing)."""
+        pid = os.getpid()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self._tid_names.items()
+        ]
+        for name, cat, tid, start, duration, args in list(self._events):
+            event = {
+                "name": name, "cat": cat, "ph": "X", "pid": pid, "tid": tid,
+                "ts": round((start - self._origin) * 1e6, 1),
+                "dur": round(duration * 1e6, 1),
+            }
+            if args:
+                event["args"] = {k: str(v) for k, v in args.items()}
+            events.append(event)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def trace_storage(storage, tracer: Tracer):
+    """Um span (categoria "db") por chamada a método público do StorageRepository."""
+    def wrap(name, method):
+        @functools.wraps(method)
+        def traced(*args, **kwargs):
+            with tracer.span(name, cat="db"):
+                return method(*args, **kwargs)
+        return traced
+
+    for name, method in inspect.getmembers(storage, inspect.ismethod):
+        if not name.startswith("_"):
+            setattr(storage, name, wrap(name, method))
+    return storage
@@ -5,6 +5,7 @@ from rich.panel import Panel
 from rich.prompt import Prompt, IntPrompt, FloatPrompt
 from rich.text import Text
 from .config import AppSettings, save_env_variable
+from .filters import parse_date
 
 console = Console()
 
@@ -64,6 +65,10 @@ class CLIWizard:
         console.print("[bold green]Código enviado![/]")
         return Prompt.ask("Qual o [bold yellow]código[/] que chegou no Telegram?")
 
+    @staticmethod
+    def request_reader_phone() -> str:
+        return Prompt.ask("Telefone da [bold cyan]conta leitora[/] (Ex: +55...)")
+
     @staticmethod
     def request_password() -> str:
         CLIWizard.clear_screen()
@@ -116,49 +121,103 @@ class CLIWizard:
 
         console.print("[1] Criar Novo Destino")
         console.print("[2] Usar Destino Existente (grupo/canal/fórum)")
-        console.print("[3] Voltar")
+        console.print("[3] Exportar para Pasta Local (backup em disco)")
+        console.print("[4] Restaurar Backup Local em um Destino")
+        console.print("[5] Voltar")
         console.print()
 
-        mode = IntPrompt.ask("Escolha uma opção", choices=["1", "2", "3"], default="1")
+        mode = IntPrompt.ask("Escolha uma opção", choices=["1", "2", "3", "4", "5"], default="1")
 
-        if mode == 3:
+        if mode == 5:
             return 0, 0
 
+        if mode == 4:
+            return -4, 0  # sentinela: o main pergunta a pasta e o destino do restore
+
         src = Prompt.ask("ID do Chat [bold red]Origem[/] (Ex: -100...)")
 
         tgt = 0
         if mode == 2:
             tgt_raw = Prompt.ask("ID do Chat [bold green]Destino[/] (Ex: -100...)")
             tgt = int(tgt_raw)
+        elif mode == 3:
+            tgt = -3  # sentinela: exportar para pasta local
         else:
-            # Criar novo destino: escolhe o tipo
-            while True:
-                CLIWizard.clear_screen()
-                console.print(Panel("Criar Novo Destino", style="cyan"))
-                console.print("[1] Canal")
-                console.print("[2] Grupo Normal (sem tópicos)")
-                console.print("[3] Grupo com Tópicos (Fórum)")
-                console.print("[4] Voltar")
-                console.print()
-                dest_mode = IntPrompt.ask("Escolha o tipo", choices=["1", "2", "3", "4"], default="3")
-
-                if dest_mode == 4:
-                    return 0, 0
-
-                # Usamos sentinelas (não são IDs reais) para o main criar o destino correto
-                if dest_mode == 1:
-                    tgt = -2  # criar CANAL
-                elif dest_mode == 2:
-                    tgt = -1  # criar GRUPO normal
-                else:
-                    tgt = 0   # criar GRUPO com tópicos (Fórum)
-                break
+            tgt = CLIWizard._choose_new_target_type()
+            if tgt is None:
+                return 0, 0
 
         save_env_variable('SOURCE_CHAT', str(src))
         save_env_variable('TARGET_CHAT', str(tgt))
 
         return int(src), tgt
 
+    @staticmethod
+    def _choose_new_target_type():
+        """Criar novo destino: retorna a sentinela do tipo escolhido ou None para voltar."""
+        CLIWizard.clear_screen()
+        console.print(Panel("Criar Novo Destino", style="cyan"))
+        console.print("[1] Canal")
+        console.print("[2] Grupo Normal (sem tópicos)")
+        console.print("[3] Grupo com Tópicos (Fórum)")
+        console.print("[4] Voltar")
+        console.print()
+        dest_mode = IntPrompt.ask("Escolha o tipo", choices=["1", "2", "3", "4"], default="3")
+
+        if dest_mode == 4:
+            return None
+
+        # Usamos sentinelas (não são IDs reais) para o main criar o destino correto
+        if dest_mode == 1:
+            return -2  # criar CANAL
+        elif dest_mode == 2:
+            return -1  # criar GRUPO normal
+        return 0       # criar GRUPO com tópicos (Fórum)
+
+    @staticmethod
+    def get_restore_options() -> tuple[str, int]:
+        """Restore: pasta do backup + destino (ID existente ou sentinela de criação). Pasta vazia = voltar."""
+        CLIWizard.clear_screen()
+        console.print(Panel("Restaurar Backup Local", style="cyan"))
+        restore_dir = Prompt.ask("Pasta do [bold green]backup local[/]", default=os.getenv('ARCHIVE_DIR') or "")
+        if not restore_dir or not os.path.exists(os.path.join(restore_dir, "manifest.json")):
+            console.print("[red]❌ Pasta sem manifest.json de backup.[/]")
+            console.input("\nEnter para voltar...")
+            return "", 0
+
+        console.print("[1] Criar Novo Destino")
+        console.print("[2] Usar Destino Existente (grupo/canal/fórum)")
+        console.print()
+        mode = IntPrompt.ask("Escolha uma opção", choices=["1", "2"], default="1")
+
+        if mode == 2:
+            return restore_dir, int(Prompt.ask("ID do Chat [bold green]Destino[/] (Ex: -100...)"))
+
+        tgt = CLIWizard._choose_new_target_type()
+        if tgt is None:
+            return "", 0
+        return restore_dir, tgt
+
+    @staticmethod
+    def get_extra_targets() -> list[int]:
+        """Fan-out: destinos existentes adicionais (lidos uma única vez da origem). Vazio = nenhum."""
+        raw = Prompt.ask("IDs de destinos [bold green]extras[/] para fan-out (separados por vírgula, vazio = nenhum)", default="")
+        extra = []
+        for part in raw.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            try:
+                extra.append(int(part))
+            except ValueError:
+                console.print(f"[red]❌ ID inválido ignorado: {part}[/]")
+        return extra
+
+    @staticmethod
+    def get_archive_dir(src: int) -> str:
+        default = os.getenv('ARCHIVE_DIR') or f"backup_{abs(src)}"
+        return Prompt.ask("Pasta do [bold green]backup local[/]", default=default)
+
     @staticmethod
     def _save_settings_to_file(settings: AppSettings):
         """Helper interno para salvar as configurações no JSON."""
@@ -190,13 +249,15 @@ class CLIWizard:
             [10] Fórum → Canal: Índice Final ............ {fmt(current.forum_to_channel_final_index)} [dim](Cria um menu com links no final)[/]
             [11] Fixar Índice Final ..................... {fmt(current.forum_to_channel_pin_final_index)} [dim](Fixa o menu do índice final)[/]
 
+            [12] Painel ao Vivo ......................... {fmt(current.live_dashboard)} [dim](Progresso por tópico, vazão e FloodWaits; logs só no arquivo)[/]
+
             [0] Voltar
             """
             
             console.print(Panel(menu_content, title="Configurações de Canais/Grupo", style="yellow"))
             choice = Prompt.ask(
                 "Digite o número para alternar",
-                choices=["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "11"],
+                choices=["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "11", "12"],
                 default="0"
             )
             
@@ -216,6 +277,7 @@ class CLIWizard:
             elif choice == '9': current.forum_to_channel_topic_header = not current.forum_to_channel_topic_header
             elif choice == '10': current.forum_to_channel_final_index = not current.forum_to_channel_final_index
             elif choice == '11': current.forum_to_channel_pin_final_index = not current.forum_to_channel_pin_final_index
+            elif choice == '12': current.live_dashboard = not current.live_dashboard
             
             CLIWizard._save_settings_to_file(current)
             
@@ -235,11 +297,16 @@ class CLIWizard:
 
             [6] Tamanho do Lote (batch) ................. [bold cyan]{current.batch_size}[/]
 
+            [7] Limite por hora (conta) ................. [bold cyan]{current.budget_account_per_hour or 'OFF'}[/]
+            [8] Limite por dia (conta) .................. [bold cyan]{current.budget_account_per_day or 'OFF'}[/]
+            [9] Limite por hora (destino) ............... [bold cyan]{current.budget_target_per_hour or 'OFF'}[/]
+            [10] Limite por dia (destino) ............... [bold cyan]{current.budget_target_per_day or 'OFF'}[/]
+
             [0] Voltar
             """
             
             console.print(Panel(menu_content, title="Configurações de Tempo", style="yellow"))
-            choice = Prompt.ask("Digite o número para editar", choices=["0", "1", "2", "3", "4", "5", "6"], default="0")
+            choice = Prompt.ask("Digite o número para editar", choices=["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "10"], default="0")
             
             if choice == '0':
                 break
@@ -255,11 +322,93 @@ class CLIWizard:
                 current.pause_duration_s = IntPrompt.ask("Duração da pausa curta (segundos, 0 para desativar)")
             elif choice == '6':
                 current.batch_size = IntPrompt.ask("Novo batch size (ex: 20-100)", default=current.batch_size)
+            elif choice == '7':
+                current.budget_account_per_hour = IntPrompt.ask("Máximo de mensagens por hora na conta (0 para desativar)")
+            elif choice == '8':
+                current.budget_account_per_day = IntPrompt.ask("Máximo de mensagens por dia na conta (0 para desativar)")
+            elif choice == '9':
+                current.budget_target_per_hour = IntPrompt.ask("Máximo de mensagens por hora no destino (0 para desativar)")
+            elif choice == '10':
+                current.budget_target_per_day = IntPrompt.ask("Máximo de mensagens por dia no destino (0 para desativar)")
             
             CLIWizard._save_settings_to_file(current)
             
         return current
 
+    @staticmethod
+    def _advanced_settings_menu(current: AppSettings) -> AppSettings:
+        while True:
+            CLIWizard.clear_screen()
+
+            def fmt(val): return "[bold green]ON[/] " if val else "[bold red]OFF[/]"
+
+            color_dedup = "[bold red]OFF[/]"
+            if current.dedup_mode == "PULAR": color_dedup = "[bold green]PULAR[/]"
+            elif current.dedup_mode == "LINK": color_dedup = "[bold yellow]LINK[/]"
+
+            menu_content = f"""
+            [1] Leitura via Takeout ..................... {fmt(current.use_takeout)} [dim](Lê a origem com limites de exportação, mais generosos)[/]
+            [2] Downloads Paralelos (backup local) ...... [bold cyan]{current.archive_download_workers}[/]
+            [3] Tamanho do Segmento (backup local) ...... [bold cyan]{current.archive_segment_mb}MB[/]
+            [4] Uploads Adiantados (restore) ............ [bold cyan]{current.restore_upload_ahead}[/]
+            [5] Deduplicar Reposts ...................... {color_dedup} [dim](PULAR = não envia / LINK = envia link para a 1ª cópia)[/]
+
+            [6] Janela: Data Inicial .................... [bold cyan]{current.start_date or '-'}[/]
+            [7] Janela: Data Final ...................... [bold cyan]{current.end_date or '-'}[/]
+            [8] Janela: ID Mínimo ....................... [bold cyan]{current.min_message_id or '-'}[/]
+            [9] Janela: ID Máximo ....................... [bold cyan]{current.max_message_id or '-'}[/]
+
+            [10] Sincronizar Fixados .................... {fmt(current.sync_pins)} [dim](Replica pins e desafixações feitos depois da clonagem)[/]
+            [11] Buffer do Fan-out ...................... [bold cyan]{current.fanout_buffer_batches} lotes[/] [dim](Quanto um destino pode adiantar sobre o mais lento)[/]
+            [12] Sessão do Telegram ..................... [bold cyan]{current.session_backend}[/] [dim](MEMORIA/BANCO = grava a cada {current.session_flush_s}s; vale na próxima execução)[/]
+
+            [0] Voltar
+            """
+
+            console.print(Panel(menu_content, title="Configurações Avançadas", style="yellow"))
+            choice = Prompt.ask("Digite o número para alternar", choices=["0", "1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "11", "12"], default="0")
+
+            if choice == '0':
+                break
+            elif choice == '1': current.use_takeout = not current.use_takeout
+            elif choice == '2':
+                current.archive_download_workers = IntPrompt.ask("Downloads simultâneos (ex: 2-8)", default=current.archive_download_workers)
+            elif choice == '3':
+                current.archive_segment_mb = IntPrompt.ask("Tamanho máximo de cada segmento (MB)", default=current.archive_segment_mb)
+            elif choice == '4':
+                current.restore_upload_ahead = IntPrompt.ask("Quantos uploads adiantar durante o restore", default=current.restore_upload_ahead)
+            elif choice == '5':
+                if current.dedup_mode == "OFF": current.dedup_mode = "PULAR"
+                elif current.dedup_mode == "PULAR": current.dedup_mode = "LINK"
+                else: current.dedup_mode = "OFF"
+            elif choice in ('6', '7'):
+                label = "inicial" if choice == '6' else "final"
+                value = Prompt.ask(f"Data {label} (AAAA-MM-DD, vazio para desativar)", default="").strip()
+                try:
+                    if value:
+                        parse_date(value)
+                except ValueError:
+                    console.print("[red]❌ Data inválida.[/]")
+                    console.input("\nEnter para voltar...")
+                    continue
+                if choice == '6': current.start_date = value
+                else: current.end_date = value
+            elif choice == '8':
+                current.min_message_id = IntPrompt.ask("ID mínimo (0 para desativar)", default=current.min_message_id)
+            elif choice == '9':
+                current.max_message_id = IntPrompt.ask("ID máximo (0 para desativar)", default=current.max_message_id)
+            elif choice == '10': current.sync_pins = not current.sync_pins
+            elif choice == '11':
+                current.fanout_buffer_batches = IntPrompt.ask("Lotes em buffer por destino (fan-out)", default=current.fanout_buffer_batches)
+            elif choice == '12':
+                if current.session_backend == "TELETHON": current.session_backend = "MEMORIA"
+                elif current.session_backend == "MEMORIA": current.session_backend = "BANCO"
+                else: current.session_backend = "TELETHON"
+
+            CLIWizard._save_settings_to_file(current)
+
+        return current
+
     @staticmethod
     def settings_menu(current: AppSettings) -> AppSettings:
         while True:
@@ -268,13 +417,14 @@ class CLIWizard:
             menu_content = """
             [1] Configurações de Canais/Grupo
             [2] Configurações de Tempo
+            [3] Configurações Avançadas
             
             [0] Voltar ao Menu Principal
             """
             
             console.print(Panel(menu_content, title="Menu de Configurações", style="yellow"))
             
-            choice = Prompt.ask("Escolha uma categoria", choices=["0", "1", "2"], default="0")
+            choice = Prompt.ask("Escolha uma categoria", choices=["0", "1", "2", "3"], default="0")
             
             if choice == '0':
                 break
@@ -282,6 +432,8 @@ class CLIWizard:
                 current = CLIWizard._channel_settings_menu(current)
             elif choice == '2':
                 current = CLIWizard._time_settings_menu(current)
+            elif choice == '3':
+                current = CLIWizard._advanced_settings_menu(current)
         
         return current
 
@@ -0,0 +1,47 @@
+import os
+
+from src.archive import ArchiveReader, ArchiveWriter
+
+
+def _records(ids):
+    return [{"id": i, "topic_id": 1, "text": f"msg {i}"} for i in ids]
+
+
+def _ids(root):
+    return [r["id"] for r in ArchiveReader(root).iter_records(1)]
+
+
+def _segment(root):
+    topic_dir = os.path.join(root, "topics", "1")
+    return os.path.join(topic_dir, os.listdir(topic_dir)[0])
+
+
+def _cut(path, n):
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - n)
+
+
+def test_writer_drops_truncated_tail_before_appending(tmp_path):
+    root = str(tmp_path)
+    writer = ArchiveWriter(root)
+    writer.write_manifest({"source_chat_id": 1})
+    writer.append_records(1, _records([1, 2, 3]))
+    writer.append_records(1, _records([4, 5, 6]))
+    _cut(_segment(root), 10)
+
+    # Nova execução retoma a partir do checkpoint (3) e regrava o lote perdido
+    ArchiveWriter(root).append_records(1, _records(range(4, 10)))
+    assert _ids(root) == list(range(1, 10))
+
+
+def test_reader_skips_broken_member_in_the_middle(tmp_path):
+    root = str(tmp_path)
+    writer = ArchiveWriter(root)
+    writer.write_manifest({"source_chat_id": 1})
+    writer.append_records(1, _records([1, 2, 3]))
+    writer.append_records(1, _records([4, 5, 6]))
+    _cut(_segment(root), 10)
+
+    # Mesmo writer (sem reabrir o segmento): o membro quebrado fica no meio
+    writer.append_records(1, _records([7, 8, 9]))
+    assert _ids(root) == [1, 2, 3, 7, 8, 9]
@@ -0,0 +1,34 @@
+from telethon.tl.custom.message import Message
+from telethon.tl.types import MessageMediaPhoto, MessageMediaWebPage, PeerChannel, Photo, WebPage
+
+from src.dedup import content_hash
+
+
+def _photo(photo_id: int) -> Photo:
+    return Photo(id=photo_id, access_hash=0, file_reference=b"", date=None, sizes=[], dc_id=1)
+
+
+def _message(text: str, media=None) -> Message:
+    return Message(id=1, peer_id=PeerChannel(1), message=text, media=media)
+
+
+def _preview(photo_id: int) -> MessageMediaWebPage:
+    webpage = WebPage(id=1, url="https://example.com", display_url="example.com", hash=0, photo=_photo(photo_id))
+    return MessageMediaWebPage(webpage=webpage)
+
+
+def test_webpage_previews_sharing_a_photo_hash_by_text():
+    first = _message("Post um https://example.com", _preview(42))
+    second = _message("Post dois https://example.com", _preview(42))
+
+    # msg.photo devolve a foto da prévia: não pode virar a chave do hash
+    assert first.photo is not None and first.photo.id == second.photo.id
+    assert content_hash(first) != content_hash(second)
+    assert content_hash(first) == content_hash(_message("Post um https://example.com"))
+
+
+def test_photo_reposts_hash_by_photo_id():
+    first = _message("legenda", MessageMediaPhoto(photo=_photo(7)))
+    repost = _message("outra legenda", MessageMediaPhoto(photo=_photo(7)))
+    assert content_hash(first) == content_hash(repost)
+    assert content_hash(first) != content_hash(_message("legenda", MessageMediaPhoto(photo=_photo(8))))
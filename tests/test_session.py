@@ -0,0 +1,21 @@
+import os
+
+from telethon.tl.types import InputPeerUser, User
+
+from src.session import BufferedSession
+
+
+def test_trimmed_entities_are_found_again(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    session = BufferedSession(os.path.join(str(tmp_path), "session.db"), "test")
+    session.process_entities([
+        User(id=i, access_hash=i * 10, username=f"user{i}", phone=f"55{i}", first_name=f"Nome {i}")
+        for i in range(1, 8)
+    ])
+    assert session.trim(1) == 6
+
+    # ID sem marca (exact=False), username, telefone e nome voltam do banco
+    assert session.get_input_entity(5) == InputPeerUser(5, 50)
+    assert session.get_input_entity("user3") == InputPeerUser(3, 30)
+    assert session.get_input_entity("+554") == InputPeerUser(4, 40)
+    assert session.get_input_entity("Nome 2") == InputPeerUser(2, 20)